@@ -0,0 +1,132 @@
+"""
+Microbenchmark for comparing current and desired source server settings.
+
+Compares `StructuralDiff`, used by `ChangePlan.compute_diff`, with the DeepDiff comparison it replaced, on synthetic
+launch template data, launch configurations, replication configurations and tags. Checks that both report the same
+affected root keys. Needs the packages in requirements-dev.txt and runs locally without AWS credentials:
+
+python benchmark_structural_diff.py --servers 2000 --drift 0.05
+
+"""
+import argparse
+import copy
+import random
+import time
+
+start = time.perf_counter()
+from structural_diff import StructuralDiff  # noqa: E402
+structural_diff_import_time = time.perf_counter() - start
+
+start = time.perf_counter()
+from deepdiff import DeepDiff  # noqa: E402
+deepdiff_import_time = time.perf_counter() - start
+
+
+def generate_sections(rng: random.Random, server: int):
+    """
+    :return: dict of section name to the (current, desired) settings of one source server, with no drift
+    """
+    launch_template = {
+        "InstanceType": rng.choice(["m5.large", "m5.xlarge", "r5.2xlarge"]),
+        "IamInstanceProfile": {"Arn": "arn:aws:iam::111111111111:instance-profile/SSMInstanceProfile"},
+        "Monitoring": {"Enabled": True},
+        "MetadataOptions": {"HttpEndpoint": "enabled", "HttpTokens": "required", "InstanceMetadataTags": "enabled"},
+        "TagSpecifications": [
+            {"ResourceType": resource, "Tags": [{"Key": f"key-{n}", "Value": f"value-{n}"} for n in range(8)]}
+            for resource in ("instance", "volume", "network-interface")
+        ],
+        "NetworkInterfaces": [{
+            "DeviceIndex": 0,
+            "SubnetId": f"subnet-{server % 200:017x}",
+            "Groups": [f"sg-{server % 50:017x}"],
+            "PrivateIpAddresses": [{"Primary": True, "PrivateIpAddress": f"10.{server >> 8 & 0xff}.{server & 0xff}.10"}],
+        }],
+    }
+    launch_configuration = {"copyPrivateIp": False, "copyTags": True, "launchDisposition": "STARTED",
+                            "targetInstanceTypeRightSizingMethod": "NONE"}
+    replication_configuration = {
+        "associateDefaultSecurityGroup": False,
+        "bandwidthThrottling": 0,
+        "createPublicIP": False,
+        "dataPlaneRouting": "PRIVATE_IP",
+        "defaultLargeStagingDiskType": "GP3",
+        "ebsEncryption": "DEFAULT",
+        "replicationServerInstanceType": "t3.small",
+        "replicationServersSecurityGroupsIDs": [f"sg-{server % 50:017x}"],
+        "stagingAreaSubnetId": f"subnet-{server % 20:017x}",
+        "stagingAreaTags": {f"key-{n}": f"value-{n}" for n in range(5)},
+        "useDedicatedReplicationServer": False,
+    }
+    tags = {"priority-group": str(server % 4), "template": rng.choice(["web", "app", "sql"])}
+    return {
+        name: (section, copy.deepcopy(section))
+        for name, section in (("launch template", launch_template),
+                              ("launch configuration", launch_configuration),
+                              ("replication configuration", replication_configuration),
+                              ("tags", tags))
+    }
+
+
+def drift(sections, rng: random.Random):
+    """
+    Change one nested value of the current settings of a random section.
+    """
+    name = rng.choice(list(sections))
+    current, _ = sections[name]
+    if name == "launch template":
+        current["TagSpecifications"][2]["Tags"][7]["Value"] = "drifted"
+    elif name == "launch configuration":
+        current["copyPrivateIp"] = True
+    elif name == "replication configuration":
+        current["stagingAreaTags"]["key-4"] = "drifted"
+    else:
+        current["priority-group"] = "drifted"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--servers", type=int, default=2000)
+    parser.add_argument("--drift", type=float, default=0.05, help="fraction of servers with one drifted setting")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    servers = []
+    for server in range(args.servers):
+        sections = generate_sections(rng, server)
+        if rng.random() < args.drift:
+            drift(sections, rng)
+        servers.append(sections)
+    comparisons = [pair for sections in servers for pair in sections.values()]
+    print(f"{len(servers)} servers, {len(comparisons)} comparisons")
+    print(f"import structural_diff:    {structural_diff_import_time:9.4f}s")
+    print(f"import deepdiff:           {deepdiff_import_time:9.4f}s")
+
+    start = time.perf_counter()
+    structural = [StructuralDiff(current, desired) for current, desired in comparisons]
+    print(f"StructuralDiff:            {time.perf_counter() - start:9.4f}s")
+
+    start = time.perf_counter()
+    deep = [DeepDiff(current, desired) for current, desired in comparisons]
+    print(f"DeepDiff:                  {time.perf_counter() - start:9.4f}s")
+
+    changed = [diff for diff in structural if diff.affected_root_keys]
+    start = time.perf_counter()
+    for diff in changed:
+        diff.pretty()
+    print(f"StructuralDiff.pretty:     {time.perf_counter() - start:9.4f}s ({len(changed)} changed)")
+
+    changed = [diff for diff in deep if diff.affected_root_keys]
+    start = time.perf_counter()
+    for diff in changed:
+        diff.pretty()
+    print(f"DeepDiff.pretty:           {time.perf_counter() - start:9.4f}s ({len(changed)} changed)")
+
+    for structural_diff, deep_diff in zip(structural, deep):
+        assert set(structural_diff.affected_root_keys) == set(deep_diff.affected_root_keys), \
+            (structural_diff.pretty(), deep_diff.pretty())
+    print(f"affected root keys match DeepDiff for {len(comparisons)} comparisons")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Microbenchmark for matching source server IP addresses to target subnets.
+
+Compares the linear CIDR scan previously used by `get_vpc_info_from_ip_address` with the longest-prefix-match
+`SubnetCidrIndex` built by `create_subnet_cidr_mapping`. Runs locally without AWS credentials:
+
+python benchmark_subnet_cidr_index.py --subnets 5000 --ips 20000
+
+"""
+import argparse
+import os
+import random
+import time
+from ipaddress import IPv4Address, ip_network
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import configsynchronizer
+
+
+def linear_scan(cidr_to_subnet_map, ip_address: str):
+    """
+    The previous implementation: first overlapping CIDR block in dict order.
+    """
+    ip_address_net = ip_network(ip_address)
+    for cidr in cidr_to_subnet_map:
+        if ip_network(cidr).overlaps(ip_address_net):
+            return cidr, *cidr_to_subnet_map[cidr]
+    return None, None, None, None
+
+
+def most_specific_scan(cidr_to_subnet_map, ip_address: str):
+    """
+    Reference longest-prefix match used to check the index.
+    """
+    address = IPv4Address(ip_address)
+    matches = [ip_network(cidr) for cidr in cidr_to_subnet_map if address in ip_network(cidr)]
+    if not matches:
+        return None, None, None, None
+    cidr = str(max(matches, key=lambda network: network.prefixlen))
+    return cidr, *cidr_to_subnet_map[cidr]
+
+
+def generate_subnets(count: int, rng: random.Random):
+    """
+    /24 subnets spread over 10.0.0.0/8, with one in every ten /24 blocks covered by a broader /16 subnet.
+    """
+    mapping = {}
+    blocks = rng.sample(range(2 ** 16), count)
+    for n, block in enumerate(blocks):
+        cidr = f"10.{block >> 8}.{block & 0xff}.0/24"
+        mapping[cidr] = (f"subnet-{n:017x}", [f"sg-{n % 50:017x}"], f"vpc-{n % 50:017x}")
+        if n % 10 == 0:
+            mapping[f"10.{block >> 8}.0.0/16"] = (f"subnet-{n:017x}-wide", [f"sg-{n % 50:017x}"], f"vpc-{n % 50:017x}")
+    return mapping
+
+
+def generate_ips(count: int, rng: random.Random):
+    return [str(IPv4Address((10 << 24) + rng.randrange(2 ** 24))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subnets", type=int, default=5000)
+    parser.add_argument("--ips", type=int, default=20000)
+    parser.add_argument("--linear-sample", type=int, default=200,
+                        help="number of IP addresses timed with the linear scan, extrapolated to --ips")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mapping = generate_subnets(args.subnets, rng)
+    ips = generate_ips(args.ips, rng)
+    print(f"{len(mapping)} cidr blocks, {len(ips)} ip addresses")
+
+    start = time.perf_counter()
+    index = configsynchronizer.SubnetCidrIndex(mapping)
+    print(f"build index:              {time.perf_counter() - start:9.4f}s")
+
+    start = time.perf_counter()
+    single = [index.lookup(ip) for ip in ips]
+    print(f"index lookup (one by one): {time.perf_counter() - start:9.4f}s")
+
+    start = time.perf_counter()
+    batch = index.lookup_all(ips)
+    print(f"index lookup_all (batch):  {time.perf_counter() - start:9.4f}s")
+
+    sample = ips[:args.linear_sample]
+    start = time.perf_counter()
+    for ip in sample:
+        linear_scan(mapping, ip)
+    elapsed = time.perf_counter() - start
+    print(f"linear scan:              {elapsed * len(ips) / len(sample):9.4f}s "
+          f"(extrapolated from {len(sample)} ip addresses)")
+
+    for ip, result in zip(sample, single):
+        expected = most_specific_scan(mapping, ip)
+        assert result == expected == batch[ip], (ip, result, expected, batch[ip])
+    print(f"results match the longest-prefix reference for {len(sample)} ip addresses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,628 @@
+"""
+End to end benchmark of the configuration synchronizer on a synthetic fleet.
+
+Generates N accounts of M source servers, with K override files for each configuration directory, and runs
+`synchronize_all` against an in-process stand-in for DRS, EC2, STS, SNS and S3. Every API call takes a configurable
+latency and can be throttled by a per-operation request limit; stub clients emit the same botocore events as real
+clients, so the synchronizer's API rate limiters, and retries of throttled requests, behave as they do on AWS.
+Runs locally without AWS credentials:
+
+python benchmark_synchronizer.py --accounts 2 --servers 500 --overrides 3 --drift 0.05 --latency 0.02
+
+Scenarios:
+  cold         first run, every server differs from source control and there are no stored server states
+  incremental  after a converging run, `--drift` of the servers change, then the next scheduled run is measured
+  full-sweep   as incremental, but the measured run synchronizes every server
+
+With `--timeout`, each invocation of the lambda function times out after that many seconds, so runs store a checkpoint
+and continue in new invocations, run one after the other in this process.
+
+Reports wall time, API calls per server, time spent waiting on rate limits and throttled requests, and peak memory.
+"""
+import argparse
+import collections
+import datetime
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+import types
+from pathlib import Path
+
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", os.environ["AWS_REGION"])
+os.environ.setdefault("DR_AUTOMATION_BUCKET", "benchmark-bucket")
+os.environ.setdefault("DR_CONFIGURATION_SYNCHRONIZER_ROLE_NAME", "drs-configuration-synchronizer-account-role")
+os.environ.setdefault("DR_CONFIGURATION_SYNCHRONIZER_TOPIC_ARN", "arn:aws:sns:us-east-1:111111111111:benchmark")
+os.environ.setdefault("DR_CONFIGURATION_SYNCHRONIZER_API_METRICS", "false")
+
+import yaml  # noqa: E402
+from botocore.exceptions import ClientError  # noqa: E402
+from botocore.hooks import HierarchicalEmitter  # noqa: E402
+
+import configsynchronizer  # noqa: E402
+from configuration_bundle import compile_bundle  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+REGION = os.environ["AWS_REGION"]
+# same as the retry configuration of boto_client_config in configsynchronizer
+MAX_ATTEMPTS = 10
+MAX_BACKOFF_SECONDS = 20
+THROTTLING_ERRORS = {"ec2": ("RequestLimitExceeded", 503), "drs": ("ThrottlingException", 429),
+                     "s3": ("SlowDown", 503), "sts": ("Throttling", 400), "sns": ("Throttling", 400)}
+# request and response keys of the pagination token, and the page size parameter, of each service
+PAGINATION = {"ec2": ("NextToken", "NextToken", "MaxResults"), "drs": ("nextToken", "nextToken", "maxResults"),
+              "s3": ("ContinuationToken", "NextContinuationToken", "MaxKeys")}
+SUBNETS_PER_ACCOUNT = 8
+TEMPLATE_TAG = "template"
+
+
+class StubBackend:
+    def __init__(self, latency: float, api_limit: float, rng: random.Random):
+        """
+        Shared state of the stubbed AWS services: the fleet, S3 objects and API call statistics.
+
+        :param latency: Mean seconds taken by each API call
+        :param api_limit: Requests per second allowed for each operation in each account, 0 for no limit
+        """
+        self.latency = latency
+        self.api_limit = api_limit
+        self.rng = rng
+        self.accounts = {}
+        self.objects = {}
+        self.messages = []
+        self.calls = collections.Counter()
+        self.throttled = collections.Counter()
+        self.backoff_seconds = 0.0
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def admit(self, account_id: str, service: str, operation: str) -> bool:
+        """
+        :return: False if the request is throttled by the token bucket of the operation
+        """
+        with self.lock:
+            self.calls[(service, operation)] += 1
+            if self.api_limit <= 0:
+                return True
+            now = time.monotonic()
+            tokens, updated = self.buckets.get((account_id, service, operation), (self.api_limit, now))
+            tokens = min(self.api_limit, tokens + (now - updated) * self.api_limit)
+            admitted = tokens >= 1
+            self.buckets[(account_id, service, operation)] = (tokens - 1 if admitted else tokens, now)
+            if not admitted:
+                self.throttled[(service, operation)] += 1
+            return admitted
+
+    def wait(self):
+        if self.latency > 0:
+            with self.lock:
+                latency = self.rng.uniform(0.5, 1.5) * self.latency
+            time.sleep(latency)
+
+
+def client_error(code: str, operation: str, status: int = 400, message: str = ""):
+    return ClientError({"Error": {"Code": code, "Message": message},
+                        "ResponseMetadata": {"RequestId": "benchmark", "HTTPStatusCode": status}}, operation)
+
+
+def operation_name(method: str) -> str:
+    return "".join(word.capitalize() for word in method.split("_"))
+
+
+class StubClient:
+    def __init__(self, backend: StubBackend, service: str, service_backend, account_id: str):
+        """
+        Stand-in for a boto3 client. Each call emits the botocore "before-send" and "needs-retry" events, takes the
+        backend latency, and is retried with exponential backoff while it is throttled.
+        """
+        self.backend = backend
+        self.service = service
+        self.service_backend = service_backend
+        self.account_id = account_id
+        self.meta = types.SimpleNamespace(
+            events=HierarchicalEmitter(), region_name=REGION,
+            service_model=types.SimpleNamespace(service_name=service),
+            client=self)
+
+    def __getattr__(self, method: str):
+        if method.startswith("_") or not hasattr(self.service_backend, method):
+            raise AttributeError(method)
+        return lambda **kwargs: self.call(method, kwargs)
+
+    def call(self, method: str, kwargs: dict):
+        operation = operation_name(method)
+        model = types.SimpleNamespace(name=operation)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.meta.events.emit(f"before-send.{self.service}.{operation}", request=None)
+            self.backend.wait()
+            if self.backend.admit(self.account_id, self.service, operation):
+                break
+            code, status = THROTTLING_ERRORS[self.service]
+            self.meta.events.emit(f"needs-retry.{self.service}.{operation}", operation=model, attempts=attempt,
+                                  response=(types.SimpleNamespace(status_code=status), {"Error": {"Code": code}}))
+            if attempt == MAX_ATTEMPTS:
+                raise client_error(code, operation, status, "Rate exceeded")
+            backoff = self.backend.rng.random() * min(MAX_BACKOFF_SECONDS, 2 ** (attempt - 1))
+            with self.backend.lock:
+                self.backend.backoff_seconds += backoff
+            time.sleep(backoff)
+        response = getattr(self.service_backend, method)(**kwargs)
+        self.meta.events.emit(f"needs-retry.{self.service}.{operation}", operation=model, attempts=attempt,
+                              response=(types.SimpleNamespace(status_code=200), response))
+        response.setdefault("ResponseMetadata", {"RequestId": "benchmark", "HTTPStatusCode": 200})
+        return response
+
+    def get_paginator(self, method: str):
+        client = self
+        request_token, response_token, page_size = PAGINATION[self.service]
+
+        class Paginator:
+            @staticmethod
+            def paginate(PaginationConfig=None, **kwargs):
+                if PaginationConfig and "PageSize" in PaginationConfig:
+                    kwargs[page_size] = PaginationConfig["PageSize"]
+                while True:
+                    page = client.call(method, dict(kwargs))
+                    yield page
+                    if not page.get(response_token):
+                        return
+                    kwargs[request_token] = page[response_token]
+
+        return Paginator()
+
+
+def paginate(items: list, token, size: int):
+    start = int(token or 0)
+    page = items[start:start + size]
+    return page, str(start + size) if start + size < len(items) else None
+
+
+def filter_values(filters, name: str):
+    for item in filters or []:
+        if item["Name"] == name:
+            return item["Values"]
+    return None
+
+
+class Ec2Backend:
+    def __init__(self, account: dict):
+        self.account = account
+
+    def describe_subnets(self, Filters=None, NextToken=None, MaxResults=200):
+        subnets = self.account["subnets"] if filter_values(Filters, "tag:drstarget") else []
+        page, token = paginate(subnets, NextToken, MaxResults)
+        return {"Subnets": page, "NextToken": token}
+
+    def describe_vpcs(self, VpcIds=None, NextToken=None, MaxResults=200):
+        vpcs = [vpc for vpc in self.account["vpcs"] if VpcIds is None or vpc["VpcId"] in VpcIds]
+        page, token = paginate(vpcs, NextToken, MaxResults)
+        return {"Vpcs": page, "NextToken": token}
+
+    def describe_security_groups(self, Filters=None, NextToken=None, MaxResults=200):
+        names = filter_values(Filters, "tag:Name") or []
+        vpc_ids = filter_values(Filters, "vpc-id")
+        groups = [group for group in self.account["security_groups"]
+                  if group["Tags"][0]["Value"] in names and (vpc_ids is None or group["VpcId"] in vpc_ids)]
+        page, token = paginate(groups, NextToken, MaxResults)
+        return {"SecurityGroups": page, "NextToken": token}
+
+    def default_version(self, launch_template_id: str) -> dict:
+        versions = self.account["launch_templates"][launch_template_id]
+        return next(version for version in versions if version["DefaultVersion"])
+
+    def describe_launch_template_versions(self, LaunchTemplateId=None, Versions=None, NextToken=None,
+                                          MaxResults=200):
+        if LaunchTemplateId and not Versions:
+            versions = self.account["launch_templates"][LaunchTemplateId]
+        else:
+            templates = [LaunchTemplateId] if LaunchTemplateId else sorted(self.account["launch_templates"])
+            versions = [self.default_version(template) for template in templates]
+        page, token = paginate(versions, NextToken, MaxResults)
+        return {"LaunchTemplateVersions": page, "NextToken": token}
+
+    def describe_launch_templates(self, NextToken=None, MaxResults=200):
+        templates = [dict(LaunchTemplateId=template, LatestVersionNumber=versions[-1]["VersionNumber"],
+                          DefaultVersionNumber=self.default_version(template)["VersionNumber"])
+                     for template, versions in sorted(self.account["launch_templates"].items())]
+        page, token = paginate(templates, NextToken, MaxResults)
+        return {"LaunchTemplates": page, "NextToken": token}
+
+    def create_launch_template_version(self, LaunchTemplateId, SourceVersion, LaunchTemplateData,
+                                       VersionDescription=None, **kwargs):
+        versions = self.account["launch_templates"][LaunchTemplateId]
+        source = next(version for version in versions if version["VersionNumber"] == int(SourceVersion))
+        version = dict(LaunchTemplateId=LaunchTemplateId, VersionNumber=versions[-1]["VersionNumber"] + 1,
+                       DefaultVersion=False, VersionDescription=VersionDescription,
+                       LaunchTemplateData={**source["LaunchTemplateData"], **LaunchTemplateData})
+        versions.append(version)
+        return {"LaunchTemplateVersion": dict(LaunchTemplateId=LaunchTemplateId,
+                                              VersionNumber=version["VersionNumber"])}
+
+    def modify_launch_template(self, LaunchTemplateId, DefaultVersion, **kwargs):
+        for version in self.account["launch_templates"][LaunchTemplateId]:
+            version["DefaultVersion"] = version["VersionNumber"] == int(DefaultVersion)
+        return {"LaunchTemplate": dict(LaunchTemplateId=LaunchTemplateId, DefaultVersionNumber=int(DefaultVersion))}
+
+    def delete_launch_template_versions(self, LaunchTemplateId, Versions):
+        numbers = {int(version) for version in Versions}
+        versions = self.account["launch_templates"][LaunchTemplateId]
+        versions[:] = [version for version in versions
+                       if version["VersionNumber"] not in numbers or version["DefaultVersion"]]
+        return {"SuccessfullyDeletedLaunchTemplateVersions": [
+            dict(LaunchTemplateId=LaunchTemplateId, VersionNumber=number) for number in sorted(numbers)]}
+
+
+class DrsBackend:
+    def __init__(self, account: dict):
+        self.account = account
+
+    def describe_source_servers(self, filters=None, nextToken=None, maxResults=200):
+        ids = (filters or {}).get("sourceServerIDs")
+        servers = list(self.account["servers"].values())
+        if ids is not None:
+            servers = [server for server in servers if server["sourceServerID"] in ids]
+        page, token = paginate(servers, nextToken, maxResults)
+        return {"items": [dict(server, tags=dict(server["tags"])) for server in page], "nextToken": token}
+
+    def get_launch_configuration(self, sourceServerID):
+        return dict(self.account["launch_configurations"][sourceServerID])
+
+    def update_launch_configuration(self, sourceServerID, **kwargs):
+        self.account["launch_configurations"][sourceServerID].update(kwargs)
+        return dict(self.account["launch_configurations"][sourceServerID])
+
+    def get_replication_configuration(self, sourceServerID):
+        return dict(self.account["replication_configurations"][sourceServerID])
+
+    def update_replication_configuration(self, sourceServerID, **kwargs):
+        self.account["replication_configurations"][sourceServerID].update(kwargs)
+        return dict(self.account["replication_configurations"][sourceServerID])
+
+    def tag_resource(self, resourceArn, tags):
+        self.account["servers"][resourceArn.rsplit("/", 1)[-1]]["tags"].update(tags)
+        return {}
+
+
+class StsBackend:
+    def assume_role(self, RoleArn, RoleSessionName):
+        account_id = RoleArn.split(":")[4]
+        return {"Credentials": dict(AccessKeyId=account_id, SecretAccessKey="benchmark", SessionToken="benchmark",
+                                    Expiration=datetime.datetime.now(tz=datetime.timezone.utc))}
+
+
+class SnsBackend:
+    def __init__(self, backend: StubBackend):
+        self.backend = backend
+
+    def publish(self, TopicArn, Message, Subject=None):
+        self.backend.messages.append(Message)
+        return {"MessageId": str(len(self.backend.messages))}
+
+
+class S3Backend:
+    def __init__(self, backend: StubBackend):
+        self.backend = backend
+        self.uploads = {}
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.backend.objects:
+            raise client_error("NoSuchKey", "GetObject", 404)
+        return {"Body": io.BytesIO(self.backend.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.backend.objects[Key] = Body.read() if hasattr(Body, "read") else bytes(Body)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=1000):
+        keys = sorted(key for key in self.backend.objects if key.startswith(Prefix))
+        page, token = paginate(keys, ContinuationToken, MaxKeys)
+        return {"Contents": [{"Key": key} for key in page], "NextContinuationToken": token}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = str(len(self.uploads) + 1)
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": str(PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.backend.objects[Key] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+        return {}
+
+
+def generate_configuration(path: Path, account_id: str, overrides: int, host_count: int, rng: random.Random):
+    """
+    Write the configuration directory of one account, with `overrides` override files in each directory.
+    """
+    account_path = path.joinpath(account_id)
+    directories = {
+        "ec2-launch-templates": (
+            dict(InstanceType="m5.large", Monitoring={"Enabled": True},
+                 MetadataOptions={"HttpEndpoint": "enabled", "HttpTokens": "required"}),
+            lambda n: dict(InstanceType=rng.choice(["m5.xlarge", "r5.large", "c5.2xlarge"]),
+                           TagSpecifications=[{"ResourceType": "instance",
+                                               "Tags": [{"Key": "role", "Value": f"role-{n}"}]}])),
+        "drs-launch-configurations": (
+            dict(copyPrivateIp=False, copyTags=True, launchDisposition="STARTED",
+                 targetInstanceTypeRightSizingMethod="NONE"),
+            lambda n: dict(copyPrivateIp=n % 2 == 0)),
+        "drs-replication-configurations": (
+            dict(associateDefaultSecurityGroup=True, createPublicIP=False, dataPlaneRouting="PRIVATE_IP",
+                 defaultLargeStagingDiskType="GP3", replicationServerInstanceType="t3.small",
+                 stagingAreaTags={"managed-by-dr-synchronizer": "true"}, useDedicatedReplicationServer=False),
+            lambda n: dict(replicationServerInstanceType=rng.choice(["m5.large", "m5.xlarge"]))),
+    }
+    for directory, (defaults, override) in directories.items():
+        account_path.joinpath(directory).mkdir(parents=True)
+        account_path.joinpath(directory, "defaults.yml").write_text(yaml.safe_dump(defaults))
+        for n in range(overrides):
+            account_path.joinpath(directory, f"override_for_tag__{TEMPLATE_TAG}__t{n}.yml").write_text(
+                yaml.safe_dump(override(n)))
+    mapped = rng.sample(range(host_count), k=host_count // 10)
+    account_path.joinpath("server-tag-mapping.csv").write_text(
+        "Name,priority-group\n" + "".join(f"host-{host},{host % 4}\n" for host in sorted(mapped)))
+    excluded = rng.sample(range(host_count), k=min(host_count, 2))
+    account_path.joinpath("config-sync-exclusions.csv").write_text(
+        "Name,ExcludeAll,ExcludeNetworkConfiguration\n" + "".join(f"host-{host},false,true\n" for host in excluded))
+
+
+def generate_account(account_id: str, servers: int, overrides: int, rng: random.Random) -> dict:
+    """
+    :return: DRS and EC2 state of one account, with every server set differently from source control
+    """
+    vpcs = [dict(VpcId=f"vpc-{account_id}{n}", Tags=[{"Key": "Name", "Value": f"dr-vpc-{n}"}]) for n in range(2)]
+    security_groups = [dict(GroupId=f"sg-{account_id}{n}", VpcId=vpc["VpcId"],
+                            Tags=[{"Key": "Name", "Value": f"dr-vpc-{n}-sg"}]) for n, vpc in enumerate(vpcs)]
+    subnets = [dict(SubnetId=f"subnet-{account_id}{n:02}", VpcId=vpcs[n % 2]["VpcId"], CidrBlock=f"10.{n}.0.0/16")
+               for n in range(SUBNETS_PER_ACCOUNT)]
+    account = dict(vpcs=vpcs, security_groups=security_groups, subnets=subnets, servers={}, launch_templates={},
+                   launch_configurations={}, replication_configurations={})
+    for n in range(servers):
+        server_id = f"s-{int(account_id):012x}{n:05x}"
+        launch_template_id = f"lt-{int(account_id):012x}{n:05x}"
+        ip = f"10.{rng.randrange(SUBNETS_PER_ACCOUNT)}.{n >> 8 & 0xff}.{n & 0xff}"
+        account["servers"][server_id] = dict(
+            sourceServerID=server_id,
+            arn=f"arn:aws:drs:{REGION}:{account_id}:source-server/{server_id}",
+            tags={TEMPLATE_TAG: f"t{n % max(overrides, 1)}"},
+            sourceProperties=dict(identificationHints=dict(hostname=f"host-{n}"),
+                                  networkInterfaces=[dict(ips=[ip], isPrimary=True)],
+                                  lastUpdatedDateTime="2022-11-01T00:00:00+00:00"),
+            stagingArea=dict(status="NOT_EXTENDED"),
+            dataReplicationInfo=dict(dataReplicationState="CONTINUOUS"))
+        account["launch_templates"][launch_template_id] = [dict(
+            LaunchTemplateId=launch_template_id, VersionNumber=1, DefaultVersion=True,
+            LaunchTemplateData=dict(InstanceType="t3.micro", NetworkInterfaces=[dict(
+                DeviceIndex=0, SubnetId="subnet-initial", Groups=["sg-initial"],
+                PrivateIpAddresses=[dict(Primary=True, PrivateIpAddress="192.168.0.1")])]))]
+        account["launch_configurations"][server_id] = dict(
+            sourceServerID=server_id, ec2LaunchTemplateID=launch_template_id, copyPrivateIp=True, copyTags=False,
+            launchDisposition="STOPPED", licensing={"osByol": True}, targetInstanceTypeRightSizingMethod="BASIC")
+        account["replication_configurations"][server_id] = dict(
+            sourceServerID=server_id, associateDefaultSecurityGroup=False, bandwidthThrottling=0,
+            createPublicIP=False, dataPlaneRouting="PRIVATE_IP", defaultLargeStagingDiskType="GP2",
+            ebsEncryption="DEFAULT", replicationServerInstanceType="t3.micro", replicationServersSecurityGroupsIDs=[],
+            stagingAreaSubnetId=subnets[0]["SubnetId"], stagingAreaTags={}, useDedicatedReplicationServer=False)
+    return account
+
+
+def apply_drift(backend: StubBackend, fraction: float, rng: random.Random) -> int:
+    """
+    Change one setting of `fraction` of the source servers outside the synchronizer.
+
+    :return: Number of servers changed
+    """
+    changed = 0
+    for account in backend.accounts.values():
+        for server_id, server in account["servers"].items():
+            if rng.random() >= fraction:
+                continue
+            changed += 1
+            kind = rng.choice(["launch template", "source server", "tags"])
+            if kind == "launch template":
+                launch_template_id = account["launch_configurations"][server_id]["ec2LaunchTemplateID"]
+                versions = account["launch_templates"][launch_template_id]
+                current = next(version for version in versions if version["DefaultVersion"])
+                current["DefaultVersion"] = False
+                versions.append(dict(current, VersionNumber=versions[-1]["VersionNumber"] + 1, DefaultVersion=True,
+                                     VersionDescription="changed outside the synchronizer",
+                                     LaunchTemplateData=dict(current["LaunchTemplateData"], InstanceType="t3.nano")))
+            elif kind == "source server":
+                server["sourceProperties"]["lastUpdatedDateTime"] = datetime.datetime.now(
+                    tz=datetime.timezone.utc).isoformat()
+                account["replication_configurations"][server_id]["replicationServerInstanceType"] = "t3.micro"
+            else:
+                server["tags"][TEMPLATE_TAG] = "drifted"
+    return changed
+
+
+def install_backend(backend: StubBackend):
+    """
+    Replace the AWS clients used by configsynchronizer with stub clients.
+    """
+    sts_backend = StsBackend()
+    configsynchronizer.sts = StubClient(backend, "sts", sts_backend, "")
+    configsynchronizer.sns = StubClient(backend, "sns", SnsBackend(backend), "")
+    configsynchronizer.s3 = types.SimpleNamespace(meta=types.SimpleNamespace(
+        client=StubClient(backend, "s3", S3Backend(backend), "")))
+
+
+
+class StubSession:
+    def __init__(self, backend: StubBackend, account_id: str):
+        """
+        Stand-in for the boto3 session of an account, creating stub clients for ec2 and drs.
+        """
+        self.backend = backend
+        self.account_id = account_id
+        self.region_name = REGION
+
+    def client(self, service, **kwargs):
+        account = self.backend.accounts[self.account_id]
+        service_backend = Ec2Backend(account) if service == "ec2" else DrsBackend(account)
+        return StubClient(self.backend, service, service_backend, self.account_id)
+
+
+def create_account_client_pool(backend: StubBackend) -> configsynchronizer.AccountClientPool:
+    """
+    :return: AccountClientPool whose sessions assume the synchronizer role with the stub sts client
+    """
+    def create_session(account_id: str) -> StubSession:
+        role_name = os.environ["DR_CONFIGURATION_SYNCHRONIZER_ROLE_NAME"]
+        configsynchronizer.sts.assume_role(RoleArn=f"arn:aws:iam::{account_id}:role/{role_name}",
+                                           RoleSessionName="DRConfigurationSynchronizer")
+        return StubSession(backend, account_id)
+
+    return configsynchronizer.AccountClientPool(create_session)
+
+
+def reset_invocation(backend: StubBackend, configuration_path: Path, bundle_path: Path):
+    """
+    Drop in-memory caches and clients, as for a new lambda invocation. Caches stored in S3 are kept.
+    """
+    configsynchronizer.account_client_pool = create_account_client_pool(backend)
+    configsynchronizer.account_configuration_loader = configsynchronizer.AccountConfigurationLoader(
+        configuration_path, bundle_path)
+    configsynchronizer.network_topology_cache = configsynchronizer.NetworkTopologyCache()
+    configsynchronizer.api_rate_limiters = configsynchronizer.ApiRateLimiters()
+
+
+class StubContext:
+    invoked_function_arn = "arn:aws:lambda:us-east-1:111111111111:function:drs-configuration-synchronizer"
+
+    def __init__(self, timeout: float):
+        """
+        Stand-in for the lambda context of an invocation that times out `timeout` seconds after it starts.
+        """
+        self.deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int((self.deadline - time.monotonic()) * 1000)
+
+
+def run_synchronizer(full_sweep: bool, timeout: float) -> int:
+    """
+    Run synchronize_all, continuing it in new invocations while it stores checkpoints if `timeout` is set.
+
+    :return: Number of invocations
+    """
+    if not timeout:
+        configsynchronizer.synchronize_all(full_sweep=full_sweep)
+        return 1
+    events = []
+    configsynchronizer.synchronize_all(full_sweep=full_sweep, context=StubContext(timeout), invoke=events.append)
+    invocations = 1
+    while events:
+        run_id = events.pop()["checkpoint_run"]
+        invocations += 1
+        configsynchronizer.continue_synchronization(run_id, StubContext(timeout), events.append)
+    return invocations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--servers", type=int, default=500, help="source servers per account")
+    parser.add_argument("--overrides", type=int, default=3, help="override files per configuration directory")
+    parser.add_argument("--drift", type=float, default=0.05, help="fraction of servers changed before the run")
+    parser.add_argument("--scenario", choices=["cold", "incremental", "full-sweep"], default="incremental")
+    parser.add_argument("--latency", type=float, default=0.02, help="mean seconds per API call")
+    parser.add_argument("--api-limit", type=float, default=0,
+                        help="requests per second for each operation in each account, 0 for no limit")
+    parser.add_argument("--no-bundle", action="store_true", help="read configuration files instead of a bundle")
+    parser.add_argument("--timeout", type=float, default=0,
+                        help="seconds before each invocation times out, more than "
+                             f"{configsynchronizer.CHECKPOINT_TIME_MARGIN_SECONDS}, 0 for no timeout")
+    parser.add_argument("--log-file", default=os.devnull, help="file receiving the synchronizer logs")
+    parser.add_argument("--log-mode", choices=configsynchronizer.LOG_MODES, default="verbose")
+    parser.add_argument("--log-sample-rate", type=float, default=configsynchronizer.LOG_SAMPLE_RATE_DEFAULT,
+                        help="fraction of servers logged step by step in compact log mode")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="measure peak memory allocated by Python during the run, which slows it down")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    log_file = open(args.log_file, "w")
+    configsynchronizer.logger.registered_handler.setStream(log_file)
+    configsynchronizer.server_log_sampler.configure(args.log_mode, args.log_sample_rate)
+
+    backend = StubBackend(latency=args.latency, api_limit=args.api_limit, rng=random.Random(args.seed))
+    install_backend(backend)
+    workspace = tempfile.TemporaryDirectory()
+    configuration_path = Path(workspace.name, "configuration")
+    bundle_path = Path(workspace.name, "configuration-bundle.jsonl")
+    for n in range(args.accounts):
+        account_id = str(100000000000 + n)
+        generate_configuration(configuration_path, account_id, args.overrides, args.servers, rng)
+        backend.accounts[account_id] = generate_account(account_id, args.servers, args.overrides, rng)
+    if not args.no_bundle:
+        compile_bundle(configuration_path, bundle_path)
+    server_count = args.accounts * args.servers
+    print(f"{args.accounts} account(s) x {args.servers} server(s), {args.overrides} override file(s) per directory, "
+          f"scenario {args.scenario}")
+
+    if args.scenario != "cold":
+        reset_invocation(backend, configuration_path, bundle_path)
+        configsynchronizer.synchronize_all()
+        print(f"converged fleet, {apply_drift(backend, args.drift, rng)} server(s) drifted")
+    backend.calls.clear()
+    backend.throttled.clear()
+    backend.backoff_seconds = 0.0
+    reset_invocation(backend, configuration_path, bundle_path)
+
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+    start = time.perf_counter()
+    invocations = run_synchronizer(args.scenario == "full-sweep", args.timeout)
+    wall_time = time.perf_counter() - start
+    if args.tracemalloc:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    calls = sum(backend.calls.values())
+    wait_seconds, throttled_requests = configsynchronizer.api_rate_limiters.statistics()
+    print(f"wall time:                 {wall_time:9.2f}s ({server_count / wall_time:.1f} servers/s)")
+    if args.timeout:
+        print(f"invocations:               {invocations:9d}")
+    if args.log_file != os.devnull:
+        print(f"log size:                  {os.path.getsize(args.log_file):9d} bytes")
+    print(f"api calls:                 {calls:9d} ({calls / server_count:.2f} per server)")
+    print(f"throttled requests:        {sum(backend.throttled.values()):9d} "
+          f"({throttled_requests} seen by rate limiters)")
+    print(f"rate limiter wait:         {wait_seconds:9.2f}s (summed over workers)")
+    print(f"retry backoff:             {backend.backoff_seconds:9.2f}s")
+    if resource is not None:
+        # kilobytes on Linux, bytes on macOS
+        print(f"peak resident memory:      {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss:9d}")
+    if args.tracemalloc:
+        print(f"peak python allocations:   {traced_peak / 1024 / 1024:9.1f} MiB")
+    print("calls by operation:")
+    for (service, operation), count in backend.calls.most_common():
+        print(f"  {service}.{operation:40} {count:7d} ({count / server_count:.2f} per server, "
+              f"{backend.throttled[(service, operation)]} throttled)")
+    print("summary report:")
+    for line in backend.messages[-1].split("\n\n")[0].splitlines()[3:]:
+        print(f"  {line}")
+    log_file.close()
+    workspace.cleanup()
+
+
+if __name__ == "__main__":
+    main()
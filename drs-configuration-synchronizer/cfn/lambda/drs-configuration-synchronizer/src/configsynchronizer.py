@@ -4,103 +4,277 @@
 import copy
 import csv
 import datetime
+import hashlib
+import importlib.util
+import io
+import json
 import os
+import queue
 import re
-import tempfile
+import threading
+import time
 import typing
 import uuid
-from ipaddress import ip_network
-from logging import WARNING, Handler, LogRecord
+import zlib
+from bisect import bisect_right
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from ipaddress import ip_address as parse_ip_address, ip_network
+from logging import WARNING, Filter, Handler, LogRecord
 from pathlib import Path
+from types import MappingProxyType
 from typing import Optional
 
 import boto3
-import yaml
+import botocore.session
 from aws_lambda_powertools import Logger
+from aws_lambda_powertools.metrics import Metrics, MetricUnit
 from botocore.config import Config
+from botocore.credentials import CredentialProvider, CredentialResolver, RefreshableCredentials
 from botocore.exceptions import ClientError
-from deepdiff import DeepDiff
+
+from configuration_bundle import (
+    CONFIGURATION_BUNDLE_PATH,
+    CONFIGURATION_PATH,
+    CONFIGURATION_PATH_DRS_LAUNCH_CONFIGURATIONS,
+    CONFIGURATION_PATH_DRS_REPLICATION_CONFIGURATIONS,
+    CONFIGURATION_PATH_EC2_LAUNCH_TEMPLATES,
+    EC2_LAUNCH_TEMPLATE_KEYS,
+    EXCLUSION_ALL,
+    EXCLUSION_NETWORK_CONFIGURATION,
+    LAUNCH_CONFIGURATION_KEYS,
+    REPLICATION_CONFIGURATION_KEYS,
+    ConfigurationBundle,
+    is_bundle_stale,
+    list_configured_accounts,
+    read_account_configuration,
+    read_configuration_directory
+)
+from s3_upload import S3StreamingUpload
+from shard_queue import SqsShardQueue
+from structural_diff import StructuralDiff
 
 logger = Logger(
     service="drs-configuration-synchronizer",
     log_record_order=["level", "message"])
 
-CONFIGURATION_PATH = Path(__file__).parent.joinpath("configuration")
-CONFIGURATION_PATH_EXCLUSIONS = "config-sync-exclusions.csv"
-CONFIGURATION_PATH_EC2_LAUNCH_TEMPLATES = "ec2-launch-templates"
-CONFIGURATION_PATH_DRS_LAUNCH_CONFIGURATIONS = "drs-launch-configurations"
-CONFIGURATION_PATH_DRS_REPLICATION_CONFIGURATIONS = "drs-replication-configurations"
-CONFIGURATION_ACCOUNT_DEFAULT_PATTERN = re.compile(r"defaults_for_account_(\d{12}).yml")
-# Match DRS source servers with <TAG_KEY> and <TAG_VALUE> to their settings in override_for_tag__<TAG_KEY>__<TAG_VALUE>.yml
-CONFIGURATION_OVERRIDE_PATTERN = re.compile(r"override_for_tag__([a-zA-Z0-9-]+)__([a-zA-Z0-9-]+).yml")
 REPORT_S3_KEY = 'configuration-synchronizer-report.csv'
-
-# See DRS update_launch_configuration section of boto3 SDK
-# https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/drs.html#drs.Client.update_launch_configuration
-LAUNCH_CONFIGURATION_KEYS = (
-    'copyPrivateIp',
-    'copyTags',
-    'launchDisposition',
-    'licensing',
-    'targetInstanceTypeRightSizingMethod'
+# The inventory report is also written in Parquet format under this key, for querying with Amazon Athena
+REPORT_PARQUET_S3_KEY = 'configuration-synchronizer-inventory/configuration-synchronizer-report.parquet'
+# none (default) to upload the inventory report uncompressed to REPORT_S3_KEY, or gzip to upload it gzipped to
+# REPORT_S3_KEY with a ".gz" suffix
+INVENTORY_COMPRESSION_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_INVENTORY_COMPRESSION"
+# true to also write the inventory report to REPORT_PARQUET_S3_KEY, which needs the pyarrow package
+INVENTORY_PARQUET_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_INVENTORY_PARQUET"
+# Network topology discovered by create_subnet_cidr_mapping is cached under this prefix, per account and region
+TOPOLOGY_CACHE_S3_PREFIX = 'configuration-synchronizer-cache/network-topology'
+# Seconds a cached topology is used without any EC2 call
+TOPOLOGY_CACHE_TTL_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_TOPOLOGY_CACHE_TTL"
+TOPOLOGY_CACHE_TTL_DEFAULT = 3600
+# Seconds after which full discovery runs even if the subnet fingerprint has not changed
+TOPOLOGY_CACHE_MAX_AGE_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_TOPOLOGY_CACHE_MAX_AGE"
+TOPOLOGY_CACHE_MAX_AGE_DEFAULT = 604800
+# Fingerprints of synchronized source servers are stored under this prefix, per account and region
+SERVER_STATE_S3_PREFIX = 'configuration-synchronizer-cache/server-state'
+# Seconds between full sweeps, which synchronize every source server whether or not its fingerprint has changed
+FULL_SWEEP_INTERVAL_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_FULL_SWEEP_INTERVAL"
+FULL_SWEEP_INTERVAL_DEFAULT = 604800
+# Included in every server fingerprint; changing it invalidates the fingerprints stored by previous runs
+SERVER_FINGERPRINT_VERSION = 1
+# Description of the launch template versions created by the synchronizer
+LAUNCH_TEMPLATE_VERSION_DESCRIPTION = "updated by DR configuration synchronizer"
+# Launch template versions created by the synchronizer and by drs-synch-ec2-tags-and-instance-type, the only
+# versions deleted by launch template compaction
+COMPACTED_LAUNCH_TEMPLATE_VERSION_DESCRIPTIONS = (
+    LAUNCH_TEMPLATE_VERSION_DESCRIPTION,
+    "updated instance type by drs-synch-ec2-tags-and-instance-type",
 )
-
-# See DRS update_replication_configuration section of boto3 SDK
-#  https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/drs.html#drs.Client.update_replication_configuration
-REPLICATION_CONFIGURATION_KEYS = (
-    'associateDefaultSecurityGroup',
-    'bandwidthThrottling',
-    'createPublicIP',
-    'dataPlaneRouting',
-    'defaultLargeStagingDiskType',
-    'ebsEncryption',
-    'ebsEncryptionKeyArn',
-    'replicationServerInstanceType',
-    'replicationServersSecurityGroupsIDs',
-    'stagingAreaSubnetId',
-    'stagingAreaTags',
-    'useDedicatedReplicationServer'
-)
-
-# See LaunchTemplateData in EC2 create_launch_template_version section of boto3 SDK
-# https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.create_launch_template_version
-EC2_LAUNCH_TEMPLATE_KEYS = (
-    'IamInstanceProfile',
-    'InstanceType',
-    'Monitoring',
-    'DisableApiTermination',
-    'InstanceInitiatedShutdownBehavior',
-    'TagSpecifications',
-    'CreditSpecification',
-    'CpuOptions',
-    'CapacityReservationSpecification',
-    'LicenseSpecifications',
-    'MetadataOptions',
-    'PrivateDnsNameOptions',
-    'MaintenanceOptions',
-    'DisableApiStop',
-    'SecurityGroupsIds',
-    'NetworkInterfaces'
+# Number of the latest versions created by these tools kept in each launch template, in addition to the default
+# version; launch template compaction is disabled when it is not set
+LAUNCH_TEMPLATE_VERSIONS_KEPT_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_LAUNCH_TEMPLATE_VERSIONS_KEPT"
+# Maximum number of versions in one DeleteLaunchTemplateVersions request
+LAUNCH_TEMPLATE_VERSION_DELETE_BATCH_SIZE = 200
+# Latest version of each launch template at its last compaction is stored under this prefix, per account and region
+LAUNCH_TEMPLATE_COMPACTION_S3_PREFIX = 'configuration-synchronizer-cache/launch-template-compaction'
+# ARN of a DRS source server, as listed in the resources of EventBridge events sent by DRS
+SOURCE_SERVER_ARN_PATTERN = re.compile(r"arn:[a-z-]+:drs:([a-z0-9-]+):(\d{12}):source-server/(s-[0-9a-zA-Z]+)")
+# Maximum number of source server ids in one DescribeSourceServers filter
+SOURCE_SERVER_ID_FILTER_SIZE = 200
+# Comma separated staging account ids and source server ids: when set, only the matching source servers are listed,
+# with DescribeSourceServers filters
+STAGING_ACCOUNT_IDS_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_STAGING_ACCOUNT_IDS"
+SOURCE_SERVER_IDS_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_SOURCE_SERVER_IDS"
+STAGING_ACCOUNT_ID_PATTERN = re.compile(r"\d{12}")
+SOURCE_SERVER_ID_PATTERN = re.compile(r"s-[0-9a-zA-Z]+")
+# Comma separated categories of source servers triaged from the DRS listing, see triage_source_server; extended source
+# servers are always triaged, other categories only when listed
+TRIAGE_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_TRIAGE"
+# Sharded runs: shards are queued in the SQS queue named by this variable, sharding is disabled when it is not set
+SHARD_QUEUE_URL_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_SHARD_QUEUE_URL"
+# Number of worker invocations started by the coordinator of a sharded run
+SHARD_WORKERS_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_SHARD_WORKERS"
+SHARD_WORKERS_DEFAULT = 4
+# Maximum number of source servers in one shard
+SHARD_SIZE_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_SHARD_SIZE"
+SHARD_SIZE_DEFAULT = 200
+# Seconds a claimed shard is hidden from other workers, should be at least the timeout of the lambda function
+SHARD_LEASE_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_SHARD_LEASE"
+SHARD_LEASE_DEFAULT = 300
+# Seconds the coordinator waits for every shard before merging the partial reports it has
+SHARD_RUN_TIMEOUT_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_SHARD_RUN_TIMEOUT"
+SHARD_RUN_TIMEOUT_DEFAULT = 3600
+# Workers stop claiming shards when fewer seconds than this are left before the lambda function times out
+SHARD_TIME_MARGIN_SECONDS = 120
+# Seconds the coordinator sleeps between checks for unfinished shards
+SHARD_POLL_SECONDS = 5
+# Manifests and partial reports of sharded runs, and checkpoints of runs continued in a new invocation, are stored
+# under this prefix, per run
+SHARD_RUN_S3_PREFIX = 'configuration-synchronizer-runs'
+# Name of the partial report holding the errors logged by the coordinator while creating shards
+SHARD_COORDINATOR = "coordinator"
+# Runs of synchronize_all stop starting new work when fewer seconds than this are left before the lambda function
+# times out, so the source servers in flight are finished and the checkpoint is stored in time, see RunCheckpoint
+CHECKPOINT_TIME_MARGIN_SECONDS = 60
+# Name of the object holding the work left by the last invocation of a checkpointed run
+RUN_CHECKPOINT_OBJECT = "checkpoint.json"
+# Seconds a checkpointed run may take over all its invocations before the servers left are deferred to the next run,
+# unset for no limit
+RUN_TIME_BUDGET_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_RUN_TIME_BUDGET"
+# Order of the source servers of an account and region: as listed by DRS, or most likely to have drifted first
+SERVER_ORDER_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_SERVER_ORDER"
+SERVER_ORDER_LISTING = "listing"
+SERVER_ORDER_DRIFT = "drift"
+SERVER_ORDERS = (SERVER_ORDER_LISTING, SERVER_ORDER_DRIFT)
+# Ranks of ConfigurationSynchronizer.drift_priority, synchronized in this order
+DRIFT_PRIORITY_NEW = 0
+DRIFT_PRIORITY_CHANGED = 1
+DRIFT_PRIORITY_UNCHANGED = 2
+# Number of AWS accounts synchronized concurrently by synchronize_all
+ACCOUNT_WORKERS_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_ACCOUNT_WORKERS"
+ACCOUNT_WORKERS_DEFAULT = 4
+# Number of regions of one AWS account synchronized concurrently, for accounts with a regions.yml
+REGION_WORKERS_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_REGION_WORKERS"
+REGION_WORKERS_DEFAULT = 4
+# Worker threads for each stage of the per-account pipeline in synchronize_account, and the size of the queues between them
+FETCH_WORKERS_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_FETCH_WORKERS"
+FETCH_WORKERS_DEFAULT = 4
+DESIRED_STATE_WORKERS_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_DESIRED_STATE_WORKERS"
+DESIRED_STATE_WORKERS_DEFAULT = 1
+DIFF_WORKERS_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_DIFF_WORKERS"
+DIFF_WORKERS_DEFAULT = 1
+APPLY_WORKERS_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_APPLY_WORKERS"
+APPLY_WORKERS_DEFAULT = 2
+PIPELINE_QUEUE_SIZE_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_PIPELINE_QUEUE_SIZE"
+PIPELINE_QUEUE_SIZE_DEFAULT = 20
+# Initial and maximum requests per second for each DRS/EC2 API operation, per account and region
+API_RATE_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_API_RATE"
+API_RATE_DEFAULT = 10
+API_MAXIMUM_RATE_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_API_MAXIMUM_RATE"
+API_MAXIMUM_RATE_DEFAULT = 50
+API_MINIMUM_RATE = 0.5
+# false to stop writing API call metrics as CloudWatch embedded metric format records to the function logs
+API_METRICS_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_API_METRICS"
+# CloudWatch namespace of the API call metrics, unless set by POWERTOOLS_METRICS_NAMESPACE
+API_METRICS_NAMESPACE_DEFAULT = "DRSConfigurationSynchronizer"
+# Account dimension of API calls made with the credentials of the lambda function, rather than an assumed role
+API_METRICS_EXECUTION_ACCOUNT = "execution"
+# Upper bounds, in milliseconds, of the buckets of API latency histograms; the last bucket has no upper bound
+API_LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Number of API operations listed in the summary report, by total latency
+API_SLOWEST_OPERATIONS_REPORTED = 5
+
+# verbose (default) to log every step for every source server, or compact to log one record per source server with
+# the outcome of each section, and every step only for a sample of source servers. Warnings and errors are always logged
+LOG_MODE_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_LOG_MODE"
+LOG_MODES = ("verbose", "compact")
+# Fraction of source servers logged step by step in compact mode, between 0 and 1
+LOG_SAMPLE_RATE_ENVIRONMENT_VARIABLE = "DR_CONFIGURATION_SYNCHRONIZER_LOG_SAMPLE_RATE"
+LOG_SAMPLE_RATE_DEFAULT = 0.01
+# Message of the record logged for each source server in compact mode
+SERVER_OUTCOME_MESSAGE = "source server synchronization finished"
+
+# Warning and error records kept as examples of each error class for the summary report
+ERROR_EXAMPLES_PER_CLASS = 2
+# Maximum numbers of examples and of error groups listed in the summary report
+REPORTED_ERROR_EXAMPLES = 10
+REPORTED_ERROR_GROUPS = 50
+# Length at which the message of a warning without an exception is cut to name its error class
+ERROR_CLASS_MESSAGE_LENGTH = 120
+
+# Error codes returned by AWS services when a request is throttled
+THROTTLING_ERROR_CODES = (
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'SlowDown'
 )
 
-# These are dynamically processed by this lambda function, so they are disallowed in configuration files.
-EC2_LAUNCH_TEMPLATE_KEYS_MANAGED = (
-    'NetworkInterfaces',
-    'BlockDeviceMappings'
+# Configuration sections synchronized for each source server
+SECTION_LAUNCH_TEMPLATE = "launch template"
+SECTION_LAUNCH_CONFIGURATION = "launch configuration"
+SECTION_TAGS = "source server tags"
+SECTION_REPLICATION_CONFIGURATION = "replication configuration"
+
+SECTIONS = (
+    SECTION_LAUNCH_TEMPLATE,
+    SECTION_LAUNCH_CONFIGURATION,
+    SECTION_TAGS,
+    SECTION_REPLICATION_CONFIGURATION
 )
 
-EXCLUSION_ALL = 'ExcludeAll'
-EXCLUSION_NETWORK_CONFIGURATION = 'ExcludeNetworkConfiguration'
-
-EXCLUSIONS = (
-    EXCLUSION_ALL,
-    EXCLUSION_NETWORK_CONFIGURATION
-)
+# Outcome of each configuration section of a source server, logged in compact mode
+OUTCOME_UNCHANGED = "unchanged"
+OUTCOME_UPDATED = "updated"
+OUTCOME_SKIPPED = "skipped"
+OUTCOME_FAILED = "failed"
+
+# Work skipped before any API call, counted in the summary report
+SKIPPED_EXCLUDED = "excluded server(s)"
+SKIPPED_NO_HOSTNAME = "server(s) without a hostname"
+SKIPPED_NOTHING_CONFIGURED = "{} section(s) with nothing configured"
+SKIPPED_DEFERRED = "server(s) deferred to the next run"
+SKIPPED_TRIAGED = "{} section(s) of {} server(s)"
+
+# Categories of source servers, from the DRS listing alone, see triage_source_server
+TRIAGE_REPLICATING = "replicating"
+TRIAGE_EXTENDED = "extended"
+TRIAGE_DISCONNECTED = "disconnected"
+TRIAGE_AGENTLESS = "agentless"
+# Categories triaged when DR_CONFIGURATION_SYNCHRONIZER_TRIAGE is not set, besides extended source servers
+TRIAGE_DEFAULT = ()
+# Sections not synchronized for the source servers of each category. The replication settings of an extended server
+# are managed in the account it replicates to, see https://docs.aws.amazon.com/drs/latest/userguide/multi-account.html.
+# A disconnected server keeps only its tags synchronized: no agent replicates it, so its launch and replication
+# settings are synchronized once it reconnects, which changes its fingerprint
+TRIAGE_SKIPPED_SECTIONS = {
+    TRIAGE_EXTENDED: (SECTION_REPLICATION_CONFIGURATION,),
+    TRIAGE_DISCONNECTED: (SECTION_LAUNCH_TEMPLATE, SECTION_LAUNCH_CONFIGURATION, SECTION_REPLICATION_CONFIGURATION),
+    TRIAGE_AGENTLESS: (),
+}
+# Replication settings not synchronized for the source servers of each category. Agentless servers are replicated
+# from snapshots rather than by the replication agent, which enforces the bandwidth throttling; their replication
+# configuration is not read at all when nothing else is configured
+TRIAGE_SKIPPED_REPLICATION_KEYS = {
+    TRIAGE_AGENTLESS: ("bandwidthThrottling",),
+}
+
+SECTION_UNCHANGED_MESSAGES = {
+    SECTION_LAUNCH_TEMPLATE: "launch template has not changed",
+    SECTION_LAUNCH_CONFIGURATION: "launch configuration has not changed",
+    SECTION_TAGS: "tags in server tag mapping have not changed",
+    SECTION_REPLICATION_CONFIGURATION: "replication configuration has not changed"
+}
 
 execution_region = os.getenv("AWS_REGION")
 logger.info("region is: {}".format(execution_region))
 
-boto_client_config = Config(retries={"max_attempts": 10, "mode": "standard"})
+# connection pool is sized for the workers of every pipeline stage sharing one client
+boto_client_config = Config(retries={"max_attempts": 10, "mode": "standard"}, max_pool_connections=25)
 sts = boto3.client("sts", config=boto_client_config)
 sns = boto3.client("sns", config=boto_client_config)
 s3 = boto3.resource('s3', config=boto_client_config)
@@ -110,64 +284,208 @@ class SynchronizerException(Exception):
     pass
 
 
+def classify_log_record(record: LogRecord) -> typing.Tuple[str, str]:
+    """
+    :param record: Warning or error log record
+    :return: Tuple of (error class, API operation or ""). The error class is the error code of an AWS service error,
+        the type of any other exception, or else the unformatted message of the record.
+    """
+    exception = record.exc_info[1] if record.exc_info else None
+    if isinstance(exception, ClientError):
+        return exception.response.get("Error", {}).get("Code") or "ClientError", exception.operation_name or ""
+    if exception is not None:
+        return type(exception).__name__, ""
+    return str(record.msg)[:ERROR_CLASS_MESSAGE_LENGTH], ""
+
+
 class RunReport:
 
     def __init__(self):
         """
         An object to track information used in summary notification sent to users.
         """
-        self.errors = []
         self.error_count = 0
+        # number of errors keyed by (error class, API operation, account), see classify_log_record
+        self.error_groups: typing.Dict[typing.Tuple[str, str, str], int] = {}
+        # formatted records of the first errors of each error class
+        self.error_examples: typing.Dict[str, typing.List[str]] = {}
         self.time_start = datetime.datetime.now(tz=datetime.timezone.utc)
         self.servers_processed = 0
-
-    def report_error(self, log_record: str):
+        self.servers_unchanged = 0
+        # work skipped before any API call, keyed by reason such as SKIPPED_EXCLUDED
+        self.skipped: typing.Dict[str, int] = {}
+        self.launch_template_versions_deleted = 0
+        self.rate_limit_wait_seconds = 0.0
+        self.throttled_requests = 0
+        self.api_operations: typing.Dict[str, OperationMetrics] = {}
+        self.lock = threading.Lock()
+
+    def report_error(self, record: LogRecord, format_record: typing.Callable[[LogRecord], str]):
         """
-        Record a log record for summary notification.
+        Count a warning or error record for summary notification. Records are only formatted when they are kept as
+        examples of their error class.
+
+        :param record: Log record
+        :param format_record: Function formatting the record
         """
-        self.error_count += 1
-        if len(self.errors) > 10:
-            return
-        self.errors.append(log_record)
+        error_class, operation = classify_log_record(record)
+        key = (error_class, operation, str(getattr(record, "account", "")))
+        with self.lock:
+            self.error_count += 1
+            self.error_groups[key] = self.error_groups.get(key, 0) + 1
+            examples = self.error_examples.setdefault(error_class, [])
+            if len(examples) < ERROR_EXAMPLES_PER_CLASS:
+                examples.append(format_record(record))
 
     def increment_servers_processed(self):
         """
         Increment the number of servers processed for summary report.
         """
-        self.servers_processed += 1
+        with self.lock:
+            self.servers_processed += 1
+
+    def increment_servers_unchanged(self, count: int):
+        """
+        Add to the number of servers skipped because they are unchanged since the previous run.
+        """
+        with self.lock:
+            self.servers_unchanged += count
+
+    def increment_skipped(self, reason: str):
+        """
+        Count a source server, or a section of one, skipped before any API call was made for it.
+
+        :param reason: Why the work was skipped, such as SKIPPED_EXCLUDED
+        """
+        with self.lock:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def increment_launch_template_versions_deleted(self, count: int):
+        """
+        Add to the number of launch template versions deleted by launch template compaction.
+        """
+        with self.lock:
+            self.launch_template_versions_deleted += count
+
+    def set_rate_limit_statistics(self, wait_seconds: float, throttled_requests: int):
+        """
+        Record time spent waiting on API rate limiters for summary report.
+
+        :param wait_seconds: Total seconds workers waited for rate limiter tokens
+        :param throttled_requests: Number of requests throttled by AWS services
+        """
+        self.rate_limit_wait_seconds = wait_seconds
+        self.throttled_requests = throttled_requests
+
+    def set_api_operations(self, api_operations: typing.Dict[str, "OperationMetrics"]):
+        """
+        Record API call metrics for summary report.
+
+        :param api_operations: Metrics of each API operation, as returned by ApiMetrics.summary
+        """
+        self.api_operations = api_operations
+
+    def to_dict(self) -> dict:
+        """
+        :return: Counters and errors of this report, stored as the partial report of a shard
+        """
+        with self.lock:
+            return dict(error_count=self.error_count,
+                        error_groups=[[*key, count] for key, count in self.error_groups.items()],
+                        error_examples={name: list(examples) for name, examples in self.error_examples.items()},
+                        servers_processed=self.servers_processed, servers_unchanged=self.servers_unchanged,
+                        skipped=dict(self.skipped),
+                        launch_template_versions_deleted=self.launch_template_versions_deleted,
+                        rate_limit_wait_seconds=self.rate_limit_wait_seconds,
+                        throttled_requests=self.throttled_requests,
+                        api_operations={name: metrics.to_dict() for name, metrics in self.api_operations.items()})
+
+    def merge(self, partial: dict):
+        """
+        Add the counters and errors of a partial report, as returned by to_dict, to this report.
+        """
+        with self.lock:
+            self.error_count += partial["error_count"]
+            for error_class, operation, account, count in partial["error_groups"]:
+                key = (error_class, operation, account)
+                self.error_groups[key] = self.error_groups.get(key, 0) + count
+            for error_class, examples in partial["error_examples"].items():
+                kept = self.error_examples.setdefault(error_class, [])
+                kept.extend(examples[:max(0, ERROR_EXAMPLES_PER_CLASS - len(kept))])
+            self.servers_processed += partial["servers_processed"]
+            self.servers_unchanged += partial["servers_unchanged"]
+            for reason, count in partial.get("skipped", {}).items():
+                self.skipped[reason] = self.skipped.get(reason, 0) + count
+            self.launch_template_versions_deleted += partial.get("launch_template_versions_deleted", 0)
+            self.rate_limit_wait_seconds += partial["rate_limit_wait_seconds"]
+            self.throttled_requests += partial["throttled_requests"]
+            for name, metrics in partial.get("api_operations", {}).items():
+                self.api_operations.setdefault(name, OperationMetrics()).merge(OperationMetrics.from_dict(metrics))
 
     def send(self):
         """
         Publish the summary report notification to sns
         """
         time_end = datetime.datetime.now(tz=datetime.timezone.utc)
-        send_report(self.time_start, time_end, self.servers_processed, self.error_count, self.errors)
+        send_report(self.time_start, time_end, self.servers_processed, self.error_count, self.error_groups,
+                    self.error_examples,
+                    servers_unchanged=self.servers_unchanged,
+                    skipped=self.skipped,
+                    launch_template_versions_deleted=self.launch_template_versions_deleted,
+                    rate_limit_wait_seconds=self.rate_limit_wait_seconds,
+                    throttled_requests=self.throttled_requests,
+                    api_operations=self.api_operations)
 
 
 class InventoryReport:
-
-    def __init__(self, local_file: typing.TextIO):
+    COLUMNS = ["AwsAccountId",
+               "SourceServerId",
+               "Hostname",
+               "ExcludeNetworkConfiguration",
+               "CopyPrivateIp",
+               "SourceServerIp",
+               "LaunchTemplateIp",
+               "LaunchTemplateSubnet",
+               "LaunchTemplateSecurityGroups",
+               "Region"]
+
+    def __init__(self, s3_client, bucket: str, compress: bool = False, columnar: bool = False):
         """
         Object to track information about source servers for building CSV summary reports.
-        :param local_file:
-        """
-        self.local_file = local_file
-        self.writer = csv.DictWriter(self.local_file,
-                                     ["AwsAccountId",
-                                      "SourceServerId",
-                                      "Hostname",
-                                      "ExcludeNetworkConfiguration",
-                                      "CopyPrivateIp",
-                                      "SourceServerIp",
-                                      "LaunchTemplateIp",
-                                      "LaunchTemplateSubnet",
-                                      "LaunchTemplateSecurityGroups"])
-        self.writer.writeheader()
+
+        Rows are streamed to the DR automation bucket as they are added, gzipped if `compress` is True, so the
+        report uses no space in /tmp. Use create_inventory_report to create a report with the settings of the
+        lambda function.
+
+        :param s3_client: Boto3 client for s3
+        :param bucket: Name of the DR automation bucket
+        :param compress: True to upload the CSV report gzipped, to the key REPORT_S3_KEY with a ".gz" suffix
+        :param columnar: True to also upload the report as a Parquet file, which needs the pyarrow package
+        """
+        self.key = REPORT_S3_KEY + ".gz" if compress else REPORT_S3_KEY
+        self.upload = S3StreamingUpload(s3_client, bucket, self.key, compress=compress,
+                                        ContentType="application/gzip" if compress else "text/csv",
+                                        ServerSideEncryption='aws:kms')
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.buffer = io.StringIO(newline='')
+        self.writer = csv.DictWriter(self.buffer, self.COLUMNS)
+        self.columns = {column: [] for column in self.COLUMNS} if columnar else None
         self.server_count = 0
+        self.lock = threading.Lock()
+        with self.lock:
+            self.writer.writeheader()
+            self._flush_buffer()
+
+    def _flush_buffer(self):
+        self.upload.write(self.buffer.getvalue().encode("utf-8"))
+        self.buffer.seek(0)
+        self.buffer.truncate()
 
     def add_server(self, aws_account_id: str, source_server_id: str, hostname: str,
                    is_network_configuration_excluded: bool, copy_private_ip: bool, source_server_ip: str,
-                   launch_template_ip: str, launch_template_subnet: str, launch_template_security_group: str):
+                   launch_template_ip: str, launch_template_subnet: str, launch_template_security_group: str,
+                   region: Optional[str] = None):
         """
 
         :param aws_account_id: AWS Account id in which the source server resides
@@ -179,40 +497,106 @@ class InventoryReport:
         :param launch_template_ip: IP address associated with launch template
         :param launch_template_subnet: Subnet id associated with launch template
         :param launch_template_security_group: EC2 security group associated with launch template
+        :param region: AWS region of the DRS source server
         :return:
         """
-        self.server_count += 1
-        self.writer.writerow(
-            dict(
-                AwsAccountId=aws_account_id,
-                SourceServerId=source_server_id,
-                Hostname=hostname,
-                ExcludeNetworkConfiguration=is_network_configuration_excluded,
-                CopyPrivateIp=copy_private_ip,
-                SourceServerIp=source_server_ip,
-                LaunchTemplateIp=launch_template_ip,
-                LaunchTemplateSubnet=launch_template_subnet,
-                LaunchTemplateSecurityGroups=launch_template_security_group
-            )
+        row = dict(
+            AwsAccountId=aws_account_id,
+            SourceServerId=source_server_id,
+            Hostname=hostname,
+            ExcludeNetworkConfiguration=is_network_configuration_excluded,
+            CopyPrivateIp=copy_private_ip,
+            SourceServerIp=source_server_ip,
+            LaunchTemplateIp=launch_template_ip,
+            LaunchTemplateSubnet=launch_template_subnet,
+            LaunchTemplateSecurityGroups=launch_template_security_group,
+            Region=region
         )
+        with self.lock:
+            self.server_count += 1
+            self.writer.writerow(row)
+            self._flush_buffer()
+            if self.columns is not None:
+                for column, value in row.items():
+                    self.columns[column].append(value)
+
+    def write_to_s3(self):
+        """
+        Finish uploading the CSV report to the DR automation S3 bucket, and upload the Parquet report if enabled.
+        """
+        with self.lock:
+            size = self.upload.close()
+        logger.info("wrote csv report with %d server(s) to s3://%s/%s (%d bytes)",
+                    self.server_count, self.bucket, self.key, size)
+        if self.columns is not None:
+            self.write_parquet_to_s3()
+
+    def write_parquet_to_s3(self):
+        """
+        Upload the report as a Parquet file, for querying the inventory of every run with Amazon Athena.
+        """
+        import pyarrow
+        import pyarrow.parquet
+        schema = pyarrow.schema([
+            ("AwsAccountId", pyarrow.string()),
+            ("SourceServerId", pyarrow.string()),
+            ("Hostname", pyarrow.string()),
+            ("ExcludeNetworkConfiguration", pyarrow.bool_()),
+            ("CopyPrivateIp", pyarrow.bool_()),
+            ("SourceServerIp", pyarrow.string()),
+            ("LaunchTemplateIp", pyarrow.string()),
+            ("LaunchTemplateSubnet", pyarrow.string()),
+            ("LaunchTemplateSecurityGroups", pyarrow.list_(pyarrow.string())),
+            ("Region", pyarrow.string()),
+        ])
+        table = pyarrow.table(self.columns, schema=schema)
+        body = io.BytesIO()
+        pyarrow.parquet.write_table(table, body, compression="snappy")
+        logger.info("writing parquet report with %d server(s) to s3://%s/%s",
+                    self.server_count, self.bucket, REPORT_PARQUET_S3_KEY)
+        self.s3_client.put_object(Bucket=self.bucket, Key=REPORT_PARQUET_S3_KEY, Body=body.getvalue(),
+                                  ServerSideEncryption='aws:kms', ContentType="application/vnd.apache.parquet")
+
+    def abort(self):
+        """
+        Discard the report after a failed run, deleting the parts already uploaded.
+        """
+        with self.lock:
+            self.upload.abort()
+
 
-    def write_to_s3(self, s3):
+def create_inventory_report() -> InventoryReport:
+    """
+    :return: InventoryReport with the compression and columnar output set by the environment variables
+        DR_CONFIGURATION_SYNCHRONIZER_INVENTORY_COMPRESSION and DR_CONFIGURATION_SYNCHRONIZER_INVENTORY_PARQUET
+    """
+    compression = os.getenv(INVENTORY_COMPRESSION_ENVIRONMENT_VARIABLE, "none").strip().lower() or "none"
+    if compression not in ("gzip", "none"):
+        raise SynchronizerException(
+            f"environment variable {INVENTORY_COMPRESSION_ENVIRONMENT_VARIABLE} must be gzip or none, got: {compression}")
+    columnar = os.getenv(INVENTORY_PARQUET_ENVIRONMENT_VARIABLE, "false").strip().lower() == "true"
+    if columnar and importlib.util.find_spec("pyarrow") is None:
+        logger.warning("pyarrow is not installed, parquet inventory report is not written")
+        columnar = False
+    return InventoryReport(s3.meta.client, os.environ['DR_AUTOMATION_BUCKET'], compress=compression == "gzip",
+                           columnar=columnar)
+
+
+class ShardInventory:
+    def __init__(self):
         """
-        Upload CSV report to DR automation S3 bucket.
-        :param s3: Boto3 Resource object for s3
-        :return:
+        Collects the InventoryReport rows of one shard, stored with its partial report and written to the CSV report
+        when the partial reports of a sharded run are merged.
         """
-        bucket = os.environ['DR_AUTOMATION_BUCKET']
-        logger.info("writing csv report with %d server(s) to s3://%s/%s", self.server_count, bucket, REPORT_S3_KEY)
-        self.local_file.close()
-        with open(self.local_file.name, 'rb') as file:
-            s3.Object(bucket_name=bucket, key=REPORT_S3_KEY).put(
-                Body=file,
-                ServerSideEncryption='aws:kms',
-                Metadata={
-                    "Content-Type": "text/csv"
-                }
-            )
+        self.servers = []
+        self.lock = threading.Lock()
+
+    def add_server(self, **server):
+        """
+        :param server: Keyword arguments for InventoryReport.add_server
+        """
+        with self.lock:
+            self.servers.append(server)
 
 
 class ReportLoggingHandler(Handler):
@@ -232,7 +616,54 @@ class ReportLoggingHandler(Handler):
 
     def emit(self, record: LogRecord):
         if self.run_report:
-            self.run_report.report_error(self.format(record))
+            self.run_report.report_error(record, self.format)
+
+
+class LogContextFilter(Filter):
+    def __init__(self):
+        """
+        Logging filter that adds the calling thread's log keys (account, server, host) to each log record.
+
+        Used instead of `logger.append_keys`, which is shared by every thread, so that concurrent
+        account workers each log with their own context.
+        """
+        super().__init__()
+        self.local = threading.local()
+
+    def get_keys(self) -> dict:
+        """
+        :return: Log keys of the calling thread
+        """
+        return getattr(self.local, "keys", {})
+
+    def append_keys(self, **keys):
+        """
+        Add keys to the log context of the calling thread.
+        """
+        self.local.keys = {**self.get_keys(), **keys}
+
+    def remove_keys(self, keys: typing.Iterable[str]):
+        """
+        Remove keys from the log context of the calling thread.
+        """
+        self.local.keys = {k: v for k, v in self.get_keys().items() if k not in keys}
+
+    @contextmanager
+    def context(self, **keys):
+        """
+        Add keys to the log context of the calling thread, restoring the previous context on exit.
+        """
+        previous = self.get_keys()
+        self.append_keys(**keys)
+        try:
+            yield
+        finally:
+            self.local.keys = previous
+
+    def filter(self, record: LogRecord):
+        for key, value in self.get_keys().items():
+            record.__dict__.setdefault(key, value)
+        return True
 
 
 # setup log handler for run reports
@@ -241,179 +672,1867 @@ report_logging_handler.setFormatter(logger.registered_formatter)
 report_logging_handler.setLevel(WARNING)
 logger.addHandler(report_logging_handler)
 
+# setup per thread log keys
+log_context = LogContextFilter()
+logger.addFilter(log_context)
 
-def create_host_to_tag_mapping(config_file: typing.TextIO):
-    """
-    Ingests a CSV file and returns map of hostnames associated with desired tags.
 
-    :param config_file: CSV file that lists hostnames in "Name" column and desired tags in remaining columns.
-    :return: Dictionary of hostnames mapped to a dictionary of tag key / values
+class ServerLogSampler(Filter):
+    def __init__(self):
+        """
+        Logging filter that drops the info and debug records logged while synchronizing a source server, except for
+        a sample of source servers, when the compact log mode is selected.
+
+        Warnings and errors always pass, so they still reach the ReportLoggingHandler.
+        """
+        super().__init__()
+        self.compact = False
+        self.sample_rate = 1.0
+        # servers sampled change from one invocation to the next
+        self.salt = uuid.uuid4().hex
+
+    def configure(self, mode: str, sample_rate: float):
+        """
+        :param mode: One of LOG_MODES
+        :param sample_rate: Fraction of source servers logged step by step in compact mode
+        """
+        if mode not in LOG_MODES:
+            raise SynchronizerException(f"log mode must be one of {', '.join(LOG_MODES)}, got: {mode}")
+        if not 0 <= sample_rate <= 1:
+            raise SynchronizerException(f"log sample rate must be between 0 and 1, got: {sample_rate}")
+        self.compact = mode == "compact"
+        self.sample_rate = sample_rate
+
+    def configure_from_environment(self):
+        """
+        Configure from DR_CONFIGURATION_SYNCHRONIZER_LOG_MODE and DR_CONFIGURATION_SYNCHRONIZER_LOG_SAMPLE_RATE,
+        keeping the verbose mode if they are not valid.
+        """
+        mode = os.getenv(LOG_MODE_ENVIRONMENT_VARIABLE, "verbose").strip().lower() or "verbose"
+        try:
+            self.configure(mode, float(os.getenv(LOG_SAMPLE_RATE_ENVIRONMENT_VARIABLE, LOG_SAMPLE_RATE_DEFAULT)))
+        except (SynchronizerException, ValueError) as e:
+            logger.warning("invalid logging configuration, logging every step: %s", e)
+
+    def is_sampled(self, source_server_id: str) -> bool:
+        """
+        :return: True if every step of the source server is logged
+        """
+        return zlib.crc32(f"{self.salt}/{source_server_id}".encode("utf-8")) < self.sample_rate * 2 ** 32
+
+    def filter(self, record: LogRecord):
+        if not self.compact or record.levelno >= WARNING or record.msg == SERVER_OUTCOME_MESSAGE:
+            return True
+        source_server_id = log_context.get_keys().get("server")
+        return source_server_id is None or self.is_sampled(source_server_id)
+
+
+server_log_sampler = ServerLogSampler()
+server_log_sampler.configure_from_environment()
+logger.addFilter(server_log_sampler)
+
+
+class LazyLogValue:
+    def __init__(self, render: typing.Callable[[], typing.Any]):
+        """
+        Log value built only when a record holding it is formatted, so records dropped by a filter or the log level
+        cost nothing to build. The logger's JSON formatter calls str on it.
+
+        :param render: Function returning the value
+        """
+        self.render = render
+
+    def __str__(self):
+        return str(self.render())
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate: float, minimum_rate: float, maximum_rate: float):
+        """
+        Token bucket limiting the request rate of one API operation.
+
+        The rate is halved each time a request is throttled and grows back slowly with each successful request.
+
+        :param rate: Initial requests per second, also the size of the bucket
+        :param minimum_rate: Lowest requests per second the rate can be reduced to
+        :param maximum_rate: Highest requests per second the rate can grow to
+        """
+        self.rate = rate
+        self.minimum_rate = minimum_rate
+        self.maximum_rate = maximum_rate
+        self.capacity = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.wait_seconds = 0.0
+        self.throttles = 0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take a token from the bucket, sleeping until it is available.
+
+        Callers that find the bucket empty reserve a future token, so concurrent callers are spaced out
+        instead of waking up together.
+
+        :return: Seconds spent waiting
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.wait_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def record_throttle(self):
+        """
+        Halve the request rate after a throttled request.
+        """
+        with self.lock:
+            self.throttles += 1
+            self.rate = max(self.minimum_rate, self.rate / 2)
+
+    def record_success(self):
+        """
+        Grow the request rate after a successful request.
+        """
+        with self.lock:
+            self.rate = min(self.maximum_rate, self.rate + self.minimum_rate / 5)
+
+
+class ApiRateLimiters:
+    HANDLER_ID = "drs-configuration-synchronizer-rate-limiter"
+
+    def __init__(self):
+        """
+        Registry of AdaptiveRateLimiter objects keyed by account, region, service and API operation.
+
+        Every client attached for the same account and region shares the same limiters, so all workers
+        calling an operation draw from one bucket. Limiters outlive a single run so warm invocations
+        start at the rate learned by the previous run.
+        """
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def get(self, account_id: str, region: str, service: str, operation: str) -> AdaptiveRateLimiter:
+        """
+        :return: The limiter for an API operation, created if it does not exist yet
+        """
+        key = (account_id, region, service, operation)
+        with self.lock:
+            if key not in self.limiters:
+                self.limiters[key] = AdaptiveRateLimiter(
+                    rate=get_environment_int(API_RATE_ENVIRONMENT_VARIABLE, API_RATE_DEFAULT),
+                    minimum_rate=API_MINIMUM_RATE,
+                    maximum_rate=get_environment_int(API_MAXIMUM_RATE_ENVIRONMENT_VARIABLE, API_MAXIMUM_RATE_DEFAULT))
+            return self.limiters[key]
+
+    def attach(self, client, account_id: str):
+        """
+        Rate limit every request sent by a boto3 client, including retries, using botocore event hooks.
+
+        :param client: boto3 client
+        :param account_id: AWS account id the client calls
+        """
+        region = client.meta.region_name
+        service = client.meta.service_model.service_name
+
+        def before_send(event_name: str, **kwargs):
+            self.get(account_id, region, service, event_name.rsplit(".", 1)[-1]).acquire()
+
+        def needs_retry(operation, response=None, **kwargs):
+            if response is None:
+                return None
+            http_response, parsed = response
+            limiter = self.get(account_id, region, service, operation.name)
+            if http_response.status_code == 429 or parsed.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+                limiter.record_throttle()
+            elif http_response.status_code < 400:
+                limiter.record_success()
+            return None
+
+        client.meta.events.register("before-send", before_send, unique_id=f"{self.HANDLER_ID}-before-send")
+        client.meta.events.register("needs-retry", needs_retry, unique_id=f"{self.HANDLER_ID}-needs-retry")
+
+    def statistics(self) -> typing.Tuple[float, int]:
+        """
+        :return: Tuple of (seconds spent waiting for tokens, number of throttled requests) since the last reset
+        """
+        with self.lock:
+            limiters = list(self.limiters.values())
+        return sum(limiter.wait_seconds for limiter in limiters), sum(limiter.throttles for limiter in limiters)
+
+    def reset_statistics(self):
+        """
+        Reset wait time and throttle counters at the start of a run, keeping the learned rates.
+        """
+        with self.lock:
+            limiters = list(self.limiters.values())
+        for limiter in limiters:
+            with limiter.lock:
+                limiter.wait_seconds = 0.0
+                limiter.throttles = 0
+
+
+api_rate_limiters = ApiRateLimiters()
+
+
+class OperationMetrics:
+    def __init__(self):
+        """
+        Call, retry, throttle and error counters of one API operation, with a histogram of the latency of each attempt.
+        """
+        self.calls = 0
+        self.retries = 0
+        self.throttles = 0
+        self.errors = 0
+        self.latency_ms = 0.0
+        self.latency_max_ms = 0.0
+        self.latency_histogram = [0] * (len(API_LATENCY_BUCKETS_MS) + 1)
+        self.lock = threading.Lock()
+
+    def record(self, attempt: int, latency_ms: float, throttled: bool, failed: bool):
+        """
+        Record one attempt of a call.
+
+        :param attempt: Number of the attempt, 1 for the first attempt of a call and more for retries
+        :param latency_ms: Milliseconds from sending the request to receiving the response
+        :param throttled: True if the request was throttled
+        :param failed: True if the request was answered with an error, or no response was received
+        """
+        with self.lock:
+            if attempt > 1:
+                self.retries += 1
+            else:
+                self.calls += 1
+            self.throttles += throttled
+            self.errors += failed
+            self.latency_ms += latency_ms
+            self.latency_max_ms = max(self.latency_max_ms, latency_ms)
+            self.latency_histogram[bisect_right(API_LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+    def attempts(self) -> int:
+        return sum(self.latency_histogram)
+
+    def average_latency_ms(self) -> float:
+        attempts = self.attempts()
+        return self.latency_ms / attempts if attempts else 0.0
+
+    def latency_percentile_ms(self, fraction: float) -> float:
+        """
+        :param fraction: Fraction of attempts, for example 0.9 for the 90th percentile
+        :return: Upper bound of the histogram bucket holding the percentile, at most the highest latency seen
+        """
+        threshold = fraction * self.attempts()
+        count = 0
+        for bound, bucket_count in zip(API_LATENCY_BUCKETS_MS, self.latency_histogram):
+            count += bucket_count
+            if count >= threshold:
+                return min(bound, self.latency_max_ms)
+        return self.latency_max_ms
+
+    def merge(self, other: "OperationMetrics"):
+        """
+        Add the counters and histogram of another OperationMetrics to this one.
+        """
+        with self.lock:
+            self.calls += other.calls
+            self.retries += other.retries
+            self.throttles += other.throttles
+            self.errors += other.errors
+            self.latency_ms += other.latency_ms
+            self.latency_max_ms = max(self.latency_max_ms, other.latency_max_ms)
+            self.latency_histogram = [a + b for a, b in zip(self.latency_histogram, other.latency_histogram)]
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return dict(calls=self.calls, retries=self.retries, throttles=self.throttles, errors=self.errors,
+                        latency_ms=self.latency_ms, latency_max_ms=self.latency_max_ms,
+                        latency_histogram=list(self.latency_histogram))
+
+    @classmethod
+    def from_dict(cls, body: dict) -> "OperationMetrics":
+        metrics = cls()
+        for name, value in body.items():
+            setattr(metrics, name, value)
+        return metrics
+
+
+class ApiMetrics:
+    HANDLER_ID = "drs-configuration-synchronizer-api-metrics"
+
+    def __init__(self):
+        """
+        Registry of OperationMetrics objects keyed by account, region, service and API operation, filled by botocore
+        event hooks on every attached client.
+        """
+        self.operations = {}
+        self.lock = threading.Lock()
+        # requests are sent synchronously, so each thread has at most one request in flight
+        self.local = threading.local()
+
+    def get(self, account_id: str, region: str, service: str, operation: str) -> OperationMetrics:
+        """
+        :return: The metrics of an API operation, created if they do not exist yet
+        """
+        key = (account_id, region, service, operation)
+        with self.lock:
+            if key not in self.operations:
+                self.operations[key] = OperationMetrics()
+            return self.operations[key]
+
+    def attach(self, client, account_id: str):
+        """
+        Measure every request sent by a boto3 client, including retries, using botocore event hooks.
+
+        Attach clients after api_rate_limiters, so time spent waiting on a rate limiter is not counted as latency.
+
+        :param client: boto3 client
+        :param account_id: AWS account id the client calls, or API_METRICS_EXECUTION_ACCOUNT
+        """
+        region = client.meta.region_name
+        service = client.meta.service_model.service_name
+
+        def before_send(**kwargs):
+            self.local.sent = time.monotonic()
+
+        def needs_retry(operation, attempts=1, response=None, caught_exception=None, **kwargs):
+            sent = getattr(self.local, "sent", None)
+            latency_ms = (time.monotonic() - sent) * 1000 if sent is not None else 0.0
+            if response is not None:
+                http_response, parsed = response
+                throttled = (http_response.status_code == 429
+                             or parsed.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES)
+                failed = http_response.status_code >= 400
+            else:
+                throttled = False
+                failed = caught_exception is not None
+            self.get(account_id, region, service, operation.name).record(attempts, latency_ms, throttled, failed)
+            return None
+
+        client.meta.events.register("before-send", before_send, unique_id=f"{self.HANDLER_ID}-before-send")
+        client.meta.events.register("needs-retry", needs_retry, unique_id=f"{self.HANDLER_ID}-needs-retry")
+
+    def reset(self):
+        """
+        Drop the metrics of the previous run.
+        """
+        with self.lock:
+            self.operations = {}
+
+    def summary(self) -> typing.Dict[str, OperationMetrics]:
+        """
+        :return: Metrics of each API operation summed over accounts and regions, keyed by "service.Operation"
+        """
+        with self.lock:
+            operations = list(self.operations.items())
+        summary = {}
+        for (_, _, service, operation), metrics in operations:
+            summary.setdefault(f"{service}.{operation}", OperationMetrics()).merge(metrics)
+        return summary
+
+    def publish(self):
+        """
+        Write one CloudWatch embedded metric format record for each account, region and API operation to the
+        function logs, unless disabled by DR_CONFIGURATION_SYNCHRONIZER_API_METRICS.
+
+        Each record is the metric set of a powertools Metrics object, serialized and printed, then cleared along
+        with its dimensions and metadata, so each record only holds the dimensions and metrics of one operation.
+        """
+        if os.getenv(API_METRICS_ENVIRONMENT_VARIABLE, "true").strip().lower() == "false":
+            return
+        namespace = os.getenv("POWERTOOLS_METRICS_NAMESPACE") or API_METRICS_NAMESPACE_DEFAULT
+        with self.lock:
+            operations = list(self.operations.items())
+        manager = Metrics(namespace=namespace, service=logger.service)
+        for (account_id, region, service, operation), metrics in operations:
+            manager.add_dimension(name="Account", value=account_id)
+            manager.add_dimension(name="Region", value=region)
+            manager.add_dimension(name="Operation", value=f"{service}.{operation}")
+            manager.add_metric(name="ApiCalls", unit=MetricUnit.Count, value=metrics.calls)
+            manager.add_metric(name="ApiRetries", unit=MetricUnit.Count, value=metrics.retries)
+            manager.add_metric(name="ApiThrottles", unit=MetricUnit.Count, value=metrics.throttles)
+            manager.add_metric(name="ApiErrors", unit=MetricUnit.Count, value=metrics.errors)
+            manager.add_metric(name="ApiLatencyAverage", unit=MetricUnit.Milliseconds,
+                               value=metrics.average_latency_ms())
+            manager.add_metric(name="ApiLatencyP90", unit=MetricUnit.Milliseconds,
+                               value=metrics.latency_percentile_ms(0.9))
+            manager.add_metric(name="ApiLatencyMaximum", unit=MetricUnit.Milliseconds, value=metrics.latency_max_ms)
+            # histogram buckets are searchable in CloudWatch Logs Insights, but are not metrics
+            labels = [f"le_{bound}ms" for bound in API_LATENCY_BUCKETS_MS] + [f"gt_{API_LATENCY_BUCKETS_MS[-1]}ms"]
+            manager.add_metadata(key="ApiLatencyHistogram", value=dict(zip(labels, metrics.latency_histogram)))
+            print(json.dumps(manager.serialize_metric_set(), separators=(",", ":")))
+            manager.clear_metrics()
+
+
+api_metrics = ApiMetrics()
+api_metrics.attach(sts, API_METRICS_EXECUTION_ACCOUNT)
+api_metrics.attach(sns, API_METRICS_EXECUTION_ACCOUNT)
+api_metrics.attach(s3.meta.client, API_METRICS_EXECUTION_ACCOUNT)
+
+
+def record_api_statistics(run_report: RunReport):
     """
-    config_csv = csv.DictReader(config_file)
-    mapping = {}
-    for row in config_csv:
-        server_name = row.pop("Name").lower()
-        mapping[server_name] = {k: v for k, v in row.items() if v != ""}
-    logger.info("loaded tag mapping for source servers", extra={"server_count": len(mapping)})
-    return mapping
+    Copy the rate limiter and API call statistics of this invocation to a run report, and publish the API call
+    metrics.
+    """
+    run_report.set_rate_limit_statistics(*api_rate_limiters.statistics())
+    run_report.set_api_operations(api_metrics.summary())
+    api_metrics.publish()
 
 
-def create_server_exclusion_list(config_file: typing.TextIO):
+def list_tagged_subnets(ec2) -> typing.List[dict]:
     """
-    Ingests a CSV file and creates a map of hostnames associated with feature flag toggles.
-    :param config_file: CSV file with hostname in Name column, and feature toggles in remaining columns.
-    :return: Dictionary with hostname and a list of exclusions set to "true"
+    :param ec2: Boto3 client for ec2
+    :return: List of subnets tagged with drstarget=true, as returned by "DescribeSubnets"
     """
-    config_csv = csv.DictReader(config_file)
-    mapping = {}
-    for row in config_csv:
-        hostname = row.get("Name")
-        if hostname is not None:
-            exclusions = tuple([k for k in row if row[k] == "true" and k in EXCLUSIONS])
-            mapping[hostname.lower()] = exclusions
-    logger.info("loaded server exclusion list", extra={"server_count": len(mapping)})
-    return mapping
+    logger.info("looking up subnet cidr information")
+    subnet_paginator = ec2.get_paginator('describe_subnets')
+    return [
+        subnet
+        for page in subnet_paginator.paginate(Filters=[{"Name": 'tag:drstarget', "Values": ["true"]}])
+        for subnet in page["Subnets"]
+    ]
 
 
-def create_subnet_cidr_mapping(ec2):
+def create_subnet_cidr_mapping(ec2, tagged_subnets: Optional[typing.List[dict]] = None):
     """
     Builds a mapping of CIDR masks associated with networking information.
 
+    Discovery is done in one pass: the tagged subnets are listed once, then the names of all their VPCs
+    are resolved with one describe_vpcs call and all "<VPC>-sg" security groups with one filtered
+    describe_security_groups call for every 200 VPCs.
+
     :param ec2: Boto3 client for ec2
-    :return: Dictionary with CIDR mask and tuples of networking information (subnet, security group, vpc id)
+    :param tagged_subnets: List as returned by list_tagged_subnets, retrieved if not provided
+    :return: SubnetCidrIndex with CIDR mask and tuples of networking information (subnet, security group, vpc id)
     """
     cidr_subnet_mapping = {}
-    logger.info("looking up subnet cidr information")
-    subnet_paginator = ec2.get_paginator('describe_subnets')
-
-    vpcs = {}
-    vpcs_ignored = []
-    tagged_subnets = subnet_paginator.paginate(Filters=[{"Name": 'tag:drstarget', "Values": ["true"]}])
-    total_tagged_subnets = len(list(tagged_subnets))
-    logger.info("found {} tagged subnets".format(total_tagged_subnets))
-    if total_tagged_subnets < 1:
+    if tagged_subnets is None:
+        tagged_subnets = list_tagged_subnets(ec2)
+    logger.info("found {} tagged subnets".format(len(tagged_subnets)))
+    if len(tagged_subnets) < 1:
         message = "No subnets with tag drstarget and value: true found."
         logger.error(message)
-        raise
+        raise SynchronizerException(message)
+
+    # find security group with a name tag that matched "<VPC>-sg"
+    # where "<VPC>" is the value of Name tag of the VPC.
+    vpc_ids = sorted({subnet['VpcId'] for subnet in tagged_subnets})
+    expected_security_group_names = {}
+    for page in ec2.get_paginator('describe_vpcs').paginate(VpcIds=vpc_ids):
+        for vpc in page["Vpcs"]:
+            names = [tag["Value"] for tag in vpc.get("Tags", []) if tag["Key"] == "Name"]
+            if len(names) < 1:
+                logger.warning("VPC {} is tagged as drstarget but has no Name tag".format(vpc["VpcId"]))
+                continue
+            expected_security_group_names[vpc["VpcId"]] = names[0] + "-sg"
+
+    security_groups = {}
+    named_vpc_ids = sorted(expected_security_group_names)
+    # EC2 accepts at most 200 values per filter
+    for i in range(0, len(named_vpc_ids), 200):
+        chunk = named_vpc_ids[i:i + 200]
+        pages = ec2.get_paginator('describe_security_groups').paginate(Filters=[
+            {"Name": "tag:Name", "Values": sorted({expected_security_group_names[vpc_id] for vpc_id in chunk})},
+            {"Name": "vpc-id", "Values": chunk}
+        ])
+        for page in pages:
+            for security_group in page["SecurityGroups"]:
+                for tag in security_group.get("Tags", []):
+                    if tag["Key"] == "Name":
+                        security_groups.setdefault((security_group["VpcId"], tag["Value"]), security_group["GroupId"])
+
+    vpc_security_groups = {}
+    for vpc_id in vpc_ids:
+        expected_name = expected_security_group_names.get(vpc_id)
+        if expected_name is None:
+            continue
+        security_group_id = security_groups.get((vpc_id, expected_name))
+        # if no expected security groups are found, ignore this VPC
+        if security_group_id is None:
+            logger.warning("VPC {} is tagged as drstarget but contains no matching sg with name: {}".format(
+                vpc_id, expected_name))
+        else:
+            vpc_security_groups[vpc_id] = security_group_id
+            logger.info("Found target vpc {} with security group: {}".format(vpc_id, security_group_id))
+
     # for each VPC subnet tagged with drstarget=true
-    for page in tagged_subnets:
-        for subnet in page["Subnets"]:
-
-            # find security group with a name tag that matched "<VPC>-sg"
-            # where "<VPC>" is the value of Name tag of the VPC.
-            if subnet['VpcId'] not in vpcs and subnet['VpcId'] not in vpcs_ignored:
-                response = ec2.describe_vpcs(VpcIds=[subnet['VpcId']])
-                name = [tag["Value"] for tag in response["Vpcs"][0]["Tags"] if tag["Key"] == "Name"][0]
-                vpcs[subnet['VpcId']] = {}
-                vpcs[subnet['VpcId']]["name"] = name
-
-                expected_name = name + "-sg"
-                try:
-                    response = ec2.describe_security_groups(Filters=[
-                        {"Name": "tag:Name", "Values": [expected_name]}
-                    ])
-                except Exception as e:
-                    logger.error(e)
-                # if no expected security groups are found, ignore this VPC
-                if len(response["SecurityGroups"]) < 1:
-                    logger.warning("VPC {} is tagged as drstarget but contains no matching sg with name: {}".format(
-                        subnet['VpcId'], expected_name))
-                    vpcs_ignored.append(subnet['VpcId'])
-                else:
-                    security_group_id = response["SecurityGroups"][0]["GroupId"]
-                    vpcs[subnet['VpcId']]["security_group_id"] = security_group_id
-                    logger.info(
-                        "Found target vpc {} with security group: {}".format(subnet['VpcId'], security_group_id))
-
-            if subnet['VpcId'] not in vpcs_ignored:
-                cidr_subnet_mapping[subnet['CidrBlock']] = (
-                    subnet['SubnetId'], [vpcs[subnet['VpcId']]["security_group_id"]], subnet['VpcId'])
-            else:
-                logger.warning("could not find VPC security group for subnet; ignoring subnet", extra={
-                    "subnet_id": subnet['SubnetId'],
-                    "subnet_cidr": subnet['CidrBlock'],
-                    "vpc_id": subnet['VpcId'],
-                })
+    for subnet in tagged_subnets:
+        if subnet['VpcId'] in vpc_security_groups:
+            cidr_subnet_mapping[subnet['CidrBlock']] = (
+                subnet['SubnetId'], [vpc_security_groups[subnet['VpcId']]], subnet['VpcId'])
+        else:
+            logger.warning("could not find VPC security group for subnet; ignoring subnet", extra={
+                "subnet_id": subnet['SubnetId'],
+                "subnet_cidr": subnet['CidrBlock'],
+                "vpc_id": subnet['VpcId'],
+            })
 
     logger.info(f"found {len(cidr_subnet_mapping)} subnets with tag drstarget=true, properties: {cidr_subnet_mapping}",
                 extra=dict(mapping=cidr_subnet_mapping))
-    return cidr_subnet_mapping
+    return SubnetCidrIndex(cidr_subnet_mapping)
+
+
+class SubnetCidrIndex(Mapping):
+    def __init__(self, cidr_subnet_mapping: dict):
+        """
+        Read-only mapping of CIDR masks to networking information, indexed for longest-prefix match.
+
+        The CIDR blocks of each IP version are flattened once into sorted, non-overlapping integer ranges,
+        each owned by the most specific CIDR block covering it, so a lookup is a binary search.
+
+        :param cidr_subnet_mapping: Dict of CIDR mask to tuple of (subnet id, security group ids, vpc id)
+        """
+        self.mapping = dict(cidr_subnet_mapping)
+        networks = {4: [], 6: []}
+        for cidr in self.mapping:
+            network = ip_network(cidr, strict=False)
+            networks[network.version].append(
+                (int(network.network_address), int(network.broadcast_address), cidr))
+        self.ranges = {version: self._flatten(networks[version]) for version in networks}
+
+    @staticmethod
+    def _flatten(networks: typing.List[typing.Tuple[int, int, str]]):
+        """
+        :param networks: List of (first address, last address, cidr) tuples
+        :return: Tuple of (sorted range starts, cidr owning each range or None)
+        """
+        starts = []
+        owners = []
+
+        def start_range(position, owner):
+            if starts and starts[-1] == position:
+                owners[-1] = owner
+            else:
+                starts.append(position)
+                owners.append(owner)
+
+        # CIDR blocks are either nested or disjoint, so the open blocks form a stack of ever more specific blocks
+        open_networks = []
+        for first, last, cidr in sorted(networks, key=lambda n: (n[0], -n[1])):
+            while open_networks and open_networks[-1][1] < first:
+                closed = open_networks.pop()
+                start_range(closed[1] + 1, open_networks[-1][2] if open_networks else None)
+            start_range(first, cidr)
+            open_networks.append((first, last, cidr))
+        while open_networks:
+            closed = open_networks.pop()
+            start_range(closed[1] + 1, open_networks[-1][2] if open_networks else None)
+        return starts, owners
+
+    def __getitem__(self, cidr):
+        return self.mapping[cidr]
+
+    def __iter__(self):
+        return iter(self.mapping)
+
+    def __len__(self):
+        return len(self.mapping)
+
+    def __repr__(self):
+        return repr(self.mapping)
+
+    def _result(self, cidr: Optional[str]):
+        if cidr is None:
+            return None, None, None, None
+        return (cidr, *self.mapping[cidr])
+
+    def lookup(self, ip_address: str):
+        """
+        :param ip_address: IP address of a source server
+        :return: Tuple of (cidr, subnet id, security group ids, vpc id) for the most specific CIDR block
+            containing `ip_address`, or (None, None, None, None) if no subnet is matched
+        """
+        address = parse_ip_address(ip_address)
+        starts, owners = self.ranges[address.version]
+        index = bisect_right(starts, int(address)) - 1
+        return self._result(owners[index] if index >= 0 else None)
+
+    def lookup_all(self, ip_addresses: typing.Iterable[str]) -> dict:
+        """
+        Resolve many IP addresses in one sorted sweep over the index.
+
+        :param ip_addresses: IP addresses of source servers
+        :return: Dict of each valid IP address to the tuple returned by `lookup`. Invalid addresses are omitted.
+        """
+        addresses = {4: [], 6: []}
+        for ip_address in set(ip_addresses):
+            try:
+                address = parse_ip_address(ip_address)
+            except ValueError:
+                continue
+            addresses[address.version].append((int(address), ip_address))
+
+        results = {}
+        for version, queries in addresses.items():
+            starts, owners = self.ranges[version]
+            low = 0
+            for value, ip_address in sorted(queries):
+                # queries are sorted, so each search starts where the previous one ended
+                low = bisect_right(starts, value, low)
+                results[ip_address] = self._result(owners[low - 1] if low > 0 else None)
+        return results
+
+
+class NetworkTopologyCache:
+    def __init__(self):
+        """
+        Cache of the target network topology found by create_subnet_cidr_mapping, keyed by account and region.
+
+        Entries are kept in memory for warm invocations and in the DR automation bucket across runs. An entry
+        younger than the TTL is used without any EC2 call. An older entry is validated with a fingerprint of
+        the tagged subnets, one describe_subnets call, and full discovery only runs when the fingerprint
+        changes or the entry is older than the maximum age.
+        """
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(tagged_subnets: typing.List[dict]) -> str:
+        """
+        :param tagged_subnets: List as returned by list_tagged_subnets
+        :return: Hash of the id, CIDR block and VPC of every tagged subnet
+        """
+        subnets = sorted((subnet['SubnetId'], subnet['CidrBlock'], subnet['VpcId']) for subnet in tagged_subnets)
+        return hashlib.sha256(json.dumps(subnets).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def s3_key(account_id: str, region: str) -> str:
+        return f"{TOPOLOGY_CACHE_S3_PREFIX}/{account_id}/{region}.json"
+
+    def get_subnet_cidr_mapping(self, ec2, account_id: str) -> SubnetCidrIndex:
+        """
+        :param ec2: Boto3 client for ec2 in the target account and region
+        :param account_id: AWS account id
+        :return: SubnetCidrIndex as returned by create_subnet_cidr_mapping
+        """
+        region = ec2.meta.region_name
+        now = time.time()
+        ttl = get_environment_int(TOPOLOGY_CACHE_TTL_ENVIRONMENT_VARIABLE, TOPOLOGY_CACHE_TTL_DEFAULT)
+        max_age = get_environment_int(TOPOLOGY_CACHE_MAX_AGE_ENVIRONMENT_VARIABLE, TOPOLOGY_CACHE_MAX_AGE_DEFAULT)
+
+        with self.lock:
+            entry = self.entries.get((account_id, region))
+        if entry is None:
+            entry = self.read(account_id, region)
+
+        if entry is not None and now - entry["validated"] < ttl:
+            logger.info("using cached network topology", extra=dict(discovered=entry["discovered"]))
+            return entry["mapping"]
+
+        tagged_subnets = list_tagged_subnets(ec2)
+        fingerprint = self.fingerprint(tagged_subnets)
+        if entry is not None and entry["fingerprint"] == fingerprint and now - entry["discovered"] < max_age:
+            logger.info("tagged subnets have not changed, using cached network topology",
+                        extra=dict(discovered=entry["discovered"]))
+            entry = dict(entry, validated=now)
+        else:
+            entry = dict(mapping=create_subnet_cidr_mapping(ec2, tagged_subnets), fingerprint=fingerprint,
+                         discovered=now, validated=now)
+
+        with self.lock:
+            self.entries[(account_id, region)] = entry
+        self.write(account_id, region, entry)
+        return entry["mapping"]
+
+    def read(self, account_id: str, region: str) -> Optional[dict]:
+        """
+        :return: Cache entry stored in the DR automation bucket, or None if there is none
+        """
+        bucket = os.environ['DR_AUTOMATION_BUCKET']
+        key = self.s3_key(account_id, region)
+        try:
+            body = s3.meta.client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                logger.warning("could not read cached network topology from s3://%s/%s: %s", bucket, key, e)
+            return None
+        try:
+            stored = json.loads(body)
+            return dict(
+                mapping=SubnetCidrIndex({cidr: tuple(value) for cidr, value in stored["mapping"].items()}),
+                fingerprint=stored["fingerprint"],
+                discovered=stored["discovered"],
+                validated=stored["validated"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("ignoring invalid cached network topology in s3://%s/%s: %s", bucket, key, e)
+            return None
+
+    def write(self, account_id: str, region: str, entry: dict):
+        """
+        Store a cache entry in the DR automation bucket.
+        """
+        bucket = os.environ['DR_AUTOMATION_BUCKET']
+        key = self.s3_key(account_id, region)
+        body = json.dumps(dict(
+            mapping=dict(entry["mapping"]),
+            fingerprint=entry["fingerprint"],
+            discovered=entry["discovered"],
+            validated=entry["validated"]))
+        try:
+            s3.meta.client.put_object(Bucket=bucket, Key=key, Body=body.encode("utf-8"),
+                                      ServerSideEncryption='aws:kms', ContentType="application/json")
+        except ClientError as e:
+            logger.warning("could not write cached network topology to s3://%s/%s: %s", bucket, key, e)
+
+
+network_topology_cache = NetworkTopologyCache()
+
+
+class ServerStates:
+    def __init__(self, account_id: str, region: str, previous: dict, full_sweep_time: Optional[float],
+                 full_sweep: bool):
+        """
+        Fingerprints of the source servers of one account and region, as recorded by the previous run and by this one.
+
+        A source server whose fingerprint and launch template default version match the previous run was left in its
+        desired state and has not been modified since, so it is skipped without reading its settings. During a full
+        sweep every server is synchronized and fingerprints are only recorded.
+
+        Use ServerStates.read to load the states stored by the previous run.
+
+        :param account_id: AWS account id
+        :param region: AWS region of the source servers
+        :param previous: Entries recorded by the previous run, keyed by source server id
+        :param full_sweep_time: Time of the last full sweep, or None if there has not been one
+        :param full_sweep: True to synchronize every server in this run
+        """
+        self.account_id = account_id
+        self.region = region
+        self.previous = previous
+        self.full_sweep = full_sweep
+        self.previous_full_sweep_time = full_sweep_time
+        self.full_sweep_time = time.time() if full_sweep else full_sweep_time
+        self.servers = {}
+        self.unchanged = []
+        # entries of the previous run kept for servers deferred to the next run, see defer
+        self.deferred = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def s3_key(account_id: str, region: str) -> str:
+        return f"{SERVER_STATE_S3_PREFIX}/{account_id}/{region}.json"
+
+    @classmethod
+    def read(cls, account_id: str, region: str, full_sweep: bool = False) -> "ServerStates":
+        """
+        Load the states stored in the DR automation bucket by the previous run.
+
+        :param account_id: AWS account id
+        :param region: AWS region of the source servers
+        :param full_sweep: True to force a full sweep, which also happens when the last one is older than
+            DR_CONFIGURATION_SYNCHRONIZER_FULL_SWEEP_INTERVAL seconds or there are no stored states
+        :return: Instance of ServerStates
+        """
+        bucket = os.environ['DR_AUTOMATION_BUCKET']
+        key = cls.s3_key(account_id, region)
+        previous = {}
+        full_sweep_time = None
+        try:
+            stored = json.loads(s3.meta.client.get_object(Bucket=bucket, Key=key)["Body"].read())
+            previous = stored["servers"]
+            full_sweep_time = stored["full_sweep_time"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                logger.warning("could not read server states from s3://%s/%s: %s", bucket, key, e)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("ignoring invalid server states in s3://%s/%s: %s", bucket, key, e)
+
+        interval = get_environment_int(FULL_SWEEP_INTERVAL_ENVIRONMENT_VARIABLE, FULL_SWEEP_INTERVAL_DEFAULT)
+        if full_sweep_time is None or time.time() - full_sweep_time >= interval:
+            full_sweep = True
+        logger.info("loaded server states", extra=dict(server_count=len(previous), full_sweep=full_sweep,
+                                                       full_sweep_time=full_sweep_time))
+        return cls(account_id, region, previous, full_sweep_time, full_sweep)
+
+    def is_unchanged(self, source_server_id: str, fingerprint: str, default_launch_template_versions: dict) -> bool:
+        """
+        Check a source server against the previous run, and keep its state for the next run if it is unchanged.
+
+        :param source_server_id: DRS source server id
+        :param fingerprint: Value returned by ConfigurationSynchronizer.server_fingerprint
+        :param default_launch_template_versions: Default version of each launch template, keyed by launch template id
+        :return: True if the server can be skipped
+        """
+        if self.full_sweep:
+            return False
+        entry = self.previous.get(source_server_id)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return False
+        # the launch template of a server whose launch template section was skipped on purpose is not compared, see
+        # record; whether the section is skipped is part of the fingerprint
+        if entry["launch_template_version"] is not None:
+            default_version = default_launch_template_versions.get(entry["launch_template_id"])
+            if default_version is None or default_version["VersionNumber"] != entry["launch_template_version"]:
+                return False
+        with self.lock:
+            self.servers[source_server_id] = entry
+            self.unchanged.append(entry["inventory"])
+        return True
+
+    def record(self, source_server_id: str, fingerprint: str, launch_template_id: str,
+               launch_template_version: Optional[int], inventory: dict):
+        """
+        Record the state of a source server synchronized without errors.
+
+        :param source_server_id: DRS source server id
+        :param fingerprint: Value returned by ConfigurationSynchronizer.server_fingerprint
+        :param launch_template_id: Id of the launch template of the server
+        :param launch_template_version: Default version of the launch template after synchronization, or None if the
+            launch template section was skipped and its default version was not prefetched
+        :param inventory: Keyword arguments for InventoryReport.add_server, reported again while the server is unchanged
+        """
+        with self.lock:
+            self.servers[source_server_id] = dict(fingerprint=fingerprint, launch_template_id=launch_template_id,
+                                                  launch_template_version=launch_template_version,
+                                                  inventory=inventory, synchronized_time=time.time())
+
+    def defer(self, source_server_ids: typing.Iterable[str]) -> typing.List[dict]:
+        """
+        Keep the states of the previous run for source servers this run has not reached, so the next run finds them as
+        they were. A full sweep that defers servers is only recorded as of the oldest of them, so the next full sweep
+        starts again with the servers least recently synchronized.
+
+        :param source_server_ids: DRS source server ids not synchronized by this run
+        :return: Inventory recorded for the deferred servers that have a state, see record
+        """
+        inventories = []
+        with self.lock:
+            for source_server_id in source_server_ids:
+                entry = self.previous.get(source_server_id)
+                if entry is None:
+                    continue
+                self.deferred[source_server_id] = entry
+                inventories.append(entry["inventory"])
+                if not self.full_sweep:
+                    continue
+                synchronized_time = entry.get("synchronized_time")
+                if synchronized_time is None or self.full_sweep_time is None:
+                    self.full_sweep_time = self.previous_full_sweep_time
+                else:
+                    self.full_sweep_time = min(self.full_sweep_time, synchronized_time)
+        return inventories
+
+    def to_dict(self) -> dict:
+        """
+        :return: States recorded by this run, as stored in the DR automation bucket
+        """
+        with self.lock:
+            return dict(full_sweep_time=self.full_sweep_time, servers={**self.deferred, **self.servers})
+
+    def merge(self, stored: dict):
+        """
+        Add the states recorded by a shard of a sharded run, as returned by to_dict, to this object.
+
+        The time of the last full sweep is only kept if every shard of the account and region was swept.
+        """
+        with self.lock:
+            self.servers.update(stored["servers"])
+            if self.full_sweep_time is None or stored["full_sweep_time"] is None:
+                self.full_sweep_time = None
+            else:
+                self.full_sweep_time = min(self.full_sweep_time, stored["full_sweep_time"])
+
+    def write(self):
+        """
+        Store the states recorded by this run in the DR automation bucket. Servers that were not synchronized
+        successfully have no state, so they are synchronized again by the next run.
+        """
+        bucket = os.environ['DR_AUTOMATION_BUCKET']
+        key = self.s3_key(self.account_id, self.region)
+        body = json.dumps(self.to_dict())
+        try:
+            s3.meta.client.put_object(Bucket=bucket, Key=key, Body=body.encode("utf-8"),
+                                      ServerSideEncryption='aws:kms', ContentType="application/json")
+        except ClientError as e:
+            logger.warning("could not write server states to s3://%s/%s: %s", bucket, key, e)
+
+
+class LaunchTemplateCompaction:
+    def __init__(self, ec2, account_id: str, region: str, versions_kept: int, report: Optional[RunReport] = None):
+        """
+        Deletes old launch template versions created by the synchronizer and by drs-synch-ec2-tags-and-instance-type,
+        which create a new version each time a launch template drifts, keeping the default version, versions created
+        by anything else, and the latest `versions_kept` versions created by these tools.
+
+        The latest version number of each launch template is stored in the DR automation bucket after it is compacted,
+        so a launch template is only read again once it has more than `versions_kept` new versions.
+
+        :param ec2: Boto3 client for ec2 in the account and region
+        :param account_id: AWS account id
+        :param region: AWS region of the launch templates
+        :param versions_kept: Number of versions created by these tools kept in each launch template
+        :param report: Instance of RunReport counting the versions deleted
+        """
+        self.ec2 = ec2
+        self.account_id = account_id
+        self.region = region
+        self.versions_kept = versions_kept
+        self.report = report
+
+    @staticmethod
+    def s3_key(account_id: str, region: str) -> str:
+        return f"{LAUNCH_TEMPLATE_COMPACTION_S3_PREFIX}/{account_id}/{region}.json"
+
+    def read_compacted_versions(self) -> typing.Dict[str, int]:
+        """
+        :return: Latest version number of each launch template at its last compaction, keyed by launch template id
+        """
+        bucket = os.environ['DR_AUTOMATION_BUCKET']
+        key = self.s3_key(self.account_id, self.region)
+        try:
+            return json.loads(s3.meta.client.get_object(Bucket=bucket, Key=key)["Body"].read())["launch_templates"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                logger.warning("could not read compacted launch templates from s3://%s/%s: %s", bucket, key, e)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("ignoring invalid compacted launch templates in s3://%s/%s: %s", bucket, key, e)
+        return {}
+
+    def write_compacted_versions(self, compacted: typing.Dict[str, int]):
+        bucket = os.environ['DR_AUTOMATION_BUCKET']
+        key = self.s3_key(self.account_id, self.region)
+        try:
+            s3.meta.client.put_object(Bucket=bucket, Key=key,
+                                      Body=json.dumps(dict(launch_templates=compacted)).encode("utf-8"),
+                                      ServerSideEncryption='aws:kms', ContentType="application/json")
+        except ClientError as e:
+            logger.warning("could not write compacted launch templates to s3://%s/%s: %s", bucket, key, e)
+
+    def run(self, expired: Optional[typing.Callable[[], bool]] = None):
+        """
+        Compact every launch template of the account and region with enough new versions since its last compaction.
+
+        :param expired: Function returning True once compaction should stop, such as RunCheckpoint.expired; the
+            launch templates left are compacted by a later run
+        """
+        logger.info("retrieving launch templates to compact")
+        latest_versions = {}
+        paginator = self.ec2.get_paginator("describe_launch_templates")
+        for page in paginator.paginate(PaginationConfig={"PageSize": 200}):
+            for launch_template in page["LaunchTemplates"]:
+                latest_versions[launch_template["LaunchTemplateId"]] = launch_template["LatestVersionNumber"]
+
+        compacted = self.read_compacted_versions()
+        candidates = [launch_template_id for launch_template_id, latest_version in latest_versions.items()
+                      if latest_version - compacted.get(launch_template_id, 0) > self.versions_kept]
+        logger.info("compacting launch templates", extra=dict(template_count=len(candidates),
+                                                              versions_kept=self.versions_kept))
+        deleted = 0
+        try:
+            for launch_template_id in candidates:
+                if expired is not None and expired():
+                    logger.info("stopping launch template compaction before the time limit",
+                                extra=dict(template_count=len(candidates)))
+                    break
+                try:
+                    deleted += self.compact(launch_template_id)
+                except ClientError as e:
+                    log_error("could not compact launch template: %s", e)
+                    continue
+                compacted[launch_template_id] = latest_versions[launch_template_id]
+        finally:
+            # launch templates deleted since the last compaction are forgotten
+            self.write_compacted_versions({launch_template_id: version for launch_template_id, version
+                                           in compacted.items() if launch_template_id in latest_versions})
+            if self.report is not None:
+                self.report.increment_launch_template_versions_deleted(deleted)
+        logger.info("compacted launch templates", extra=dict(versions_deleted=deleted))
+
+    def compact(self, launch_template_id: str) -> int:
+        """
+        Delete the versions of one launch template created by these tools, except the default version and the latest
+        `versions_kept` of them, in batches of LAUNCH_TEMPLATE_VERSION_DELETE_BATCH_SIZE.
+
+        :param launch_template_id: Id of the launch template
+        :return: Number of versions deleted
+        """
+        managed = []
+        paginator = self.ec2.get_paginator("describe_launch_template_versions")
+        for page in paginator.paginate(LaunchTemplateId=launch_template_id, PaginationConfig={"PageSize": 200}):
+            for version in page["LaunchTemplateVersions"]:
+                if not version.get("DefaultVersion") and \
+                        version.get("VersionDescription") in COMPACTED_LAUNCH_TEMPLATE_VERSION_DESCRIPTIONS:
+                    managed.append(version["VersionNumber"])
+        managed.sort()
+        obsolete = managed[:max(0, len(managed) - self.versions_kept)]
+
+        deleted = 0
+        for start in range(0, len(obsolete), LAUNCH_TEMPLATE_VERSION_DELETE_BATCH_SIZE):
+            batch = obsolete[start:start + LAUNCH_TEMPLATE_VERSION_DELETE_BATCH_SIZE]
+            response = self.ec2.delete_launch_template_versions(LaunchTemplateId=launch_template_id,
+                                                                Versions=[str(version) for version in batch])
+            failures = response.get("UnsuccessfullyDeletedLaunchTemplateVersions", [])
+            for failure in failures:
+                logger.warning("could not delete launch template version", extra=dict(
+                    id=launch_template_id, version=failure.get("VersionNumber"),
+                    error=failure.get("ResponseError", {}).get("Message")))
+            deleted += len(batch) - len(failures)
+        if deleted:
+            logger.info("deleted launch template versions", extra=dict(id=launch_template_id, versions_deleted=deleted,
+                                                                      versions_kept=len(managed) - len(obsolete)))
+        return deleted
+
+
+def get_vpc_info_from_ip_address(cidr_to_subnet_map, ip_address: str):
+    """
+    Tries to find the most specific subnet with a CIDR block matching `ip_address`.
+
+    :param cidr_to_subnet_map: SubnetCidrIndex as returned by `create_subnet_cidr_mapping`, or a dict of the same shape
+    :param ip_address:
+    :return: Tuple of (cidr, subnet id, security group ids, vpc id) or (None, None, None, None) if not subnet is matched
+    """
+    if not isinstance(cidr_to_subnet_map, SubnetCidrIndex):
+        cidr_to_subnet_map = SubnetCidrIndex(cidr_to_subnet_map)
+    return cidr_to_subnet_map.lookup(ip_address)
+
+
+def get_source_server_ips(server: dict) -> typing.List[str]:
+    """
+    :param server: dict for a DRS source server as returned by "DescribeSourceServers" api call.
+    :return: IP addresses of every network interface of the source server
+    """
+    source_server_ips = []
+    for nic in server.get("sourceProperties", {}).get("networkInterfaces", []):
+        for source_server_ip in nic.get("ips", []):
+            source_server_ips.append(source_server_ip)
+    return source_server_ips
+
+
+def get_launch_template_network(launch_template_version: dict) -> typing.Tuple[Optional[str], Optional[str], list]:
+    """
+    :param launch_template_version: Launch template version as returned by "DescribeLaunchTemplateVersions"
+    :return: Subnet id, private IP address and security group ids of the first network interface of the launch template
+    """
+    network_interfaces = launch_template_version["LaunchTemplateData"].get("NetworkInterfaces", [])
+    if len(network_interfaces) == 0:
+        return None, None, []
+    launch_template_ip = None
+    if len(network_interfaces[0].get("PrivateIpAddresses", [])) > 0:
+        launch_template_ip = network_interfaces[0]["PrivateIpAddresses"][0]["PrivateIpAddress"]
+    return network_interfaces[0].get("SubnetId"), launch_template_ip, network_interfaces[0].get("Groups", [])
+
+
+def get_environment_int(name: str, default: int) -> int:
+    """
+    Read a positive integer setting from an environment variable.
+
+    :param name: Name of the environment variable
+    :param default: Value returned when the environment variable is not set
+    :return: Integer value of the setting
+    """
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise SynchronizerException(f"environment variable {name} must be an integer, got: {value}")
+    if number < 1:
+        raise SynchronizerException(f"environment variable {name} must be greater than 0, got: {value}")
+    return number
+
+
+def get_environment_list(name: str, pattern: Optional[typing.Pattern] = None) -> typing.List[str]:
+    """
+    Read a comma separated setting from an environment variable.
+
+    :param name: Name of the environment variable
+    :param pattern: Regular expression every value must match
+    :return: Values of the setting, empty when the environment variable is not set
+    """
+    values = [value.strip() for value in os.getenv(name, "").split(",") if value.strip()]
+    for value in values:
+        if pattern is not None and not pattern.fullmatch(value):
+            raise SynchronizerException(f"environment variable {name} has an invalid value: {value}")
+    return values
+
+
+def get_source_server_filters() -> dict:
+    """
+    :return: DescribeSourceServers filters for the staging accounts in DR_CONFIGURATION_SYNCHRONIZER_STAGING_ACCOUNT_IDS
+    """
+    staging_account_ids = get_environment_list(STAGING_ACCOUNT_IDS_ENVIRONMENT_VARIABLE, STAGING_ACCOUNT_ID_PATTERN)
+    return {"stagingAccountIDs": staging_account_ids} if staging_account_ids else {}
+
+
+def get_configured_source_server_ids() -> Optional[typing.List[str]]:
+    """
+    :return: Source servers in DR_CONFIGURATION_SYNCHRONIZER_SOURCE_SERVER_IDS, or None to synchronize every server
+    """
+    return get_environment_list(SOURCE_SERVER_IDS_ENVIRONMENT_VARIABLE, SOURCE_SERVER_ID_PATTERN) or None
+
+
+def get_triage_categories() -> typing.Set[str]:
+    """
+    :return: Categories of source servers triaged by triage_source_server, from DR_CONFIGURATION_SYNCHRONIZER_TRIAGE,
+        or TRIAGE_DEFAULT when it is not set
+    """
+    if os.getenv(TRIAGE_ENVIRONMENT_VARIABLE) is None:
+        categories = set(TRIAGE_DEFAULT)
+    else:
+        categories = {category.lower() for category in get_environment_list(TRIAGE_ENVIRONMENT_VARIABLE)}
+    unknown = categories - set(TRIAGE_SKIPPED_SECTIONS)
+    if unknown:
+        raise SynchronizerException(f"environment variable {TRIAGE_ENVIRONMENT_VARIABLE} must list categories among "
+                                    f"{', '.join(TRIAGE_SKIPPED_SECTIONS)}, got: {', '.join(sorted(unknown))}")
+    return categories | {TRIAGE_EXTENDED}
+
+
+def triage_source_server(server: dict, categories: typing.Collection[str]) -> str:
+    """
+    Find the category of a source server from the server returned by "DescribeSourceServers", without any other API
+    call. The sections in TRIAGE_SKIPPED_SECTIONS for the category are not synchronized.
+
+    :param server: dict for a DRS source server
+    :param categories: Categories triaged, as returned by get_triage_categories
+    :return: TRIAGE_EXTENDED, TRIAGE_DISCONNECTED or TRIAGE_AGENTLESS if the category is triaged, else
+        TRIAGE_REPLICATING
+    """
+    if TRIAGE_EXTENDED in categories and server.get("stagingArea", {}).get("status") == "EXTENDED":
+        return TRIAGE_EXTENDED
+    if TRIAGE_DISCONNECTED in categories and \
+            server.get("dataReplicationInfo", {}).get("dataReplicationState") == "DISCONNECTED":
+        return TRIAGE_DISCONNECTED
+    if TRIAGE_AGENTLESS in categories and server.get("replicationType") == "SNAPSHOT_SHIPPING":
+        return TRIAGE_AGENTLESS
+    return TRIAGE_REPLICATING
+
+
+def get_replication_configuration_keys(triage: str) -> typing.Tuple[str, ...]:
+    """
+    :param triage: Category of a source server, as returned by triage_source_server
+    :return: Keys of REPLICATION_CONFIGURATION_KEYS synchronized for the source servers of the category
+    """
+    skipped = TRIAGE_SKIPPED_REPLICATION_KEYS.get(triage, ())
+    return tuple(key for key in REPLICATION_CONFIGURATION_KEYS if key not in skipped)
+
+
+def get_server_order() -> str:
+    """
+    :return: Order of the source servers of an account and region, one of SERVER_ORDERS, from the environment
+        variable DR_CONFIGURATION_SYNCHRONIZER_SERVER_ORDER
+    """
+    order = os.getenv(SERVER_ORDER_ENVIRONMENT_VARIABLE, SERVER_ORDER_LISTING).strip().lower() or SERVER_ORDER_LISTING
+    if order not in SERVER_ORDERS:
+        raise SynchronizerException(f"environment variable {SERVER_ORDER_ENVIRONMENT_VARIABLE} must be one of "
+                                    f"{', '.join(SERVER_ORDERS)}, got: {order}")
+    return order
+
+
+def synchronize_all(full_sweep: bool = False, context=None, invoke: Optional[typing.Callable[[dict], None]] = None):
+    """
+    Synchronize source servers for all AWS accounts in the configuration bundle, or with a directory under the
+    configuration directory when there is no bundle, in the regions listed by the regions.yml of each account.
+
+    Accounts are synchronized concurrently by a pool of workers, sized by the environment variable
+    DR_CONFIGURATION_SYNCHRONIZER_ACCOUNT_WORKERS.
+
+    When `invoke` is given, a run about to exceed the lambda timeout stores a checkpoint and continues in a new
+    invocation, see RunCheckpoint.
+
+    :param full_sweep: True to synchronize every source server, including servers unchanged since the previous run
+    :param context: Lambda context object, or None when running locally
+    :param invoke: Function starting an invocation of this lambda function with an event, as returned by
+        create_self_invoker, or None to synchronize every account in this invocation
+    """
+    checkpoint = None
+    if invoke is not None:
+        checkpoint = RunCheckpoint(str(uuid.uuid1()), context, full_sweep=full_sweep, started=time.time())
+    work = [dict(account_id=account) for account in account_configuration_loader.accounts()]
+    synchronize_accounts(work, full_sweep, checkpoint, invoke)
+
+
+def continue_synchronization(run_id: str, context, invoke: typing.Callable[[dict], None]):
+    """
+    Continue a run of synchronize_all from the checkpoint stored by its previous invocation.
+
+    :param run_id: Id of the run
+    :param context: Lambda context object
+    :param invoke: Function starting an invocation of this lambda function with an event, as returned by
+        create_self_invoker
+    """
+    stored = read_shard_run_object(run_id, RUN_CHECKPOINT_OBJECT)
+    if stored is None:
+        raise SynchronizerException(f"no checkpoint found for run {run_id}")
+    checkpoint = RunCheckpoint(run_id, context, full_sweep=stored["full_sweep"], started=stored["started"],
+                               invocation=stored["invocation"])
+    with log_context.context(run_id=run_id):
+        logger.info("continuing run from checkpoint",
+                    extra=dict(invocation=checkpoint.invocation, pending=len(stored["pending"])))
+    synchronize_accounts(stored["pending"], checkpoint.full_sweep, checkpoint, invoke)
+
+
+def synchronize_accounts(work: typing.List[dict], full_sweep: bool, checkpoint: Optional["RunCheckpoint"],
+                         invoke: Optional[typing.Callable[[dict], None]]):
+    """
+    Synchronize the source servers of some AWS accounts, in one invocation of a run of synchronize_all.
+
+    :param work: Accounts to synchronize, as recorded by RunCheckpoint.suspend, where only account_id is required
+    :param full_sweep: True to synchronize every source server, including servers unchanged since the previous run
+    :param checkpoint: Instance of RunCheckpoint, or None to synchronize every account in this invocation
+    :param invoke: Function starting an invocation of this lambda function with an event, as returned by
+        create_self_invoker
+    """
+    if checkpoint is not None and checkpoint.timed_out():
+        # continuing would only store the same checkpoint again
+        raise SynchronizerException(f"less than {CHECKPOINT_TIME_MARGIN_SECONDS} seconds left before the lambda "
+                                    f"function times out, increase its timeout")
+    unique_id = str(uuid.uuid1())
+    run_report = RunReport()
+    report_logging_handler.set_run_report(run_report)
+    api_rate_limiters.reset_statistics()
+    api_metrics.reset()
+    # rows of a checkpointed run are kept with the partial report of each invocation until the run is merged
+    inventory_report = create_inventory_report() if checkpoint is None else ShardInventory()
+
+    account_workers = get_environment_int(ACCOUNT_WORKERS_ENVIRONMENT_VARIABLE, ACCOUNT_WORKERS_DEFAULT)
+    logger.info("synchronizing {} account(s) with {} worker(s)".format(len(work), account_workers))
+
+    try:
+        with ThreadPoolExecutor(max_workers=account_workers, thread_name_prefix="account") as executor:
+            futures = [
+                executor.submit(synchronize_account_from_configuration, entry["account_id"], unique_id, run_report,
+                                inventory_report, full_sweep, checkpoint=checkpoint, region=entry.get("region"),
+                                next_token=entry.get("next_token"), skip=entry.get("skip", 0),
+                                source_server_ids=entry.get("source_server_ids"))
+                for entry in work
+            ]
+            for future in futures:
+                future.result()
+
+        record_api_statistics(run_report)
+        if checkpoint is not None:
+            checkpoint.finish_invocation(run_report, inventory_report, invoke)
+            return
+        run_report.send()
+        inventory_report.write_to_s3()
+    except Exception:
+        if checkpoint is None:
+            inventory_report.abort()
+        raise
+
+
+def synchronize_account_from_configuration(account: str, unique_id: str, run_report: RunReport,
+                                           inventory_report: InventoryReport, full_sweep: bool = False,
+                                           checkpoint: Optional["RunCheckpoint"] = None, region: Optional[str] = None,
+                                           next_token: Optional[str] = None, skip: int = 0,
+                                           source_server_ids: Optional[typing.List[str]] = None):
+    """
+    Load the configuration directory of one AWS account and synchronize its source servers in each of its regions.
+
+    The configuration is loaded once and shared by the regions, which are synchronized concurrently by
+    DR_CONFIGURATION_SYNCHRONIZER_REGION_WORKERS threads. Errors are logged and reported rather than raised so that
+    one account or region cannot stop the others.
+
+    :param account: AWS account id, the name of a directory under CONFIGURATION_PATH
+    :param unique_id: uuid representing a single invocation of DRS synchronizer
+    :param run_report: instance of RunReport
+    :param inventory_report: instance of InventoryReport, or ShardInventory for a checkpointed run
+    :param full_sweep: True to synchronize every source server, including servers unchanged since the previous run
+    :param checkpoint: Instance of RunCheckpoint to stop before the lambda function times out
+    :param region: Only synchronize this region, from `next_token` and `skip`, when continuing from a checkpoint
+    :param next_token: DRS pagination token of the page of source servers to start from
+    :param skip: Number of source servers of the first page already synchronized
+    :param source_server_ids: Source servers left in `region`, when they are not synchronized in DRS page order
+    """
+    with log_context.context(account=account):
+        # once the time budget is exhausted, synchronize_account defers the servers left to the next run
+        if checkpoint is not None and checkpoint.timed_out():
+            checkpoint.suspend(account, region, next_token, skip, source_server_ids)
+            return
+        logger.info("synchronizing account {}".format(account))
+
+        try:
+            logger.info("loading account configuration")
+            configuration = account_configuration_loader.load(account)
+        except Exception as e:
+            logger.error("Exception synchronizing account: {}".format(e))
+            log_error("errors while synchronizing account: %s", e)
+            return
+
+        def synchronize_region(region: str, next_token: Optional[str] = None, skip: int = 0,
+                               source_server_ids: Optional[typing.List[str]] = None):
+            # the log context of the calling thread is not seen by the threads of the executor
+            with log_context.context(account=account, region=region):
+                if checkpoint is not None and checkpoint.timed_out():
+                    checkpoint.suspend(account, region, next_token, skip, source_server_ids)
+                    return
+                try:
+                    synchronize_account(account, configuration, unique_id, run_report, inventory_report,
+                                        full_sweep=full_sweep, region=region, checkpoint=checkpoint,
+                                        next_token=next_token, skip=skip, source_server_ids=source_server_ids)
+                    logger.info("finished synchronizing account")
+                except Exception as e:
+                    logger.error("Exception synchronizing account: {}".format(e))
+                    log_error("errors while synchronizing account: %s", e)
+
+        if region is not None:
+            synchronize_region(region, next_token, skip, source_server_ids)
+            return
+        regions = get_account_regions(configuration)
+        if len(regions) == 1:
+            synchronize_region(regions[0])
+            return
+        region_workers = get_environment_int(REGION_WORKERS_ENVIRONMENT_VARIABLE, REGION_WORKERS_DEFAULT)
+        with ThreadPoolExecutor(max_workers=min(region_workers, len(regions)),
+                                thread_name_prefix="region") as executor:
+            list(executor.map(synchronize_region, regions))
+
+
+def get_event_source_servers(event) -> Optional[typing.Dict[typing.Tuple[str, str], typing.List[str]]]:
+    """
+    Find the source servers named by a lambda event.
+
+    Two kinds of events name source servers: events sent by EventBridge for DRS source servers, which list the ARN of
+    each server in "resources", and explicit requests such as
+    {"source_servers": [{"account_id": "111111111111", "source_server_id": "s-1234567890abcdef0"}]}, where each entry
+    may also name the "region" of the server, by default the region of the lambda function.
+
+    :param event: Event passed to lambda_handler
+    :return: Source server ids keyed by AWS account id and region, or None if the event does not name source servers,
+        such as the scheduled event that synchronizes every account
+    """
+    if not isinstance(event, dict):
+        return None
+
+    source_servers = {} if "source_servers" in event else None
+    for entry in event.get("source_servers", []):
+        try:
+            account_id, source_server_id = str(entry["account_id"]), entry["source_server_id"]
+        except (KeyError, TypeError):
+            raise SynchronizerException(f"source_servers entries need an account_id and a source_server_id, got: {entry}")
+        region = entry.get("region") or execution_region
+        source_servers.setdefault((account_id, region), {})[source_server_id] = None
+
+    for resource in event.get("resources", []):
+        match = SOURCE_SERVER_ARN_PATTERN.fullmatch(str(resource))
+        if match is None:
+            continue
+        region, account_id, source_server_id = match.groups()
+        source_servers = source_servers or {}
+        source_servers.setdefault((account_id, region), {})[source_server_id] = None
+
+    if source_servers is None:
+        return None
+    return {key: list(ids) for key, ids in source_servers.items()}
+
+
+def synchronize_source_servers(source_servers: typing.Dict[typing.Tuple[str, str], typing.List[str]]):
+    """
+    Synchronize only the given source servers, for example the servers named by a DRS event.
+
+    The inventory report is left to runs of synchronize_all, and the summary report is only sent if errors or warnings
+    were logged, so frequent events do not flood the SNS topic.
+
+    :param source_servers: Source server ids keyed by AWS account id and region, as returned by
+        get_event_source_servers
+    """
+    unique_id = str(uuid.uuid1())
+    run_report = RunReport()
+    report_logging_handler.set_run_report(run_report)
+    api_rate_limiters.reset_statistics()
+    api_metrics.reset()
+    configured_accounts = account_configuration_loader.accounts()
+
+    for (account_id, region), source_server_ids in source_servers.items():
+        with log_context.context(account=account_id, region=region):
+            if account_id not in configured_accounts:
+                logger.warning("no configuration for account, skipping source servers",
+                               extra=dict(servers=source_server_ids))
+                continue
+            try:
+                configuration = account_configuration_loader.load(account_id)
+                if region not in get_account_regions(configuration):
+                    logger.warning("region is not configured for account, skipping source servers",
+                                   extra=dict(servers=source_server_ids))
+                    continue
+                logger.info("synchronizing source servers", extra=dict(servers=source_server_ids))
+                synchronize_account_source_servers(account_id, configuration, source_server_ids, unique_id,
+                                                   run_report, region=region)
+            except Exception as e:
+                log_error("errors while synchronizing source servers: %s", e)
+
+    record_api_statistics(run_report)
+    if run_report.error_count > 0:
+        run_report.send()
+
+
+def get_remaining_seconds(context) -> float:
+    """
+    :param context: Lambda context object, or None when running locally
+    :return: Seconds left before the lambda function times out
+    """
+    if context is None:
+        return float("inf")
+    return context.get_remaining_time_in_millis() / 1000
+
+
+def get_shard_queue() -> Optional[SqsShardQueue]:
+    """
+    :return: Instance of SqsShardQueue for the queue in DR_CONFIGURATION_SYNCHRONIZER_SHARD_QUEUE_URL, or None if
+        sharded runs are disabled
+    """
+    queue_url = os.getenv(SHARD_QUEUE_URL_ENVIRONMENT_VARIABLE, "").strip()
+    if not queue_url:
+        return None
+    sqs = boto3.client("sqs", config=boto_client_config)
+    api_metrics.attach(sqs, API_METRICS_EXECUTION_ACCOUNT)
+    return SqsShardQueue(sqs, queue_url)
+
+
+def create_self_invoker(context) -> typing.Callable[[dict], None]:
+    """
+    :param context: Lambda context object
+    :return: Function starting an asynchronous invocation of this lambda function with the given event
+    """
+    lambda_client = boto3.client("lambda", config=boto_client_config)
+    api_metrics.attach(lambda_client, API_METRICS_EXECUTION_ACCOUNT)
+
+    def invoke(event: dict):
+        lambda_client.invoke(FunctionName=context.invoked_function_arn, InvocationType="Event",
+                             Payload=json.dumps(event).encode("utf-8"))
+
+    return invoke
+
+
+def write_shard_run_object(run_id: str, name: str, body: dict):
+    """
+    Store the manifest or a partial report of a sharded run in the DR automation bucket.
+    """
+    s3.meta.client.put_object(Bucket=os.environ['DR_AUTOMATION_BUCKET'], Key=f"{SHARD_RUN_S3_PREFIX}/{run_id}/{name}",
+                              Body=json.dumps(body).encode("utf-8"), ServerSideEncryption='aws:kms',
+                              ContentType="application/json")
+
+
+def read_shard_run_object(run_id: str, name: str) -> Optional[dict]:
+    """
+    :return: Manifest or partial report of a sharded run, or None if it does not exist
+    """
+    try:
+        body = s3.meta.client.get_object(Bucket=os.environ['DR_AUTOMATION_BUCKET'],
+                                         Key=f"{SHARD_RUN_S3_PREFIX}/{run_id}/{name}")["Body"].read()
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
+    return json.loads(body)
+
+
+def list_finished_shards(run_id: str) -> typing.Set[str]:
+    """
+    :return: Ids of the shards of a sharded run with a partial report
+    """
+    prefix = f"{SHARD_RUN_S3_PREFIX}/{run_id}/partials/"
+    paginator = s3.meta.client.get_paginator("list_objects_v2")
+    return {
+        item["Key"][len(prefix):-len(".json")]
+        for page in paginator.paginate(Bucket=os.environ['DR_AUTOMATION_BUCKET'], Prefix=prefix)
+        for item in page.get("Contents", [])
+    }
+
+
+def create_partial_report(run_report: RunReport, inventory: ShardInventory,
+                          server_states: typing.Iterable[ServerStates]) -> dict:
+    """
+    :param run_report: Instance of RunReport
+    :param inventory: Instance of ShardInventory
+    :param server_states: Instances of ServerStates recorded with the report
+    :return: Partial report of a shard of a sharded run or of an invocation of a checkpointed run, as stored in the
+        DR automation bucket
+    """
+    return dict(run_report.to_dict(), inventory=inventory.servers,
+                server_states=[dict(states.to_dict(), account_id=states.account_id, region=states.region)
+                               for states in server_states])
+
+
+def merge_partial_report(partial: dict, run_report: RunReport, inventory_report: InventoryReport,
+                         server_states: typing.Dict[typing.Tuple[str, str], ServerStates]):
+    """
+    Add a partial report, as returned by create_partial_report, to the reports and server states of the whole run.
+
+    :param partial: Partial report
+    :param run_report: Instance of RunReport for the whole run
+    :param inventory_report: Instance of InventoryReport for the whole run
+    :param server_states: Instances of ServerStates keyed by account id and region, with an entry added for each
+        account and region of the partial report that does not have one yet
+    """
+    run_report.merge(partial)
+    for server in partial["inventory"]:
+        inventory_report.add_server(**server)
+    for stored in partial["server_states"]:
+        key = (stored["account_id"], stored["region"])
+        if key not in server_states:
+            server_states[key] = ServerStates(*key, previous={}, full_sweep_time=stored["full_sweep_time"],
+                                              full_sweep=False)
+        server_states[key].merge(stored)
+
+
+class RunCheckpoint:
+    def __init__(self, run_id: str, context, full_sweep: bool, started: float, invocation: int = 0):
+        """
+        Cursor of a run of synchronize_all that continues in a new invocation when the lambda function is about to
+        time out.
+
+        Workers check `expired` before they start an account, a region or a source server. Once fewer than
+        CHECKPOINT_TIME_MARGIN_SECONDS seconds are left, they stop and record where to continue with `suspend`,
+        and the source servers already in the pipelines are finished. Once the run has taken
+        DR_CONFIGURATION_SYNCHRONIZER_RUN_TIME_BUDGET seconds, the servers left are deferred to the next run instead,
+        see ServerStates.defer, and the run finishes. Each invocation stores a partial report in the
+        DR automation bucket, like a shard of a sharded run, and the last one merges them into one summary report,
+        one inventory report and the server states of each account and region.
+
+        :param run_id: Id of the run, shared by its invocations
+        :param context: Lambda context object
+        :param full_sweep: True to synchronize every source server, including servers unchanged since the previous run
+        :param started: Time the first invocation of the run started, as returned by time.time
+        :param invocation: Number of invocations of the run before this one
+        """
+        self.run_id = run_id
+        self.context = context
+        self.full_sweep = full_sweep
+        self.started = started
+        self.invocation = invocation
+        self.time_budget = get_environment_int(RUN_TIME_BUDGET_ENVIRONMENT_VARIABLE, 0)
+        self.pending = []
+        self.server_states = []
+        self.lock = threading.Lock()
+
+    def timed_out(self) -> bool:
+        """
+        :return: True if the lambda function is about to time out
+        """
+        return get_remaining_seconds(self.context) <= CHECKPOINT_TIME_MARGIN_SECONDS
+
+    def budget_exhausted(self) -> bool:
+        """
+        :return: True if the run has taken its time budget, so the servers left are deferred to the next run
+        """
+        return self.time_budget > 0 and time.time() - self.started >= self.time_budget
+
+    def expired(self) -> bool:
+        """
+        :return: True if workers should stop starting new work
+        """
+        return self.timed_out() or self.budget_exhausted()
+
+    def suspend(self, account_id: str, region: Optional[str] = None, next_token: Optional[str] = None, skip: int = 0,
+                source_server_ids: Optional[typing.List[str]] = None):
+        """
+        Record work left for the next invocation.
+
+        :param account_id: AWS account id
+        :param region: AWS region, or None for every region of the account
+        :param next_token: DRS pagination token of the page of source servers to continue from, None for the first page
+        :param skip: Number of source servers of the page already synchronized
+        :param source_server_ids: DRS source server ids left, in the order they are synchronized, instead of a page
+        """
+        with self.lock:
+            self.pending.append(dict(account_id=account_id, region=region, next_token=next_token, skip=skip,
+                                     source_server_ids=source_server_ids))
+
+    def add_server_states(self, server_states: ServerStates):
+        """
+        Keep the server states of an account and region for the partial report of this invocation.
+        """
+        with self.lock:
+            self.server_states.append(server_states)
+
+    def finish_invocation(self, run_report: RunReport, inventory: ShardInventory,
+                          invoke: typing.Callable[[dict], None]):
+        """
+        Continue the run in a new invocation if work is left, storing the partial report of this invocation and the
+        checkpoint. Otherwise, merge the partial reports of every invocation and send the summary report.
+
+        :param run_report: Instance of RunReport of this invocation
+        :param inventory: Instance of ShardInventory of this invocation
+        :param invoke: Function starting an invocation of this lambda function with an event, as returned by
+            create_self_invoker
+        """
+        partial = create_partial_report(run_report, inventory, self.server_states)
+        if self.pending:
+            write_shard_run_object(self.run_id, f"partials/{self.invocation:05}.json", partial)
+            write_shard_run_object(self.run_id, RUN_CHECKPOINT_OBJECT, dict(
+                started=self.started, full_sweep=self.full_sweep, invocation=self.invocation + 1,
+                pending=self.pending))
+            logger.info("continuing run in a new invocation",
+                        extra=dict(run_id=self.run_id, invocation=self.invocation + 1, pending=len(self.pending)))
+            invoke({"checkpoint_run": self.run_id})
+            return
+
+        merged_report = RunReport()
+        merged_report.time_start = datetime.datetime.fromtimestamp(self.started, tz=datetime.timezone.utc)
+        report_logging_handler.set_run_report(merged_report)
+        inventory_report = create_inventory_report()
+        server_states = {}
+        try:
+            for invocation in range(self.invocation):
+                stored = read_shard_run_object(self.run_id, f"partials/{invocation:05}.json")
+                if stored is None:
+                    logger.warning("partial report of a previous invocation is missing",
+                                   extra=dict(run_id=self.run_id, invocation=invocation))
+                    continue
+                merge_partial_report(stored, merged_report, inventory_report, server_states)
+            merge_partial_report(partial, merged_report, inventory_report, server_states)
+
+            for states in server_states.values():
+                states.write()
+            if self.invocation > 0:
+                logger.info("merged partial reports of checkpointed run",
+                            extra=dict(run_id=self.run_id, invocation_count=self.invocation + 1))
+            merged_report.send()
+            inventory_report.write_to_s3()
+        except Exception:
+            inventory_report.abort()
+            raise
+
+
+def create_account_shards(account: str, run_id: str, full_sweep: bool, shard_size: int) -> typing.List[dict]:
+    """
+    List the source servers of one AWS account, in each of its regions, and split them into shards.
 
+    The network topology of each region is discovered here, once, so the workers of every shard read it from
+    the cache. Errors are logged and reported rather than raised so that one account cannot stop the others.
 
-def get_vpc_info_from_ip_address(cidr_to_subnet_map, ip_address: str):
+    :param account: AWS account id
+    :param run_id: Id of the sharded run
+    :param full_sweep: True to synchronize every source server, including servers unchanged since the previous run
+    :param shard_size: Maximum number of source servers in one shard
+    :return: List of shard descriptors
     """
-    Tries to find a subnet with a CIDR block matching `ip_address`.
+    with log_context.context(account=account):
+        try:
+            configuration = account_configuration_loader.load(account)
+        except Exception as e:
+            log_error("errors while creating shards for account: %s", e)
+            return []
+        if configuration.features.is_excluded("*"):
+            logger.info("Exclusion * found for account {}, skipping...".format(account))
+            return []
+
+    shards = []
+    for region in get_account_regions(configuration):
+        with log_context.context(account=account, region=region):
+            try:
+                ec2, drs = create_account_clients(account, region)
+                network_topology_cache.get_subnet_cidr_mapping(ec2, account)
+                source_server_ids = [server["sourceServerID"] for page in list_source_servers(drs) for server in page]
+            except Exception as e:
+                log_error("errors while creating shards for account: %s", e)
+                continue
 
-    :param cidr_to_subnet_map: Dict as returned by `create_subnet_cidr_mapping`
-    :param ip_address:
-    :return: Tuple of (cidr, subnet id, security group ids, vpc id) or (None, None, None, None) if not subnet is matched
-    """
-    ip_address_net = ip_network(ip_address)
-    for cidr in cidr_to_subnet_map:
-        if ip_network(cidr).overlaps(ip_address_net):
-            return cidr, *cidr_to_subnet_map[cidr]
-    return None, None, None, None
+            region_shards = [
+                dict(run_id=run_id, shard_id=f"{account}-{region}-{index:05}", account_id=account, region=region,
+                     full_sweep=full_sweep, source_server_ids=source_server_ids[start:start + shard_size],
+                     compact_launch_templates=index == 0)
+                for index, start in enumerate(range(0, len(source_server_ids), shard_size))
+            ]
+            logger.info("created shards",
+                        extra=dict(server_count=len(source_server_ids), shard_count=len(region_shards)))
+            shards += region_shards
+    return shards
 
 
-def read_yaml_configuration_file(filename: typing.Union[str, Path]):
+def synchronize_sharded(shard_queue, context=None, full_sweep: bool = False,
+                        invoke: Optional[typing.Callable[[dict], None]] = None):
+    """
+    Coordinate a sharded run, which spreads the source servers of all AWS accounts over several invocations.
+
+    The coordinator splits the source servers of every account into shards, puts them on the shard queue and starts
+    DR_CONFIGURATION_SYNCHRONIZER_SHARD_WORKERS worker invocations, which claim shards and store a partial report for
+    each one. The coordinator then processes shards itself until every shard has a partial report, and merges them
+    into one summary notification and one inventory report, see merge_sharded_run.
+
+    :param shard_queue: Instance of SqsShardQueue, or InMemoryShardQueue to run every shard in this process
+    :param context: Lambda context object, or None when running locally
+    :param full_sweep: True to synchronize every source server, including servers unchanged since the previous run
+    :param invoke: Function starting an invocation of this lambda function with an event, as returned by
+        create_self_invoker, or None to process every shard in this invocation
+    """
+    run_id = str(uuid.uuid1())
+    run_report = RunReport()
+    report_logging_handler.set_run_report(run_report)
+    shard_size = get_environment_int(SHARD_SIZE_ENVIRONMENT_VARIABLE, SHARD_SIZE_DEFAULT)
+
+    accounts = account_configuration_loader.accounts()
+    account_workers = get_environment_int(ACCOUNT_WORKERS_ENVIRONMENT_VARIABLE, ACCOUNT_WORKERS_DEFAULT)
+    with log_context.context(run_id=run_id):
+        logger.info("creating shards for {} account(s)".format(len(accounts)))
+        with ThreadPoolExecutor(max_workers=account_workers, thread_name_prefix="account") as executor:
+            shards = [
+                shard
+                for account_shards in executor.map(
+                    lambda account: create_account_shards(account, run_id, full_sweep, shard_size), accounts)
+                for shard in account_shards
+            ]
+
+        # errors logged while creating shards are merged like the partial report of a shard
+        write_shard_run_object(run_id, f"partials/{SHARD_COORDINATOR}.json",
+                               create_partial_report(run_report, ShardInventory(), []))
+        write_shard_run_object(run_id, "manifest.json", dict(
+            started=run_report.time_start.timestamp(),
+            shards=[SHARD_COORDINATOR] + [shard["shard_id"] for shard in shards]))
+        shard_queue.put_all(shards)
+
+        workers = min(get_environment_int(SHARD_WORKERS_ENVIRONMENT_VARIABLE, SHARD_WORKERS_DEFAULT), len(shards))
+        if invoke is None:
+            workers = 0
+        logger.info("queued shards", extra=dict(shard_count=len(shards), worker_count=workers))
+        for _ in range(workers):
+            invoke({"shard_worker": True})
+
+    merge_sharded_run(run_id, shard_queue, context, invoke)
+
+
+def process_shard(shard: dict):
     """
-    Parse a yaml file and return an object
-    :param filename: Path to yaml file
-    :return: object
+    Synchronize the source servers of one shard and store its partial report, with the inventory report rows and
+    the server states of the shard.
+
+    :param shard: Shard descriptor created by create_account_shards
     """
-    with open(filename, 'rb') as file:
-        return yaml.safe_load(file)
+    run_report = RunReport()
+    report_logging_handler.set_run_report(run_report)
+    api_rate_limiters.reset_statistics()
+    api_metrics.reset()
+    inventory = ShardInventory()
+    server_states = None
+    account_id = shard["account_id"]
+    # shards queued before regions.yml was supported have no region
+    region = shard.get("region") or execution_region
+
+    with log_context.context(account=account_id, region=region, run_id=shard["run_id"], shard=shard["shard_id"]):
+        logger.info("synchronizing shard", extra=dict(server_count=len(shard["source_server_ids"])))
+        try:
+            configuration = account_configuration_loader.load(account_id)
+            server_states = synchronize_account(account_id, configuration, shard["run_id"], run_report, inventory,
+                                                full_sweep=shard["full_sweep"],
+                                                source_server_ids=shard["source_server_ids"],
+                                                write_server_states=False, region=region,
+                                                compact_launch_templates=shard.get("compact_launch_templates", False))
+        except Exception as e:
+            log_error("errors while synchronizing shard: %s", e)
 
+    record_api_statistics(run_report)
+    write_shard_run_object(shard["run_id"], f"partials/{shard['shard_id']}.json", create_partial_report(
+        run_report, inventory, [server_states] if server_states is not None else []))
 
-def synchronize_all():
+
+def claim_and_process_shard(shard_queue) -> bool:
     """
-    Synchronize source servers for all AWS accounts found "dr-accounts.yml"
+    Claim one shard from the shard queue and process it. A shard whose partial report cannot be stored is left on
+    the queue, so another worker claims it once its lease expires.
+
+    :param shard_queue: Instance of SqsShardQueue or InMemoryShardQueue
+    :return: False if the queue had no shard to claim
     """
+    lease = shard_queue.claim(get_environment_int(SHARD_LEASE_ENVIRONMENT_VARIABLE, SHARD_LEASE_DEFAULT))
+    if lease is None:
+        return False
+    try:
+        process_shard(lease.shard)
+    except Exception as e:
+        log_error("could not store partial report of shard: %s", e)
+        return True
+    shard_queue.complete(lease)
+    return True
 
-    unique_id = str(uuid.uuid1())
-    run_report = RunReport()
-    report_logging_handler.set_run_report(run_report)
-    inventory_report_file = tempfile.NamedTemporaryFile('w', newline='', encoding="utf-8", delete=False)
-    inventory_report = InventoryReport(inventory_report_file)
 
-    accounts = [o for o in os.listdir(CONFIGURATION_PATH) if os.path.isdir(os.path.join(CONFIGURATION_PATH,o))]
-    for account in accounts:
-        logger.append_keys(account=account)
+def process_shards(shard_queue, context=None):
+    """
+    Worker of sharded runs: process shards until the shard queue is empty or the lambda function is about to time out.
 
-        logger.info("synchronizing account {}".format(account))
+    :param shard_queue: Instance of SqsShardQueue or InMemoryShardQueue
+    :param context: Lambda context object, or None when running locally
+    """
+    while get_remaining_seconds(context) > SHARD_TIME_MARGIN_SECONDS:
+        if not claim_and_process_shard(shard_queue):
+            break
 
-        logger.info("loading host to tag mapping")
-        with open(CONFIGURATION_PATH.joinpath(account, "server-tag-mapping.csv")) as file:
-            tag_mapping = create_host_to_tag_mapping(file)
 
-        logger.info("loading list of excluded servers")
-        with open(CONFIGURATION_PATH.joinpath(account, CONFIGURATION_PATH_EXCLUSIONS)) as file:
-            features = FeaturesConfiguration(exclusions=create_server_exclusion_list(file))
+def merge_sharded_run(run_id: str, shard_queue, context=None, invoke: Optional[typing.Callable[[dict], None]] = None):
+    """
+    Wait for every shard of a sharded run, processing shards from the queue meanwhile, then merge the partial
+    reports into one summary notification and one inventory report, and store the server states of each account.
 
+    When the lambda function is about to time out, merging continues in a new invocation. Shards still missing after
+    DR_CONFIGURATION_SYNCHRONIZER_SHARD_RUN_TIMEOUT seconds are reported as errors.
 
+    :param run_id: Id of the sharded run
+    :param shard_queue: Instance of SqsShardQueue or InMemoryShardQueue
+    :param context: Lambda context object, or None when running locally
+    :param invoke: Function starting an invocation of this lambda function with an event, as returned by
+        create_self_invoker
+    """
+    with log_context.context(run_id=run_id):
+        manifest = read_shard_run_object(run_id, "manifest.json")
+        if manifest is None:
+            raise SynchronizerException(f"no manifest found for sharded run {run_id}")
+        run_timeout = get_environment_int(SHARD_RUN_TIMEOUT_ENVIRONMENT_VARIABLE, SHARD_RUN_TIMEOUT_DEFAULT)
+
+        while True:
+            missing = set(manifest["shards"]) - list_finished_shards(run_id)
+            if not missing or time.time() - manifest["started"] >= run_timeout:
+                break
+            if invoke is not None and get_remaining_seconds(context) <= SHARD_TIME_MARGIN_SECONDS:
+                logger.info("continuing sharded run in a new invocation", extra=dict(shard_count=len(missing)))
+                invoke({"shard_run": run_id})
+                return
+            if not claim_and_process_shard(shard_queue):
+                time.sleep(SHARD_POLL_SECONDS)
+
+        run_report = RunReport()
+        run_report.time_start = datetime.datetime.fromtimestamp(manifest["started"], tz=datetime.timezone.utc)
+        report_logging_handler.set_run_report(run_report)
+        inventory_report = create_inventory_report()
+        server_states = {}
+
+        account_workers = get_environment_int(ACCOUNT_WORKERS_ENVIRONMENT_VARIABLE, ACCOUNT_WORKERS_DEFAULT)
         try:
-            synchronize_account(account, tag_mapping, features, unique_id, run_report, inventory_report)
-            logger.info("finished synchronizing account")
-        except Exception as e:
-            logger.error("Exception synchronizing account: {}".format(e))
-            log_error("errors while synchronizing account: %s", e)
-        finally:
-            logger.remove_keys(["account", "server", "host"])
-
-    run_report.send()
-    inventory_report.write_to_s3(s3)
-    Path(inventory_report_file.name).unlink(missing_ok=True)
+            with ThreadPoolExecutor(max_workers=account_workers, thread_name_prefix="merge") as executor:
+                partials = executor.map(lambda shard_id: read_shard_run_object(run_id, f"partials/{shard_id}.json"),
+                                        manifest["shards"])
+                for shard_id, partial in zip(manifest["shards"], partials):
+                    if partial is None:
+                        logger.warning("shard was not synchronized before the sharded run timed out",
+                                       extra=dict(shard=shard_id))
+                        continue
+                    merge_partial_report(partial, run_report, inventory_report, server_states)
+
+            for states in server_states.values():
+                states.write()
+            logger.info("merged partial reports of sharded run", extra=dict(shard_count=len(manifest["shards"])))
+            run_report.send()
+            inventory_report.write_to_s3()
+        except Exception:
+            inventory_report.abort()
+            raise
 
 
 def send_report(start_time: datetime, end_time: datetime, servers_processed: int,
-                error_count: int, errors: typing.Iterable[str]):
+                error_count: int, error_groups: typing.Mapping[typing.Tuple[str, str, str], int],
+                error_examples: typing.Mapping[str, typing.List[str]], servers_unchanged: int = 0,
+                skipped: Optional[typing.Mapping[str, int]] = None, launch_template_versions_deleted: int = 0,
+                rate_limit_wait_seconds: float = 0.0, throttled_requests: int = 0,
+                api_operations: Optional[typing.Dict[str, "OperationMetrics"]] = None):
     """
     Send a report
     :param start_time: Time at which the synchronizer lambda started
     :param end_time: Time at which the synchronizer finished processing all AWS accounts
     :param servers_processed: Total number of source servers process
     :param error_count: Number of errors/warnings encountered during processing
-    :param errors: Iterable of error strings
+    :param error_groups: Number of errors/warnings keyed by (error class, API operation, account)
+    :param error_examples: Formatted errors/warnings keyed by error class
+    :param servers_unchanged: Number of source servers skipped because they are unchanged since the previous run
+    :param skipped: Number of source servers and sections skipped before any API call, keyed by reason
+    :param launch_template_versions_deleted: Number of launch template versions deleted by launch template compaction
+    :param rate_limit_wait_seconds: Total seconds workers waited on API rate limiters
+    :param throttled_requests: Number of API requests throttled by AWS services
+    :param api_operations: Metrics of each API operation, as returned by ApiMetrics.summary
     """
     sns_topic = os.environ["DR_CONFIGURATION_SYNCHRONIZER_TOPIC_ARN"]
 
@@ -426,16 +2545,51 @@ def send_report(start_time: datetime, end_time: datetime, servers_processed: int
         "Time synchronizer finished: " + end_time.strftime('%Y-%m-%d %H:%M:%S %Z'),
         f"Duration: {hours:02}:{minutes:02}:{seconds:02}",
         f"Servers processed: {servers_processed}",
-        "",
-        ""
+        f"Servers unchanged since last synchronization: {servers_unchanged}",
+        f"Time waiting on API rate limits: {rate_limit_wait_seconds:.1f}s ({throttled_requests} throttled request(s))",
     ]
 
+    if skipped:
+        lines.append("Skipped before any API call:")
+        for reason, count in sorted(skipped.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"  {count} {reason}")
+
+    if launch_template_versions_deleted:
+        lines.append(f"Launch template versions deleted: {launch_template_versions_deleted}")
+
+    if api_operations:
+        operations = api_operations.values()
+        lines.append(f"API calls: {sum(metrics.calls for metrics in operations)} "
+                     f"({sum(metrics.retries for metrics in operations)} retried, "
+                     f"{sum(metrics.errors for metrics in operations)} error response(s))")
+        lines.append("Slowest API operations by total latency:")
+        slowest = sorted(api_operations.items(), key=lambda item: item[1].latency_ms, reverse=True)
+        for name, metrics in slowest[:API_SLOWEST_OPERATIONS_REPORTED]:
+            lines.append(f"  {name}: {metrics.calls} call(s), {metrics.retries} retried, "
+                         f"{metrics.throttles} throttled, average {metrics.average_latency_ms():.0f}ms, "
+                         f"p90 {metrics.latency_percentile_ms(0.9):.0f}ms")
+    lines += ["", ""]
+
     message = "\n".join(lines)
 
-    if len(errors) > 0:
-        message += "First %d, of %d total error(s)/warnings(s):" % (min(error_count, 10), error_count)
-        for i, error in enumerate(errors):
-            message += f"\n\n{(i + 1):02}. {error}"
+    if error_count > 0:
+        message += f"{error_count} error(s)/warning(s) by class, API operation and account:\n"
+        groups = sorted(error_groups.items(), key=lambda group: group[1], reverse=True)
+        for (error_class, operation, account), count in groups[:REPORTED_ERROR_GROUPS]:
+            where = "".join([f" in {operation}" if operation else "", f", account {account}" if account else ""])
+            message += f"\n{count:>7} {error_class}{where}"
+        if len(groups) > REPORTED_ERROR_GROUPS:
+            message += f"\n    ... {len(groups) - REPORTED_ERROR_GROUPS} more group(s)"
+
+        class_counts = {}
+        for (error_class, _, _), count in error_groups.items():
+            class_counts[error_class] = class_counts.get(error_class, 0) + count
+        examples = [example
+                    for error_class in sorted(class_counts, key=class_counts.get, reverse=True)
+                    for example in error_examples.get(error_class, [])][:REPORTED_ERROR_EXAMPLES]
+        message += "\n\nExamples of the most frequent error classes:"
+        for i, example in enumerate(examples):
+            message += f"\n\n{(i + 1):02}. {example}"
     else:
         message += "No errors/warnings reported"
 
@@ -462,7 +2616,7 @@ class FeaturesConfiguration:
     def __init__(self, exclusions):
         """
         Object that returns feature toggle/exclusion information for source servers.
-        :param exclusions: dict as returned by create_server_exclusion_list
+        :param exclusions: dict as returned by parse_server_exclusion_list
         """
         self.exclusions = exclusions
 
@@ -482,138 +2636,561 @@ class FeaturesConfiguration:
         return EXCLUSION_ALL in host_exclusions or EXCLUSION_NETWORK_CONFIGURATION in host_exclusions
 
 
-def synchronize_account(account_id: str, tag_mapping, features: FeaturesConfiguration, unique_id,
-                        report: RunReport, inventory_report: InventoryReport):
+class AccountConfiguration(typing.NamedTuple):
+    """
+    Configuration of one AWS account, loaded by AccountConfigurationLoader.
+    """
+    tag_mapping: dict
+    features: FeaturesConfiguration
+    ec2_launch_template_configurations: "FileConfiguration"
+    drs_launch_configurations: "FileConfiguration"
+    drs_replication_configurations: "FileConfiguration"
+    # DRS regions synchronized in the account, empty for the region of the lambda function
+    regions: typing.Tuple[str, ...] = ()
+
+
+class AccountConfigurationLoader:
+    """
+    Loads the configuration of each AWS account from the bundle compiled by deploy.py, or from the files under the
+    configuration directory when there is no bundle, such as when running simulate_synchronizer.py, or when a file
+    under the configuration directory was changed after the bundle was compiled.
+
+    Only the header of the bundle is read up front; each account is parsed when it is first synchronized and kept
+    for later invocations of a warm lambda.
+    """
+
+    def __init__(self, configuration_path: Path = CONFIGURATION_PATH, bundle_path: Path = CONFIGURATION_BUNDLE_PATH):
+        self.configuration_path = configuration_path
+        self.bundle_path = bundle_path
+        self.lock = threading.Lock()
+        self.bundle = None
+        self.bundle_checked = False
+        self.configurations = {}
+
+    def get_bundle(self) -> Optional[ConfigurationBundle]:
+        """
+        :return: Instance of ConfigurationBundle, or None if the lambda package has no bundle or the bundle is older
+            than the configuration directory
+        """
+        with self.lock:
+            if not self.bundle_checked and self.bundle_path.is_file():
+                if is_bundle_stale(self.configuration_path, self.bundle_path):
+                    logger.warning("configuration changed after the bundle was compiled, reading configuration files",
+                                   extra=dict(bundle=str(self.bundle_path)))
+                else:
+                    self.bundle = ConfigurationBundle(self.bundle_path)
+                    logger.info("loaded configuration bundle", extra=dict(account_count=len(self.bundle.accounts())))
+            self.bundle_checked = True
+            return self.bundle
+
+    def accounts(self) -> typing.List[str]:
+        """
+        :return: AWS account ids with a configuration directory
+        """
+        bundle = self.get_bundle()
+        if bundle is not None:
+            return bundle.accounts()
+        return list_configured_accounts(self.configuration_path)
+
+    def load(self, account: str) -> AccountConfiguration:
+        """
+        :param account: AWS account id, the name of a directory under the configuration directory
+        :return: Instance of AccountConfiguration
+        """
+        with self.lock:
+            configuration = self.configurations.get(account)
+        if configuration is not None:
+            return configuration
+
+        bundle = self.get_bundle()
+        account_path = self.configuration_path.joinpath(account)
+        if bundle is not None:
+            account_slice = bundle.load(account)
+        else:
+            account_slice = read_account_configuration(account_path)
+
+        logger.info("loaded tag mapping for source servers", extra={"server_count": len(account_slice["tag_mapping"])})
+        logger.info("loaded server exclusion list", extra={"server_count": len(account_slice["exclusions"])})
+        configuration = AccountConfiguration(
+            tag_mapping=account_slice["tag_mapping"],
+            features=FeaturesConfiguration(exclusions=account_slice["exclusions"]),
+            ec2_launch_template_configurations=FileConfiguration(
+                account_path.joinpath(CONFIGURATION_PATH_EC2_LAUNCH_TEMPLATES),
+                account_slice[CONFIGURATION_PATH_EC2_LAUNCH_TEMPLATES]),
+            drs_launch_configurations=FileConfiguration(
+                account_path.joinpath(CONFIGURATION_PATH_DRS_LAUNCH_CONFIGURATIONS),
+                account_slice[CONFIGURATION_PATH_DRS_LAUNCH_CONFIGURATIONS]),
+            drs_replication_configurations=FileConfiguration(
+                account_path.joinpath(CONFIGURATION_PATH_DRS_REPLICATION_CONFIGURATIONS),
+                account_slice[CONFIGURATION_PATH_DRS_REPLICATION_CONFIGURATIONS]),
+            # bundles compiled before regions.yml was supported have no regions key
+            regions=tuple(account_slice.get("regions", []))
+        )
+        with self.lock:
+            return self.configurations.setdefault(account, configuration)
+
+
+account_configuration_loader = AccountConfigurationLoader()
+
+
+# service models are parsed once and shared by the sessions of every account, instead of once per session
+botocore_data_loader = botocore.session.get_session().get_component("data_loader")
+
+
+class AssumeRoleCredentialProvider(CredentialProvider):
+    METHOD = "sts-assume-role"
+
+    def __init__(self, role_arn: str):
+        """
+        Credential provider assuming a role with the sts client of the lambda function. The credentials it loads are
+        refreshed by assuming the role again shortly before they expire.
+
+        :param role_arn: ARN of the role to assume
+        """
+        super().__init__()
+        self.role_arn = role_arn
+
+    def assume_role(self) -> dict:
+        logger.info("assuming role in account", extra=dict(role_arn=self.role_arn))
+        credentials = sts.assume_role(
+            RoleArn=self.role_arn,
+            RoleSessionName="DRConfigurationSynchronizer"
+        )["Credentials"]
+        return dict(access_key=credentials["AccessKeyId"], secret_key=credentials["SecretAccessKey"],
+                    token=credentials["SessionToken"], expiry_time=credentials["Expiration"].isoformat())
+
+    def load(self) -> RefreshableCredentials:
+        return RefreshableCredentials.create_from_metadata(
+            metadata=self.assume_role(), refresh_using=self.assume_role, method=self.METHOD)
+
+
+def assume_role_session(account_id: str) -> boto3.session.Session:
+    """
+    Assume the synchronizer role in an AWS account.
+
+    The credentials of the session are refreshed by assuming the role again shortly before they expire, so clients
+    created from the session can be used for longer than the duration of one role session.
+
+    :param account_id: AWS account id
+    :return: boto3 session with the credentials of the role
+    """
+    role_name = os.environ["DR_CONFIGURATION_SYNCHRONIZER_ROLE_NAME"]
+    botocore_session = botocore.session.get_session()
+    botocore_session.register_component("data_loader", botocore_data_loader)
+    botocore_session.register_component("credential_provider", CredentialResolver(
+        providers=[AssumeRoleCredentialProvider(f"arn:aws:iam::{account_id}:role/{role_name}")]))
+    # the role is assumed right away so that an account whose role cannot be assumed fails before any other call
+    botocore_session.get_credentials()
+    return boto3.session.Session(botocore_session=botocore_session)
+
+
+class AccountClientPool:
+    def __init__(self, create_session: typing.Callable[[str], boto3.session.Session] = assume_role_session):
+        """
+        Sessions and clients for the AWS accounts synchronized, kept for later accounts, shards and warm invocations.
+        lambda_handler evicts the accounts no longer in the configuration when an invocation starts, so the pool never
+        grows past the configured accounts, regions and services; the credentials of each session are refreshed
+        before they expire.
+
+        Each account has one session, created by `create_session`, and one client per region and service, attached
+        to the API rate limiters and API metrics. Clients are thread safe, so every worker synchronizing an account
+        shares them.
+
+        :param create_session: Function returning a boto3 session for an AWS account id
+        """
+        self.create_session = create_session
+        self.sessions = {}
+        self.clients = {}
+        # boto3 sessions are not thread safe, so the session and clients of an account are only created while
+        # holding the lock of the account; other accounts are not blocked meanwhile
+        self.account_locks = {}
+        self.lock = threading.Lock()
+
+    def client(self, account_id: str, service: str, region: Optional[str] = None):
+        """
+        :param account_id: AWS account id
+        :param service: Name of the AWS service, such as ec2
+        :param region: AWS region, the region of the lambda function if None
+        :return: boto3 client for the service, created if it does not exist yet
+        """
+        with self.lock:
+            account_lock = self.account_locks.setdefault(account_id, threading.Lock())
+        with account_lock:
+            session = self.sessions.get(account_id)
+            if session is None:
+                session = self.sessions[account_id] = self.create_session(account_id)
+            region = region or session.region_name
+            key = (account_id, region, service)
+            client = self.clients.get(key)
+            if client is None:
+                client = session.client(service, region_name=region, config=boto_client_config)
+                api_rate_limiters.attach(client, account_id)
+                api_metrics.attach(client, account_id)
+                self.clients[key] = client
+            return client
+
+    def retain(self, account_ids: typing.Collection[str]):
+        """
+        Drop the sessions and clients of every account not in `account_ids`.
+
+        :param account_ids: AWS account ids kept in the pool
+        """
+        account_ids = set(account_ids)
+        with self.lock:
+            self.sessions = {account_id: session for account_id, session in self.sessions.items()
+                             if account_id in account_ids}
+            self.clients = {key: client for key, client in self.clients.items() if key[0] in account_ids}
+            self.account_locks = {account_id: lock for account_id, lock in self.account_locks.items()
+                                  if account_id in account_ids}
+
+
+account_client_pool = AccountClientPool()
+
+
+def create_account_clients(account_id: str, region: Optional[str] = None):
+    """
+    Get clients for EC2 and DRS in an AWS account from the account client pool, assuming the synchronizer role in the
+    account if it has no session yet.
+
+    :param account_id: AWS account id
+    :param region: AWS region of the clients, or None for the region of the lambda function
+    :return: Tuple of boto3 clients for ec2 and drs
+    """
+    return (account_client_pool.client(account_id, "ec2", region=region),
+            account_client_pool.client(account_id, "drs", region=region))
+
+
+def get_account_regions(configuration: AccountConfiguration) -> typing.List[str]:
+    """
+    :param configuration: Instance of AccountConfiguration
+    :return: DRS regions synchronized in the account, from its regions.yml, or the region of the lambda function
+    """
+    return list(configuration.regions) or [execution_region]
+
+
+def list_source_servers(drs, source_server_ids: Optional[typing.List[str]] = None):
+    """
+    List source servers, with the filters of DR_CONFIGURATION_SYNCHRONIZER_STAGING_ACCOUNT_IDS and
+    DR_CONFIGURATION_SYNCHRONIZER_SOURCE_SERVER_IDS applied by DRS.
+
+    :param drs: Boto3 client for drs
+    :param source_server_ids: DRS source server ids to describe, or None for every source server
+    :return: Generator of lists of source servers, one for each page returned by "DescribeSourceServers"
+    """
+    source_server_paginator = drs.get_paginator("describe_source_servers")
+    filters = get_source_server_filters()
+    configured_source_server_ids = get_configured_source_server_ids()
+    if source_server_ids is None:
+        source_server_ids = configured_source_server_ids
+    elif configured_source_server_ids is not None:
+        configured = set(configured_source_server_ids)
+        source_server_ids = [source_server_id for source_server_id in source_server_ids
+                             if source_server_id in configured]
+    if source_server_ids is None:
+        for page in source_server_paginator.paginate(filters=filters):
+            yield page["items"]
+        return
+    for start in range(0, len(source_server_ids), SOURCE_SERVER_ID_FILTER_SIZE):
+        chunk = source_server_ids[start:start + SOURCE_SERVER_ID_FILTER_SIZE]
+        for page in source_server_paginator.paginate(filters=dict(filters, sourceServerIDs=chunk)):
+            yield page["items"]
+
+
+def list_source_server_pages(drs, starting_token: Optional[str] = None):
+    """
+    :param drs: Boto3 client for drs
+    :param starting_token: Pagination token of the first page to return, or None to start from the first page
+    :return: Generator of (token, source servers) for each page returned by "DescribeSourceServers", where token is the
+        pagination token the page was requested with, None for the first page. Only the filter of
+        DR_CONFIGURATION_SYNCHRONIZER_STAGING_ACCOUNT_IDS applies, use list_source_servers for configured source
+        server ids.
+    """
+    token = starting_token
+    filters = get_source_server_filters()
+    while True:
+        arguments = dict(filters=filters)
+        if token:
+            arguments["nextToken"] = token
+        page = drs.describe_source_servers(**arguments)
+        yield token, page["items"]
+        token = page.get("nextToken")
+        if not token:
+            return
+
+
+def synchronize_account(account_id: str, configuration: AccountConfiguration, unique_id,
+                        report: RunReport, inventory_report: InventoryReport, full_sweep: bool = False,
+                        source_server_ids: Optional[typing.List[str]] = None,
+                        write_server_states: bool = True, region: Optional[str] = None,
+                        checkpoint: Optional["RunCheckpoint"] = None, next_token: Optional[str] = None,
+                        skip: int = 0, compact_launch_templates: bool = True) -> Optional[ServerStates]:
     """
-    Synchronize configuration for all source servers in a give AWS account
+    Synchronize configuration for all source servers in a give AWS account and region
+
+    Source servers flow through a pipeline of stages (fetch state, build desired state, diff, apply writes)
+    connected by bounded queues, so reads for one server overlap writes for another. Servers unchanged since the
+    previous run are skipped, see ServerStates. With DR_CONFIGURATION_SYNCHRONIZER_SERVER_ORDER=drift, every source
+    server is listed first and the servers most likely to have drifted are synchronized first, see
+    ConfigurationSynchronizer.drift_priority, so a run stopped by its time budget leaves the least likely ones.
 
     :param account_id: AWS account id to process.
-    :param tag_mapping: dict as returned by create_host_to_tag_mapping
-    :param features: Instance of FeaturesConfiguration object
+    :param configuration: Instance of AccountConfiguration for this account
     :param unique_id: uuid representing a single invocation of DRS synchronizer
     :param report: instance of RunReport
-    :param inventory_report: instance of InventoryReport
-    :return:
+    :param inventory_report: instance of InventoryReport, or ShardInventory
+    :param full_sweep: True to synchronize every source server, including servers unchanged since the previous run
+    :param source_server_ids: Only synchronize these source servers, such as the servers of one shard or the servers
+        left by the previous invocation of a checkpointed run
+    :param write_server_states: False to leave the server states to the caller, which merges the states of every
+        shard of a sharded run
+    :param region: AWS region to synchronize, or None for the region of the lambda function
+    :param checkpoint: Instance of RunCheckpoint to stop before the lambda function times out, which then holds the
+        server states instead of writing them
+    :param next_token: DRS pagination token of the page of source servers to start from, see RunCheckpoint.suspend
+    :param skip: Number of source servers of the first page to skip, already synchronized by a previous invocation
+    :param compact_launch_templates: False to leave launch template compaction to another shard of a sharded run,
+        see LaunchTemplateCompaction; compaction only runs when DR_CONFIGURATION_SYNCHRONIZER_LAUNCH_TEMPLATE_VERSIONS_KEPT
+        is set and every source server was synchronized
+    :return: Instance of ServerStates, or None if the account is excluded
     """
+    server_order = get_server_order()
 
-    if features.is_excluded("*"):
+    if configuration.features.is_excluded("*"):
         logger.info("Exclusion * found for account {}, skipping...".format(account_id))
+        return None
     else:
-        role_name = os.environ["DR_CONFIGURATION_SYNCHRONIZER_ROLE_NAME"]
-        role_arn = f"arn:aws:iam::{account_id}:role/{role_name}"
-        logger.info("assuming role in account", extra=dict(role_arn=role_arn))
-        assumed_role_object = sts.assume_role(
-            RoleArn=role_arn,
-            RoleSessionName="DRConfigurationSynchronizer"
-        )
-        credentials = assumed_role_object['Credentials']
-
-        ec2 = boto3.client(
-            'ec2',
-            aws_access_key_id=credentials['AccessKeyId'],
-            aws_secret_access_key=credentials['SecretAccessKey'],
-            aws_session_token=credentials['SessionToken'],
-            config=boto_client_config
-        )
-
-        drs = boto3.client(
-            'drs',
-            aws_access_key_id=credentials['AccessKeyId'],
-            aws_secret_access_key=credentials['SecretAccessKey'],
-            aws_session_token=credentials['SessionToken'],
-            config=boto_client_config
-        )
-        subnet_cidr_mapping = create_subnet_cidr_mapping(ec2)
+        ec2, drs = create_account_clients(account_id, region)
+        region = ec2.meta.region_name
+        subnet_cidr_mapping = network_topology_cache.get_subnet_cidr_mapping(ec2, account_id)
+        server_states = ServerStates.read(account_id, region, full_sweep=full_sweep)
 
-        sync = ConfigurationSynchronizer(ec2, drs, features, unique_id, account_id=account_id,
+        sync = ConfigurationSynchronizer(ec2, drs, configuration.features, unique_id, account_id=account_id,
                                          cidr_subnet_mapping=subnet_cidr_mapping,
-                                         server_tag_mapping=tag_mapping,
-                                         ec2_launch_template_configurations=FileConfiguration(
-                                             CONFIGURATION_PATH.joinpath(account_id, CONFIGURATION_PATH_EC2_LAUNCH_TEMPLATES)),
-                                         drs_launch_configurations=FileConfiguration(
-                                             CONFIGURATION_PATH.joinpath(account_id, CONFIGURATION_PATH_DRS_LAUNCH_CONFIGURATIONS)),
-                                         drs_replication_configurations=FileConfiguration(
-                                             CONFIGURATION_PATH.joinpath(account_id, CONFIGURATION_PATH_DRS_REPLICATION_CONFIGURATIONS))
+                                         server_tag_mapping=configuration.tag_mapping,
+                                         ec2_launch_template_configurations=configuration.ec2_launch_template_configurations,
+                                         drs_launch_configurations=configuration.drs_launch_configurations,
+                                         drs_replication_configurations=configuration.drs_replication_configurations,
+                                         server_states=server_states,
+                                         report=report
                                          )
-        logger.info("retrieving list of source servers")
-        source_server_paginator = drs.get_paginator("describe_source_servers")
-        # for every DRS source server, attempt to synchronize configuration
-        for page in source_server_paginator.paginate(filters={}):
-            for server in page["items"]:
-                report.increment_servers_processed()
-                source_server_id = server["sourceServerID"]
-                logger.append_keys(server=source_server_id)
-                launch_configuration = drs.get_launch_configuration(sourceServerID=source_server_id)
-                del launch_configuration["ResponseMetadata"]
 
-                server_host = server.get("sourceProperties", {}).get("identificationHints", {}).get("hostname")
+        if checkpoint is None or not checkpoint.expired():
+            sync.prefetch_default_launch_template_versions()
+
+        def apply_and_report(item: ServerSynchronization):
+            sync.apply_server_changes(item)
+            inventory_report.add_server(aws_account_id=account_id, region=region, **item.inventory())
+
+        pipeline = Pipeline([
+            PipelineStage("fetch", sync.fetch_server_state,
+                          get_environment_int(FETCH_WORKERS_ENVIRONMENT_VARIABLE, FETCH_WORKERS_DEFAULT)),
+            PipelineStage("desired state", sync.build_desired_state,
+                          get_environment_int(DESIRED_STATE_WORKERS_ENVIRONMENT_VARIABLE, DESIRED_STATE_WORKERS_DEFAULT)),
+            PipelineStage("diff", sync.diff_server_state,
+                          get_environment_int(DIFF_WORKERS_ENVIRONMENT_VARIABLE, DIFF_WORKERS_DEFAULT)),
+            PipelineStage("apply", apply_and_report,
+                          get_environment_int(APPLY_WORKERS_ENVIRONMENT_VARIABLE, APPLY_WORKERS_DEFAULT)),
+        ], queue_size=get_environment_int(PIPELINE_QUEUE_SIZE_ENVIRONMENT_VARIABLE, PIPELINE_QUEUE_SIZE_DEFAULT),
+            log_keys=ServerSynchronization.log_keys)
+
+        # the cursor of a checkpoint is the source servers left when they are not synchronized in DRS page order
+        by_source_server_id = (source_server_ids is not None or server_order == SERVER_ORDER_DRIFT
+                               or get_configured_source_server_ids() is not None)
+
+        def source_server_pages():
+            if not by_source_server_id:
+                yield from list_source_server_pages(drs, next_token)
+                return
+            servers = [server for page in list_source_servers(drs, source_server_ids) for server in page]
+            yield None, servers
+
+        # inventory of the servers deferred to the next run, reported as recorded when they were last synchronized
+        deferred_inventory = []
+
+        # not empty once the servers left are suspended or deferred, see stop
+        stopped = []
+
+        def stop(token: Optional[str], page: typing.List[dict], index: int, pages):
+            stopped.append(index)
+            if checkpoint.budget_exhausted():
+                left = [server["sourceServerID"] for server in page[index:]]
+                left.extend(server["sourceServerID"] for _, later in pages for server in later)
+                deferred_inventory.extend(server_states.defer(left))
+                for _ in left:
+                    report.increment_skipped(SKIPPED_DEFERRED)
+                logger.info("run time budget exhausted, deferring servers to the next run",
+                            extra=dict(server_count=len(left)))
+            elif by_source_server_id:
+                checkpoint.suspend(account_id, region,
+                                   source_server_ids=[server["sourceServerID"] for server in page[index:]])
+            else:
+                checkpoint.suspend(account_id, region, token, index)
+
+        def source_servers():
+            logger.info("retrieving list of source servers")
+            pages = source_server_pages()
+            offset = skip
+            # for every DRS source server, attempt to synchronize configuration
+            for token, page in pages:
+                items = [ServerSynchronization(server) for server in page[offset:]]
+                sync.resolve_subnets(items)
+                sync.triage(items)
+                if server_order == SERVER_ORDER_DRIFT:
+                    items.sort(key=sync.drift_priority)
+                    page = [item.server for item in items]
+                    offset = 0
+                for index, item in enumerate(items, start=offset):
+                    if checkpoint is not None and checkpoint.expired():
+                        stop(token, page, index, pages)
+                        return
+                    report.increment_servers_processed()
+                    yield item
+                offset = 0
 
-                if server_host is None:
-                    logger.error("drs did not return hostname for server")
-                    continue
+        try:
+            pipeline.run(source_servers())
+            versions_kept = get_environment_int(LAUNCH_TEMPLATE_VERSIONS_KEPT_ENVIRONMENT_VARIABLE, 0)
+            if compact_launch_templates and versions_kept and not stopped:
+                LaunchTemplateCompaction(ec2, account_id, region, versions_kept, report).run(
+                    checkpoint.expired if checkpoint is not None else None)
+        finally:
+            # servers skipped as unchanged are reported with the inventory recorded when they were synchronized
+            for inventory in server_states.unchanged + deferred_inventory:
+                inventory_report.add_server(aws_account_id=account_id, region=region, **inventory)
+            report.increment_servers_unchanged(len(server_states.unchanged))
+            if checkpoint is not None:
+                checkpoint.add_server_states(server_states)
+            elif write_server_states:
+                server_states.write()
+        return server_states
+
+
+def synchronize_account_source_servers(account_id: str, configuration: AccountConfiguration,
+                                      source_server_ids: typing.List[str], unique_id, report: RunReport,
+                                      region: Optional[str] = None):
+    """
+    Synchronize some of the source servers of an AWS account, such as the servers named by a DRS event.
 
-                # take first segment from hostname returned from DRS
-                server_host = server_host.lower().split('.')[0]
+    Uses the same ConfigurationSynchronizer steps as synchronize_account, and the cached configuration and network
+    topology, but reads the launch template of each server on its own instead of prefetching every launch template in
+    the account. Servers are always synchronized, whether or not they changed since the previous run.
 
-                logger.append_keys(host=server_host)
+    :param account_id: AWS account id
+    :param configuration: Instance of AccountConfiguration for this account
+    :param source_server_ids: DRS source server ids
+    :param unique_id: uuid representing a single invocation of DRS synchronizer
+    :param report: instance of RunReport
+    :param region: AWS region of the source servers, or None for the region of the lambda function
+    """
+    if configuration.features.is_excluded("*"):
+        logger.info("Exclusion * found for account {}, skipping...".format(account_id))
+        return
+
+    ec2, drs = create_account_clients(account_id, region)
+    subnet_cidr_mapping = network_topology_cache.get_subnet_cidr_mapping(ec2, account_id)
+    sync = ConfigurationSynchronizer(ec2, drs, configuration.features, unique_id, account_id=account_id,
+                                     cidr_subnet_mapping=subnet_cidr_mapping,
+                                     server_tag_mapping=configuration.tag_mapping,
+                                     ec2_launch_template_configurations=configuration.ec2_launch_template_configurations,
+                                     drs_launch_configurations=configuration.drs_launch_configurations,
+                                     drs_replication_configurations=configuration.drs_replication_configurations,
+                                     report=report
+                                     )
+    pipeline = Pipeline([
+        PipelineStage("synchronize", sync.synchronize_server,
+                      get_environment_int(FETCH_WORKERS_ENVIRONMENT_VARIABLE, FETCH_WORKERS_DEFAULT)),
+    ], queue_size=get_environment_int(PIPELINE_QUEUE_SIZE_ENVIRONMENT_VARIABLE, PIPELINE_QUEUE_SIZE_DEFAULT),
+        log_keys=ServerSynchronization.log_keys)
+    found = set()
+
+    def source_servers():
+        logger.info("retrieving source servers", extra=dict(server_count=len(source_server_ids)))
+        for page in list_source_servers(drs, source_server_ids):
+            items = [ServerSynchronization(server) for server in page]
+            sync.resolve_subnets(items)
+            sync.triage(items)
+            for item in items:
+                found.add(item.source_server_id)
+                report.increment_servers_processed()
+                yield item
 
-                if features.is_excluded(server_host):
-                    logger.info(f"skipping server to due to {EXCLUSION_ALL}")
-                    continue
+    pipeline.run(source_servers())
+    for source_server_id in source_server_ids:
+        if source_server_id not in found:
+            logger.warning("source server not found in drs", extra=dict(server=source_server_id))
 
-                if exclude_network_config := features.is_network_configuration_excluded("*") or features.is_network_configuration_excluded(server_host):
-                    logger.info("will skip network configuration for this server")
 
-                source_server_ip = None
-                subnet_ids = None
-                security_group_ids = None
-                launch_template_ip = None
-                copy_private_ip = None
+class PipelineStage(typing.NamedTuple):
+    """
+    One stage of a Pipeline.
 
-                try:
-                    (source_server_ip, subnet_ids, security_group_ids,
-                     launch_template_ip) = sync.synchronize_launch_template(
-                        server, launch_configuration, exclude_network_config)
-                except ClientError as e:
-                    log_error("service error while synchronizing launch template: %s", e)
-                except SynchronizerException as e:
-                    log_error("error while synchronizing launch template: %s", e)
+    `function` is called with each item and returns the item to pass to the next stage, or None to drop it.
+    """
+    name: str
+    function: typing.Callable[[typing.Any], typing.Any]
+    workers: int
 
-                try:
-                    copy_private_ip = sync.synchronize_launch_configuration(
-                        server, launch_configuration, exclude_network_config)
-                except ClientError as e:
-                    log_error("service error while synchronizing launch configuration: %s", e)
-                except SynchronizerException as e:
-                    log_error("error while synchronizing launch configuration: %s", e)
 
-                try:
-                    sync.synchronize_tags(server_host, server["arn"], server["tags"], exclude_network_config)
-                except ClientError as e:
-                    log_error("service error while synchronizing source server tags: %s", e)
-                except SynchronizerException as e:
-                    log_error("error while synchronizing source server tags: %s", e)
+class Pipeline:
+    _STOP = object()
 
-                try:
-                    sync.synchronize_replication_settings(server)
-                except ClientError as e:
-                    log_error("service error while synchronizing replication configuration: %s", e)
-                except SynchronizerException as e:
-                    log_error("error while synchronizing replication configuration: %s", e)
+    def __init__(self, stages: typing.Sequence[PipelineStage], queue_size: int,
+                 log_keys: Optional[typing.Callable[[typing.Any], dict]] = None):
+        """
+        Runs items through a sequence of stages, each with its own pool of worker threads.
 
-                inventory_report.add_server(
-                    aws_account_id=account_id,
-                    source_server_id=server["sourceServerID"],
-                    hostname=server_host,
-                    is_network_configuration_excluded=exclude_network_config,
-                    copy_private_ip=copy_private_ip,
-                    source_server_ip=source_server_ip,
-                    launch_template_ip=launch_template_ip,
-                    launch_template_subnet=subnet_ids,
-                    launch_template_security_group=security_group_ids
-                )
+        Stages are connected by bounded queues so a slow stage applies back pressure to the stages before it.
+        Workers inherit the log context of the thread calling `run`.
 
-                logger.remove_keys(["server", "host"])
+        :param stages: Stages in the order items flow through them
+        :param queue_size: Maximum number of items waiting in front of each stage
+        :param log_keys: Optional function returning log keys to add while a worker processes an item
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        self.log_keys = log_keys
+
+    def run(self, items: typing.Iterable):
+        """
+        Feed `items` into the first stage and block until every stage has drained.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        context = log_context.get_keys()
+        workers = []
+        for index, stage in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            workers.append([
+                threading.Thread(target=self._work, args=(stage, queues[index], outbox, context),
+                                 name=f"{stage.name}-{n}", daemon=True)
+                for n in range(stage.workers)
+            ])
+        for stage_workers in workers:
+            for worker in stage_workers:
+                worker.start()
+
+        try:
+            for item in items:
+                queues[0].put(item)
+        finally:
+            # stop each stage only after the stage in front of it has finished
+            for index, stage_workers in enumerate(workers):
+                for _ in stage_workers:
+                    queues[index].put(self._STOP)
+                for worker in stage_workers:
+                    worker.join()
+
+    def _work(self, stage: PipelineStage, inbox: queue.Queue, outbox: Optional[queue.Queue], context: dict):
+        log_context.append_keys(**context)
+        while (item := inbox.get()) is not self._STOP:
+            keys = self.log_keys(item) if self.log_keys else {}
+            with log_context.context(**keys):
+                try:
+                    result = stage.function(item)
+                except Exception as e:
+                    log_error(f"unexpected error in {stage.name} stage: %s", e)
+                    continue
+            if result is not None and outbox is not None:
+                outbox.put(result)
 
 
 class FileConfiguration:
@@ -624,53 +3201,147 @@ class FileConfiguration:
     Create a defaults dictionary for use when an override doesn't match a source server
     """
 
-    def __init__(self, directory: Path):
+    def __init__(self, directory: Path, data: Optional[dict] = None):
+        """
+        :param directory: Path to the configuration directory
+        :param data: Parsed directory as returned by read_configuration_directory, for example a slice of the
+            configuration bundle. The directory is read when this is not provided.
+        """
         self.directory = directory
-        self.defaults = read_yaml_configuration_file(self.directory.joinpath("defaults.yml"))
+        if data is None:
+            data = read_configuration_directory(directory)
+        self.defaults = data["defaults"]
         self.configurations = {}
-        for filename in self.directory.iterdir():
-            if (match := CONFIGURATION_OVERRIDE_PATTERN.fullmatch(filename.name)) is not None:
-                tag_key = match.group(1)
-                tag_value = match.group(2)
-                key = f"{tag_key}__{tag_value}"
-                configuration = {}
-                override = read_yaml_configuration_file(filename)
-                for config_key in override:
-                    configuration[config_key] = override[config_key]
-                self.configurations[key] = configuration
-            elif (match := CONFIGURATION_ACCOUNT_DEFAULT_PATTERN.fullmatch(filename.name)) is not None:
-                account_id = match.group(1)
-                key = f"account_{account_id}"
-                configuration = {}
-                override = read_yaml_configuration_file(filename)
-                for config_key in override:
-                    configuration[config_key] = override[config_key]
-                self.configurations[key] = configuration
-
-    def build(self, tags, account_id=None):
+        # results of build, keyed by the tuple of overrides applied
+        self.cache = {}
+        for tag_key, values in data["overrides"].items():
+            for tag_value, override in values.items():
+                self.configurations[f"{tag_key}__{tag_value}"] = dict(override)
+        for account_id, override in data["accounts"].items():
+            self.configurations[f"account_{account_id}"] = dict(override)
+
+    def build(self, tags, account_id=None) -> typing.Mapping:
         """
+        Results are cached by the account override and the tag overrides that match `tags`, so servers sharing a
+        combination of overrides share one result. The returned mapping is a read-only view whose nested values
+        are shared by every caller; copy anything that needs to change.
+
         :param tags: dict of tag keys and values
         :param account_id: AWS account id o
         :return: Configuration object dynamically built from defaults and any tag overrides match tags in `tags`.
         """
-        config = {}
-        for k in self.defaults:
-            config[k] = self.defaults[k]
-
+        # overrides that apply, in the order they are applied
+        override_keys = []
         if account_id:
             account_key = f"account_{account_id}"
             if account_key in self.configurations:
-                for k in self.configurations[account_key]:
-                    config[k] = self.configurations[account_key][k]
+                override_keys.append(account_key)
 
         for tag_key in tags:
             config_key = f"{tag_key}__{tags[tag_key]}"
-            if config_key not in self.configurations:
-                continue
-            for k in self.configurations[config_key]:
-                config[k] = self.configurations[config_key][k]
+            if config_key in self.configurations:
+                override_keys.append(config_key)
+
+        override_keys = tuple(override_keys)
+        config = self.cache.get(override_keys)
+        if config is None:
+            merged = {}
+            for k in self.defaults:
+                merged[k] = self.defaults[k]
+            for override_key in override_keys:
+                for k in self.configurations[override_key]:
+                    merged[k] = self.configurations[override_key][k]
+            config = self.cache.setdefault(override_keys, MappingProxyType(merged))
+        return config
+
+
+class ChangePlan:
+    def __init__(self, current: dict, desired: dict):
+        """
+        Current and desired settings for one configuration section of a source server.
+
+        :param current: Settings currently applied in AWS, limited to the keys managed by the synchronizer
+        :param desired: Settings built from source control
+        """
+        self.current = current
+        self.desired = desired
+        self.diff = None
+
+    def compute_diff(self) -> bool:
+        """
+        :return: True if the current settings differ from the desired settings
+        """
+        self.diff = StructuralDiff(self.current, self.desired)
+        return len(self.diff.affected_root_keys) > 0
+
+
+class ServerSynchronization:
+    def __init__(self, server: dict):
+        """
+        State of one source server as it moves through the stages of synchronize_account.
 
-        return copy.deepcopy(config)
+        :param server: dict for a DRS source server as returned by "DescribeSourceServers" api call.
+        """
+        self.server = server
+        self.source_server_id = server["sourceServerID"]
+        self.host = None
+        self.exclude_network_config = False
+
+        # sections with something to synchronize, see ConfigurationSynchronizer.configured_sections
+        self.sections = set(SECTIONS)
+        # category of the server, see triage_source_server
+        self.triage = TRIAGE_REPLICATING
+
+        # state read from DRS and EC2 in the fetch stage
+        self.launch_configuration = None
+        self.launch_template_version = None
+        self.replication_configuration = None
+
+        # result of get_vpc_info_from_ip_address for the first ip address of the server, when already resolved
+        self.subnet_match = None
+
+        # ConfigurationSynchronizer.server_fingerprint, when incremental synchronization is enabled
+        self.fingerprint = None
+        # default version number of the launch template once the launch template section is synchronized
+        self.default_launch_template_version = None
+
+        # ChangePlan per section, removed by the diff stage when a section has not changed
+        self.plans = {}
+        self.failed_sections = set()
+        # outcome of each section, such as OUTCOME_UPDATED, for the record logged in compact mode
+        self.outcomes = {}
+
+        # values reported in the inventory report
+        self.source_server_ip = None
+        self.subnet_id = None
+        self.security_group_ids = None
+        self.launch_template_ip = None
+        self.copy_private_ip = None
+
+    def log_keys(self) -> dict:
+        """
+        :return: Log keys identifying this source server
+        """
+        keys = dict(server=self.source_server_id)
+        if self.host is not None:
+            keys["host"] = self.host
+        return keys
+
+    def inventory(self) -> dict:
+        """
+        :return: Keyword arguments for InventoryReport.add_server
+        """
+        launch_template_synchronized = SECTION_LAUNCH_TEMPLATE not in self.failed_sections
+        return dict(
+            source_server_id=self.source_server_id,
+            hostname=self.host,
+            is_network_configuration_excluded=self.exclude_network_config,
+            copy_private_ip=self.copy_private_ip if SECTION_LAUNCH_CONFIGURATION not in self.failed_sections else None,
+            source_server_ip=self.source_server_ip if launch_template_synchronized else None,
+            launch_template_ip=self.launch_template_ip if launch_template_synchronized else None,
+            launch_template_subnet=self.subnet_id if launch_template_synchronized else None,
+            launch_template_security_group=self.security_group_ids if launch_template_synchronized else None
+        )
 
 
 class ConfigurationSynchronizer:
@@ -679,23 +3350,30 @@ class ConfigurationSynchronizer:
                  server_tag_mapping,
                  ec2_launch_template_configurations: FileConfiguration,
                  drs_launch_configurations: FileConfiguration,
-                 drs_replication_configurations: FileConfiguration
+                 drs_replication_configurations: FileConfiguration,
+                 server_states: Optional[ServerStates] = None,
+                 report: Optional[RunReport] = None
                  ):
         """
         Creates a synchronizer that can synchronize settings for all source servers in a single AWS account.
 
         Provide synchronization of launch configs, replication configs, launch templates, and tags.
+        Each source server is synchronized in four steps, which synchronize_account runs as pipeline stages:
+        fetch_server_state, build_desired_state, diff_server_state and apply_server_changes.
 
         :param ec2: boto3 client for ec2
         :param drs: boto3 client for drs
         :param features: Instance of FeaturesConfiguration
         :param unique_id: UUID of current synchronizer execution
         :param account_id: AWS account id
-        :param cidr_subnet_mapping: dict as returned by create_subnet_cidr_mapping
-        :param server_tag_mapping: dict as returned by create_host_to_tag_mapping
+        :param cidr_subnet_mapping: SubnetCidrIndex as returned by create_subnet_cidr_mapping
+        :param server_tag_mapping: dict as returned by parse_host_to_tag_mapping
         :param ec2_launch_template_configurations: Instance of FileConfiguration for ec2 template configurations
         :param drs_launch_configurations: Instance of FileConfiguration for drs launch settings
         :param drs_replication_configurations: Instance of FileConfiguration for DRS replication configurations
+        :param server_states: Instance of ServerStates to skip source servers unchanged since the previous run,
+            or None to synchronize every server
+        :param report: Instance of RunReport counting the work skipped before any API call
         """
         self.ec2 = ec2
         self.drs = drs
@@ -707,60 +3385,417 @@ class ConfigurationSynchronizer:
         self.ec2_launch_template_configurations = ec2_launch_template_configurations
         self.drs_launch_configurations = drs_launch_configurations
         self.replication_configurations = drs_replication_configurations
+        # default versions of every launch template in the account, keyed by launch template id
+        self.default_launch_template_versions = {}
+        self.server_states = server_states
+        self.report = report
+        self.triage_categories = get_triage_categories()
+
+    def build_section_configuration(self, section: str, tags: dict) -> typing.Mapping:
+        """
+        Resolve the settings source control holds for one configuration section of a source server. Fingerprints,
+        section selection, plans and applies all resolve settings here, so they agree on which overrides apply:
+        defaults_for_account files only apply to replication configuration.
 
-    def synchronize_launch_template(self, info: dict, launch_configuration: dict, exclude_network_config: bool):
+        :param section: One of SECTION_LAUNCH_TEMPLATE, SECTION_LAUNCH_CONFIGURATION, SECTION_REPLICATION_CONFIGURATION
+        :param tags: dict of tag keys and values of the source server
+        :return: Mapping returned by FileConfiguration.build
         """
-        :param info: dict for a DRS source server as returned by "DescribeSourceServers" api call.
-        :param launch_configuration: dict for a DRS source server as returned by "GetLaunchConfiguration"
-        :param exclude_network_config: Boolean indicating if ExcludeNetworkConfiguration=true for this server
-        :return: Tuple of (source_server_ip, subnet_id, security_group_ids, launch_template_ip)
+        if section == SECTION_LAUNCH_TEMPLATE:
+            return self.ec2_launch_template_configurations.build(tags)
+        if section == SECTION_LAUNCH_CONFIGURATION:
+            return self.drs_launch_configurations.build(tags)
+        return self.replication_configurations.build(tags, account_id=self.account_id)
+
+    def count_skipped(self, reason: str):
+        if self.report is not None:
+            self.report.increment_skipped(reason)
+
+    def prefetch_default_launch_template_versions(self):
         """
-        logger.info("synchronizing launch template for source server")
+        Load the default version of every launch template in the account with a few paginated calls,
+        so fetch_launch_template does not need one EC2 call per source server.
+        """
+        logger.info("retrieving default versions of all launch templates")
+        versions = {}
+        try:
+            paginator = self.ec2.get_paginator("describe_launch_template_versions")
+            for page in paginator.paginate(Versions=["$Default"], PaginationConfig={"PageSize": 200}):
+                for version in page["LaunchTemplateVersions"]:
+                    versions[version["LaunchTemplateId"]] = version
+        except ClientError as e:
+            log_error("could not prefetch default launch template versions, retrieving them per server: %s", e)
+            return
+        self.default_launch_template_versions = versions
+        logger.info("retrieved default versions of launch templates", extra=dict(template_count=len(versions)))
+
+    def synchronize_server(self, item: ServerSynchronization) -> Optional[ServerSynchronization]:
+        """
+        Run every synchronization step for one source server in the calling thread.
+
+        :param item: Instance of ServerSynchronization
+        :return: `item`, or None if the server was skipped
+        """
+        for step in (self.fetch_server_state, self.build_desired_state, self.diff_server_state,
+                     self.apply_server_changes):
+            if step(item) is None:
+                return None
+        return item
+
+    def resolve_subnets(self, items: typing.Iterable[ServerSynchronization]):
+        """
+        Match the first IP address of many source servers to target subnets with one batch lookup.
+
+        :param items: Instances of ServerSynchronization
+        """
+        first_ips = {}
+        for item in items:
+            source_server_ips = get_source_server_ips(item.server)
+            if len(source_server_ips) > 0:
+                first_ips[item] = source_server_ips[0]
+        matches = self.cidr_subnet_mapping.lookup_all(first_ips.values())
+        for item, source_server_ip in first_ips.items():
+            item.subnet_match = matches.get(source_server_ip)
+
+    def triage(self, items: typing.Iterable[ServerSynchronization]):
+        """
+        Find the category of many source servers from the DRS listing, before any API call is made for them, so
+        fetch_server_state skips the sections not synchronized for their category, see is_triaged_section.
 
-        logger.info("retrieving default launch template version",
-                    extra=dict(id=launch_configuration["ec2LaunchTemplateID"]))
-        response = self.ec2.describe_launch_template_versions(
-            LaunchTemplateId=launch_configuration["ec2LaunchTemplateID"],
-            Versions=["$Default"]
+        :param items: Instances of ServerSynchronization
+        """
+        for item in items:
+            item.triage = triage_source_server(item.server, self.triage_categories)
+
+    def server_fingerprint(self, item: ServerSynchronization, tags: Optional[dict] = None) -> str:
+        """
+        Hash everything the desired state of a source server is built from, other than its current settings: the DRS
+        last updated time, tags and staging area of the server, its matched target subnet, and the settings that
+        source control resolves for it.
+
+        :param item: Instance of ServerSynchronization with a hostname
+        :param tags: Tags of the server to hash instead of the tags returned by DRS, such as the tags after apply_tags
+        :return: Hex digest
+        """
+        source_server_ips = get_source_server_ips(item.server)
+        if item.subnet_match is None and len(source_server_ips) > 0:
+            item.subnet_match = get_vpc_info_from_ip_address(self.cidr_subnet_mapping, source_server_ips[0])
+        server_tags = item.server["tags"]
+        state = dict(
+            version=SERVER_FINGERPRINT_VERSION,
+            account_id=self.account_id,
+            last_updated=item.server.get("sourceProperties", {}).get("lastUpdatedDateTime"),
+            staging_area_status=item.server.get("stagingArea", {}).get("status"),
+            tags=server_tags if tags is None else tags,
+            source_server_ips=source_server_ips,
+            subnet_match=item.subnet_match,
+            exclude_network_config=item.exclude_network_config,
+            tag_mapping=self.server_tag_mapping.get(item.host),
+            launch_template=dict(self.build_section_configuration(SECTION_LAUNCH_TEMPLATE, server_tags)),
+            launch_configuration=dict(self.build_section_configuration(SECTION_LAUNCH_CONFIGURATION, server_tags)),
+            replication_configuration=dict(
+                self.build_section_configuration(SECTION_REPLICATION_CONFIGURATION, server_tags))
         )
+        if item.triage != TRIAGE_REPLICATING:
+            # a server is synchronized again when it leaves its category, such as a disconnected server reconnecting
+            state["triage"] = item.triage
+        return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def drift_priority(self, item: ServerSynchronization) -> typing.Tuple[int, float]:
+        """
+        Rank a source server by how likely it is to have drifted from source control, from the server returned by DRS
+        and the state recorded by the previous run alone: servers new since the previous run first, then servers
+        whose tags, overrides or other inputs of their fingerprint changed, then the others, least recently
+        synchronized first.
+
+        :param item: Instance of ServerSynchronization with its subnet resolved
+        :return: Sort key, starting with one of the DRIFT_PRIORITY values
+        """
+        entry = self.server_states.previous.get(item.source_server_id) if self.server_states is not None else None
+        if entry is None:
+            return DRIFT_PRIORITY_NEW, 0
+        server_host = item.server.get("sourceProperties", {}).get("identificationHints", {}).get("hostname")
+        if server_host is not None:
+            # same host and network exclusion as fetch_server_state, which reuses the fingerprint
+            item.host = server_host.lower().split('.')[0]
+            item.exclude_network_config = (self.features.is_network_configuration_excluded("*")
+                                           or self.features.is_network_configuration_excluded(item.host))
+            item.fingerprint = self.server_fingerprint(item)
+            if item.fingerprint != entry["fingerprint"]:
+                return DRIFT_PRIORITY_CHANGED, 0
+        return DRIFT_PRIORITY_UNCHANGED, entry.get("synchronized_time", 0)
+
+    def record_server_state(self, item: ServerSynchronization):
+        """
+        Record the fingerprint of a source server after its changes are applied, so the next run can skip it while
+        it stays unchanged. Nothing is recorded if any section failed.
+
+        :param item: Instance of ServerSynchronization
+        """
+        if self.server_states is None or item.fingerprint is None or item.failed_sections:
+            return
+        fingerprint = item.fingerprint
+        if SECTION_TAGS in item.plans:
+            # the next run reads the tags written by apply_tags
+            fingerprint = self.server_fingerprint(item, tags={**item.server["tags"], **item.plans[SECTION_TAGS].desired})
+        self.server_states.record(item.source_server_id, fingerprint, item.launch_configuration["ec2LaunchTemplateID"],
+                                  item.default_launch_template_version, item.inventory())
+
+    def run_section_step(self, item: ServerSynchronization, section: str, step: typing.Callable, *args):
+        """
+        Run one step for one configuration section, logging errors so the remaining sections still synchronize.
+
+        :param item: Instance of ServerSynchronization
+        :param section: One of SECTIONS
+        :param step: Function called with `item` and `args`
+        :return: Value returned by `step`, or None if the section has failed
+        """
+        if section in item.failed_sections:
+            return None
+        try:
+            return step(item, *args)
+        except ClientError as e:
+            log_error(f"service error while synchronizing {section}: %s", e)
+        except SynchronizerException as e:
+            log_error(f"error while synchronizing {section}: %s", e)
+        item.failed_sections.add(section)
+        item.outcomes[section] = OUTCOME_FAILED
+        return None
+
+    def fetch_server_state(self, item: ServerSynchronization) -> Optional[ServerSynchronization]:
+        """
+        Read the current launch configuration, launch template version and replication configuration of a server.
+
+        :param item: Instance of ServerSynchronization
+        :return: `item`, or None if the server should be skipped
+        """
+        server_host = item.server.get("sourceProperties", {}).get("identificationHints", {}).get("hostname")
+
+        if server_host is None:
+            logger.error("drs did not return hostname for server")
+            self.count_skipped(SKIPPED_NO_HOSTNAME)
+            return None
+
+        # take first segment from hostname returned from DRS
+        item.host = server_host.lower().split('.')[0]
+
+        log_context.append_keys(host=item.host)
+
+        if self.features.is_excluded(item.host):
+            logger.info(f"skipping server to due to {EXCLUSION_ALL}")
+            self.count_skipped(SKIPPED_EXCLUDED)
+            self.log_outcome(item, "excluded")
+            return None
+
+        if self.features.is_network_configuration_excluded("*") or self.features.is_network_configuration_excluded(item.host):
+            item.exclude_network_config = True
+            logger.info("will skip network configuration for this server")
+
+        if self.server_states is not None:
+            if item.fingerprint is None:
+                item.fingerprint = self.server_fingerprint(item)
+            if self.server_states.is_unchanged(item.source_server_id, item.fingerprint,
+                                               self.default_launch_template_versions):
+                logger.info("skipping server, unchanged since it was last synchronized")
+                self.log_outcome(item, "unchanged since last synchronization")
+                return None
+
+        item.sections = self.configured_sections(item)
+        for section in SECTIONS:
+            if section not in item.sections:
+                logger.info("nothing configured, skipping section", extra=dict(section=section))
+                item.outcomes[section] = OUTCOME_SKIPPED
+                self.count_skipped(SKIPPED_NOTHING_CONFIGURED.format(section))
+            elif self.is_triaged_section(item, section):
+                logger.info(f"skipping section for {item.triage} server", extra=dict(section=section))
+                item.sections.discard(section)
+                item.outcomes[section] = OUTCOME_SKIPPED
+                self.count_skipped(SKIPPED_TRIAGED.format(section, item.triage))
+
+        # the launch configuration names the launch template of the server, and is needed by every server: a server
+        # excluded from network configuration, which skips its launch template, has copyPrivateIp set to false
+        launch_configuration = self.drs.get_launch_configuration(sourceServerID=item.source_server_id)
+        del launch_configuration["ResponseMetadata"]
+        item.launch_configuration = launch_configuration
+        item.copy_private_ip = launch_configuration["copyPrivateIp"]
+
+        if SECTION_LAUNCH_TEMPLATE in item.sections:
+            self.run_section_step(item, SECTION_LAUNCH_TEMPLATE, self.fetch_launch_template)
+        else:
+            # report the launch template in the inventory report, and record its version for incremental
+            # synchronization, only if it was prefetched
+            item.launch_template_version = self.default_launch_template_versions.get(
+                launch_configuration["ec2LaunchTemplateID"])
+            source_server_ips = get_source_server_ips(item.server)
+            item.source_server_ip = source_server_ips[0] if source_server_ips else None
+            if item.launch_template_version is not None:
+                item.default_launch_template_version = item.launch_template_version["VersionNumber"]
+                (item.subnet_id, item.launch_template_ip,
+                 item.security_group_ids) = get_launch_template_network(item.launch_template_version)
+        if SECTION_REPLICATION_CONFIGURATION in item.sections:
+            self.run_section_step(item, SECTION_REPLICATION_CONFIGURATION, self.fetch_replication_configuration)
+        return item
+
+    def is_triaged_section(self, item: ServerSynchronization, section: str) -> bool:
+        """
+        :param item: Instance of ServerSynchronization, triaged by ConfigurationSynchronizer.triage
+        :param section: One of SECTIONS, configured for the source server
+        :return: True if the section is not synchronized for the category of the source server, because it is in
+            TRIAGE_SKIPPED_SECTIONS, or because only replication settings in TRIAGE_SKIPPED_REPLICATION_KEYS are
+            configured
+        """
+        if section in TRIAGE_SKIPPED_SECTIONS.get(item.triage, ()):
+            return True
+        if section == SECTION_REPLICATION_CONFIGURATION and item.triage in TRIAGE_SKIPPED_REPLICATION_KEYS:
+            replication_configuration = self.build_section_configuration(section, item.server["tags"])
+            return not any(key in replication_configuration for key in get_replication_configuration_keys(item.triage))
+        return False
+
+    def configured_sections(self, item: ServerSynchronization) -> typing.Set[str]:
+        """
+        Find the configuration sections with something to synchronize for a source server, from source control and
+        the server returned by DRS alone, so no API call is made for a section with nothing configured.
+
+        :param item: Instance of ServerSynchronization with a hostname
+        :return: Subset of SECTIONS
+        """
+        tags = item.server["tags"]
+        sections = set()
+        launch_template = self.build_section_configuration(SECTION_LAUNCH_TEMPLATE, tags)
+        if not item.exclude_network_config or any(key in launch_template for key in EC2_LAUNCH_TEMPLATE_KEYS):
+            sections.add(SECTION_LAUNCH_TEMPLATE)
+        launch_configuration = self.build_section_configuration(SECTION_LAUNCH_CONFIGURATION, tags)
+        # copyPrivateIp is set to false for servers excluded from network configuration
+        if item.exclude_network_config or any(key in launch_configuration for key in LAUNCH_CONFIGURATION_KEYS):
+            sections.add(SECTION_LAUNCH_CONFIGURATION)
+        if item.exclude_network_config or self.server_tag_mapping.get(item.host):
+            sections.add(SECTION_TAGS)
+        replication_configuration = self.build_section_configuration(SECTION_REPLICATION_CONFIGURATION, tags)
+        if any(key in replication_configuration for key in REPLICATION_CONFIGURATION_KEYS):
+            sections.add(SECTION_REPLICATION_CONFIGURATION)
+        return sections
+
+    def build_desired_state(self, item: ServerSynchronization) -> ServerSynchronization:
+        """
+        Build the desired settings of each configuration section from source control.
+
+        :param item: Instance of ServerSynchronization
+        :return: `item`
+        """
+        for section, step in ((SECTION_LAUNCH_TEMPLATE, self.plan_launch_template),
+                              (SECTION_LAUNCH_CONFIGURATION, self.plan_launch_configuration),
+                              (SECTION_TAGS, self.plan_tags),
+                              (SECTION_REPLICATION_CONFIGURATION, self.plan_replication_configuration)):
+            if section not in item.sections:
+                continue
+            plan = self.run_section_step(item, section, step)
+            if plan is not None:
+                item.plans[section] = plan
+            elif section not in item.failed_sections:
+                item.outcomes[section] = OUTCOME_SKIPPED
+        return item
+
+    def diff_server_state(self, item: ServerSynchronization) -> ServerSynchronization:
+        """
+        Compare current and desired settings, keeping only the plans of sections that changed.
+
+        :param item: Instance of ServerSynchronization
+        :return: `item`
+        """
+        for section in list(item.plans):
+            if not item.plans[section].compute_diff():
+                logger.info(SECTION_UNCHANGED_MESSAGES[section])
+                item.outcomes[section] = OUTCOME_UNCHANGED
+                del item.plans[section]
+        return item
+
+    def apply_server_changes(self, item: ServerSynchronization) -> ServerSynchronization:
+        """
+        Write changed settings to EC2 and DRS.
+
+        :param item: Instance of ServerSynchronization
+        :return: `item`
+        """
+        for section, step in ((SECTION_LAUNCH_TEMPLATE, self.apply_launch_template),
+                              (SECTION_LAUNCH_CONFIGURATION, self.apply_launch_configuration),
+                              (SECTION_TAGS, self.apply_tags),
+                              (SECTION_REPLICATION_CONFIGURATION, self.apply_replication_configuration)):
+            if section in item.plans:
+                self.run_section_step(item, section, step, item.plans[section])
+                if section not in item.failed_sections:
+                    item.outcomes[section] = OUTCOME_UPDATED
+        self.record_server_state(item)
+        self.log_outcome(item, "synchronized")
+        return item
+
+    @staticmethod
+    def log_outcome(item: ServerSynchronization, result: str):
+        """
+        Log the outcome of every section of a source server in one record, in compact mode.
+
+        :param item: Instance of ServerSynchronization
+        :param result: Outcome of the source server as a whole
+        """
+        if not server_log_sampler.compact:
+            return
+        extra = dict(result=result, sections=item.outcomes)
+        changed = {section: sorted(plan.diff.affected_root_keys) for section, plan in item.plans.items()
+                   if item.outcomes.get(section) == OUTCOME_UPDATED}
+        if changed:
+            extra["changed"] = changed
+        logger.info(SERVER_OUTCOME_MESSAGE, extra=extra)
+
+    def fetch_launch_template(self, item: ServerSynchronization):
+        """
+        Read the default version of the EC2 launch template used by DRS for the source server.
+
+        :param item: Instance of ServerSynchronization
+        """
+        logger.info("synchronizing launch template for source server")
+
+        launch_template_id = item.launch_configuration["ec2LaunchTemplateID"]
+        item.launch_template_version = self.default_launch_template_versions.get(launch_template_id)
+        if item.launch_template_version is None:
+            # launch template was created after the prefetch, or the prefetch failed
+            logger.info("retrieving default launch template version", extra=dict(id=launch_template_id))
+            response = self.ec2.describe_launch_template_versions(
+                LaunchTemplateId=launch_template_id,
+                Versions=["$Default"]
+            )
+            item.launch_template_version = response["LaunchTemplateVersions"][0]
+        item.default_launch_template_version = item.launch_template_version["VersionNumber"]
 
-        version_number = response["LaunchTemplateVersions"][0]["VersionNumber"]
         logger.info(
             "default launch template version",
             extra=dict(
-                id=launch_configuration["ec2LaunchTemplateID"],
-                version=version_number))
-        old_launch_template_data = response["LaunchTemplateVersions"][0]["LaunchTemplateData"]
-        old_network_interfaces = old_launch_template_data.get("NetworkInterfaces", [])
+                id=item.launch_configuration["ec2LaunchTemplateID"],
+                version=item.launch_template_version["VersionNumber"]))
 
-        subnet_id = None
-        launch_template_ip = None
-        security_group_ids = []
+    def plan_launch_template(self, item: ServerSynchronization) -> Optional[ChangePlan]:
+        """
+        :param item: Instance of ServerSynchronization with a fetched launch template version
+        :return: ChangePlan for the launch template data, or None if the server has no matching target subnet
+        """
+        old_launch_template_data = item.launch_template_version["LaunchTemplateData"]
 
         # retrieve subnet, ip, and security group from current launch template for server
-        if len(old_network_interfaces) > 0:
-            subnet_id = old_network_interfaces[0].get("SubnetId")
-            security_group_ids = old_network_interfaces[0].get("Groups", [])
-            if len(old_network_interfaces[0].get("PrivateIpAddresses", [])) > 0:
-                launch_template_ip = old_network_interfaces[0]["PrivateIpAddresses"][0]["PrivateIpAddress"]
+        subnet_id, launch_template_ip, security_group_ids = get_launch_template_network(item.launch_template_version)
 
-        source_server_ips = []
         # Find matching DRS account subnet for source servers IP address based on CIDR match.
-        for nic in info["sourceProperties"]["networkInterfaces"]:
-            for source_server_ip in nic["ips"]:
-                source_server_ips.append(source_server_ip)
+        source_server_ips = get_source_server_ips(item.server)
 
         if len(source_server_ips) == 0:
             raise SynchronizerException("no ip addresses found for source server")
 
         source_server_ip = source_server_ips[0]
+        matched = True
 
-        if not exclude_network_config:
+        if not item.exclude_network_config:
             logger.info("trying to match subnet", extra=dict(ip_address=source_server_ip))
+            if item.subnet_match is None:
+                item.subnet_match = get_vpc_info_from_ip_address(self.cidr_subnet_mapping, source_server_ip)
             (matched_subnet_cidr, matched_subnet_id,
-             matched_security_group_ids, matched_vpc_id) = get_vpc_info_from_ip_address(
-                self.cidr_subnet_mapping, source_server_ip
-            )
+             matched_security_group_ids, matched_vpc_id) = item.subnet_match
             if matched_subnet_id:
                 logger.info("subnet located", extra=dict(
                     subnet=matched_subnet_id,
@@ -773,7 +3808,14 @@ class ConfigurationSynchronizer:
                 launch_template_ip = source_server_ip
             else:
                 logger.warning("cannot find a target subnet that matches ip address")
-                return (source_server_ip, subnet_id, security_group_ids, launch_template_ip)
+                matched = False
+
+        item.source_server_ip = source_server_ip
+        item.subnet_id = subnet_id
+        item.security_group_ids = security_group_ids
+        item.launch_template_ip = launch_template_ip
+        if not matched:
+            return None
 
         new_network_interfaces = []
 
@@ -781,7 +3823,7 @@ class ConfigurationSynchronizer:
         for index, network_interface in enumerate(old_launch_template_data.get("NetworkInterfaces", [])):
             new_nic = copy.deepcopy(network_interface)
             if index == 0:
-                if not exclude_network_config:
+                if not item.exclude_network_config:
                     new_nic["SubnetId"] = subnet_id
                     new_nic["Groups"] = security_group_ids
             new_network_interfaces.append(new_nic)
@@ -790,7 +3832,7 @@ class ConfigurationSynchronizer:
         config_current = {}
         # Find matching override_for_tag__([a-zA-Z0-9-]+)__([a-zA-Z0-9-]+).yml files for source server
         # and load launch template overrides
-        config_in_source_control = self.ec2_launch_template_configurations.build(info["tags"])
+        config_in_source_control = self.build_section_configuration(SECTION_LAUNCH_TEMPLATE, item.server["tags"])
 
         for key in EC2_LAUNCH_TEMPLATE_KEYS:
             if key in config_in_source_control:
@@ -798,32 +3840,37 @@ class ConfigurationSynchronizer:
                 if key in old_launch_template_data:
                     config_current[key] = old_launch_template_data[key]
 
-        if len(new_network_interfaces) > 0 and not exclude_network_config:
+        if len(new_network_interfaces) > 0 and not item.exclude_network_config:
             config_desired["NetworkInterfaces"] = new_network_interfaces
             if "NetworkInterfaces" in old_launch_template_data:
                 config_current["NetworkInterfaces"] = old_launch_template_data["NetworkInterfaces"]
 
-        diff = DeepDiff(config_current, config_desired)
-        if len(diff.affected_root_keys) == 0:
-            logger.info("launch template has not changed")
-            return (source_server_ip, subnet_id, security_group_ids, launch_template_ip)
+        return ChangePlan(config_current, config_desired)
+
+    def apply_launch_template(self, item: ServerSynchronization, plan: ChangePlan):
+        """
+        Create a new launch template version with the desired settings and make it the default version.
 
+        :param item: Instance of ServerSynchronization
+        :param plan: ChangePlan returned by plan_launch_template
+        """
         logger.info("creating new launch template version", extra=dict(
-            diff=diff.pretty(),
-            current=config_current,
-            desired=config_desired,
+            diff=LazyLogValue(plan.diff.pretty),
+            current=plan.current,
+            desired=plan.desired,
             update_required="true"
         ))
         # Create new launch template with overrides applied, mapped subnet based on source server IP, modified volumes
         new_launch_template = self.ec2.create_launch_template_version(
-            LaunchTemplateId=launch_configuration["ec2LaunchTemplateID"],
-            SourceVersion=str(version_number),
-            ClientToken=self.unique_id + "/" + info["sourceServerID"],
-            VersionDescription="updated by DR configuration synchronizer",
-            LaunchTemplateData=config_desired
+            LaunchTemplateId=item.launch_configuration["ec2LaunchTemplateID"],
+            SourceVersion=str(item.launch_template_version["VersionNumber"]),
+            ClientToken=self.unique_id + "/" + item.source_server_id,
+            VersionDescription=LAUNCH_TEMPLATE_VERSION_DESCRIPTION,
+            LaunchTemplateData=plan.desired
         )
         new_template_id = new_launch_template["LaunchTemplateVersion"]["LaunchTemplateId"]
         new_template_version = str(new_launch_template["LaunchTemplateVersion"]["VersionNumber"])
+        item.default_launch_template_version = new_launch_template["LaunchTemplateVersion"]["VersionNumber"]
 
         logger.info("new launch template version created", extra=dict(
             id=new_template_id,
@@ -838,7 +3885,7 @@ class ConfigurationSynchronizer:
             version=new_template_version
         ))
         response = self.ec2.modify_launch_template(
-            ClientToken=self.unique_id + "/" + info["sourceServerID"] + "/default",
+            ClientToken=self.unique_id + "/" + item.source_server_id + "/default",
             LaunchTemplateId=new_launch_template["LaunchTemplateVersion"]["LaunchTemplateId"],
             DefaultVersion=new_template_version
         )
@@ -849,97 +3896,97 @@ class ConfigurationSynchronizer:
             update_success="true"
         ))
 
-        return (source_server_ip, subnet_id, security_group_ids, launch_template_ip)
-
-    def synchronize_launch_configuration(self, info: dict, launch_configuration: dict,
-                                         exclude_network_config: bool) -> bool:
+    def plan_launch_configuration(self, item: ServerSynchronization) -> ChangePlan:
         """
-        :param info: dict for a DRS source server as returned by "DescribeSourceServers" api call.
-        :param launch_configuration: dict for a DRS source server as returned by "GetLaunchConfiguration"
-        :param exclude_network_config: Boolean indicating if ExcludeNetworkConfiguration=true for this server
-        :return The value of copyPrivateIp as set in DRS service for this source server.
+        :param item: Instance of ServerSynchronization with a fetched launch configuration
+        :return: ChangePlan for the DRS launch configuration
         """
         logger.info("synchronizing launch configuration for source server")
 
         # Retrieve default and  override launch configuration files, matched for source server tags
         config_desired = {}
         config_current = {}
-        config_in_source_control = self.drs_launch_configurations.build(info["tags"])
+        config_in_source_control = self.build_section_configuration(SECTION_LAUNCH_CONFIGURATION, item.server["tags"])
 
-        if exclude_network_config:
+        if item.exclude_network_config:
             logger.info(f"setting copyPrivateIp=false due to {EXCLUSION_NETWORK_CONFIGURATION}")
-            config_in_source_control["copyPrivateIp"] = False
+            config_in_source_control = {**config_in_source_control, "copyPrivateIp": False}
 
         for key in LAUNCH_CONFIGURATION_KEYS:
             if key in config_in_source_control:
                 config_desired[key] = config_in_source_control[key]
-                config_current[key] = launch_configuration[key]
+                config_current[key] = item.launch_configuration[key]
 
-        diff = DeepDiff(config_current, config_desired)
+        return ChangePlan(config_current, config_desired)
 
-        if len(diff.affected_root_keys) == 0:
-            logger.info("launch configuration has not changed")
-            return launch_configuration['copyPrivateIp']
+    def apply_launch_configuration(self, item: ServerSynchronization, plan: ChangePlan):
+        """
+        Update the DRS launch configuration and record the resulting value of copyPrivateIp.
 
+        :param item: Instance of ServerSynchronization
+        :param plan: ChangePlan returned by plan_launch_configuration
+        """
         logger.info("updating launch configuration for source server", extra=dict(
-            diff=diff.pretty(),
-            current=config_current,
-            desired=config_desired,
+            diff=LazyLogValue(plan.diff.pretty),
+            current=plan.current,
+            desired=plan.desired,
             update_required="true"
         ))
         response = self.drs.update_launch_configuration(
-            sourceServerID=info["sourceServerID"],
-            **config_desired
+            sourceServerID=item.source_server_id,
+            **plan.desired
         )
         logger.info("launch configuration updated", dict(
             aws_request_id=response["ResponseMetadata"]["RequestId"],
             update_success="true"
         ))
 
-        return response['copyPrivateIp']
+        item.copy_private_ip = response['copyPrivateIp']
 
-    def synchronize_tags(self, server_host: str, server_arn: str, server_tags: dict, exclude_network_config: bool):
+    def plan_tags(self, item: ServerSynchronization) -> Optional[ChangePlan]:
         """
-        :param server_host: Hostname of source server as returned by DRS
-        :param server_arn: ARN of source server as returned by DRS
-        :param server_tags: Dict of tag keys/values returned by DRS DescribeSourceServers API
-        :param exclude_network_config: Boolean indicating if ExcludeNetworkConfiguration=true for this server
+        :param item: Instance of ServerSynchronization
+        :return: ChangePlan for the tags listed in the server tag mapping, or None if the server has no hostname
         """
         logger.info("synchronizing tags")
 
-        if server_host is None:
+        if item.host is None:
             logger.warning("drs does not return a hostname for server; cannot lookup tags in tag mapping")
-            return
+            return None
 
-        tags_desired = self.server_tag_mapping.get(server_host, {})
+        tags_desired = dict(self.server_tag_mapping.get(item.host, {}))
 
-        if exclude_network_config:
+        if item.exclude_network_config:
             tags_desired["exclude-auto-network-configuration-matching"] = "true"
 
         tags_current = {}
         for tag_key in tags_desired:
-            if tag_key in server_tags:
-                tags_current[tag_key] = server_tags[tag_key]
+            if tag_key in item.server["tags"]:
+                tags_current[tag_key] = item.server["tags"][tag_key]
 
-        diff = DeepDiff(tags_current, tags_desired)
-        if len(diff.affected_root_keys) == 0:
-            logger.info("tags in server tag mapping have not changed")
-            return
+        return ChangePlan(tags_current, tags_desired)
 
+    def apply_tags(self, item: ServerSynchronization, plan: ChangePlan):
+        """
+        Apply new and updated tags to the DRS source server.
+
+        :param item: Instance of ServerSynchronization
+        :param plan: ChangePlan returned by plan_tags
+        """
         tags_to_update = {}
-        for key in diff.affected_root_keys:
-            tags_to_update[key] = tags_desired[key]
+        for key in plan.diff.affected_root_keys:
+            tags_to_update[key] = plan.desired[key]
 
         # apply new and updated tags to DRS source server
         logger.info("updating tags", extra=dict(
-            current=tags_current,
-            desired=tags_desired,
-            diff=diff.pretty(),
+            current=plan.current,
+            desired=plan.desired,
+            diff=LazyLogValue(plan.diff.pretty),
             update_required="true"
         ))
 
         response = self.drs.tag_resource(
-            resourceArn=server_arn,
+            resourceArn=item.server["arn"],
             tags=tags_to_update
         )
 
@@ -948,46 +3995,50 @@ class ConfigurationSynchronizer:
             update_success="true"
         ))
 
-    def synchronize_replication_settings(self, info: dict):
+    def fetch_replication_configuration(self, item: ServerSynchronization):
         """
-        :param info: dict for a DRS source server as returned by "DescribeSourceServers" api call.
+        Read the DRS replication configuration of the source server.
+
+        :param item: Instance of ServerSynchronization
         """
         logger.info("synchronizing replication settings")
+        item.replication_configuration = self.drs.get_replication_configuration(sourceServerID=item.source_server_id)
 
-        # If the source server is replicating to another AWS account and has been extended to this account,
-        # skip updating its settings.  The settings are replicated in each source server account,
-        # see https://docs.aws.amazon.com/drs/latest/userguide/multi-account.html
-        if info.get("stagingArea", {}).get("status") == "EXTENDED":
-            logger.info("skip updating replication settings for extended source server")
-            return
-
+    def plan_replication_configuration(self, item: ServerSynchronization) -> ChangePlan:
+        """
+        :param item: Instance of ServerSynchronization
+        :return: ChangePlan for the DRS replication configuration
+        """
         # compare current configuration with desired state
-        config_in_drs = self.drs.get_replication_configuration(sourceServerID=info["sourceServerID"])
         config_desired = {}
         # Apply matching override_for_tag__([a-zA-Z0-9-]+)__([a-zA-Z0-9-]+).yml files for replication settings or defaults.yml
-        config_in_source_control = self.replication_configurations.build(info["tags"], account_id=self.account_id)
+        config_in_source_control = self.build_section_configuration(SECTION_REPLICATION_CONFIGURATION,
+                                                                    item.server["tags"])
         config_current = {}
-        for key in REPLICATION_CONFIGURATION_KEYS:
+        for key in get_replication_configuration_keys(item.triage):
             if key in config_in_source_control:
                 config_desired[key] = config_in_source_control[key]
-                config_current[key] = config_in_drs[key]
+                config_current[key] = item.replication_configuration[key]
 
-        diff = DeepDiff(config_current, config_desired)
+        return ChangePlan(config_current, config_desired)
 
-        if len(diff.affected_root_keys) == 0:
-            logger.info("replication configuration has not changed")
-            return
+    def apply_replication_configuration(self, item: ServerSynchronization, plan: ChangePlan):
+        """
+        Update the DRS replication configuration of the source server.
 
+        :param item: Instance of ServerSynchronization
+        :param plan: ChangePlan returned by plan_replication_configuration
+        """
         logger.info("updating replication settings in drs", extra=dict(
-            current=config_current,
-            desired=config_desired,
-            diff=diff.pretty(),
+            current=plan.current,
+            desired=plan.desired,
+            diff=LazyLogValue(plan.diff.pretty),
             update_required="true"
         ))
 
         response = self.drs.update_replication_configuration(
-            sourceServerID=info["sourceServerID"],
-            **config_desired
+            sourceServerID=item.source_server_id,
+            **plan.desired
         )
 
         logger.info("replication configuration updated", extra=dict(
@@ -999,7 +4050,32 @@ class ConfigurationSynchronizer:
 def lambda_handler(event, context):
     success = True
     try:
-        synchronize_all()
+        account_client_pool.retain(account_configuration_loader.accounts())
+        # invocations continuing a run that was about to time out, see RunCheckpoint
+        if isinstance(event, dict) and "checkpoint_run" in event:
+            continue_synchronization(event["checkpoint_run"], context, create_self_invoker(context))
+            return {}
+        # invocations started by the coordinator of a sharded run, see synchronize_sharded
+        if isinstance(event, dict) and ("shard_worker" in event or "shard_run" in event):
+            shard_queue = get_shard_queue()
+            if shard_queue is None:
+                raise SynchronizerException(f"{SHARD_QUEUE_URL_ENVIRONMENT_VARIABLE} is required for sharded runs")
+            if "shard_run" in event:
+                merge_sharded_run(event["shard_run"], shard_queue, context, create_self_invoker(context))
+            else:
+                process_shards(shard_queue, context)
+            return {}
+        source_servers = get_event_source_servers(event)
+        if source_servers is not None:
+            synchronize_source_servers(source_servers)
+            return {}
+        # {"full_sweep": true} in the event synchronizes every source server, see ServerStates
+        full_sweep = isinstance(event, dict) and event.get("full_sweep") is True
+        shard_queue = get_shard_queue()
+        if shard_queue is not None:
+            synchronize_sharded(shard_queue, context, full_sweep=full_sweep, invoke=create_self_invoker(context))
+        else:
+            synchronize_all(full_sweep=full_sweep, context=context, invoke=create_self_invoker(context))
         return {}
     except Exception as e:
         logger.error("synchronizer failed with exception", exc_info=e)
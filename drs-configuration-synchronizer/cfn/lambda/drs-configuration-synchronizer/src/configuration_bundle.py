@@ -0,0 +1,377 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Reads, validates and compiles the configuration tree of the DRS configuration synchronizer.
+
+deploy.py compiles every account directory under configuration/ into a single bundle file before the lambda is
+packaged, and the lambda reads one account's slice of the bundle at a time instead of parsing YAML and CSV files.
+This module is shared by both, so it only depends on PyYAML and the standard library.
+
+The bundle is a JSON lines file. The first line is a header holding the format version and, for each account, the
+byte offset and length of its slice in the rest of the file. Each following line is the slice of one account:
+
+    {
+        "tag_mapping": {<hostname>: {<tag key>: <tag value>}},
+        "exclusions": {<hostname>: [<exclusion>]},
+        "ec2-launch-templates": <directory>,
+        "drs-launch-configurations": <directory>,
+        "drs-replication-configurations": <directory>,
+        "regions": [<region>]
+    }
+
+where each <directory> is {"defaults": {...}, "overrides": {<tag key>: {<tag value>: {...}}}, "accounts": {<account id>: {...}}}
+and "regions" lists the DRS regions synchronized in the account, empty for the region of the lambda function.
+"""
+
+import csv
+import json
+import re
+import typing
+from pathlib import Path
+
+import yaml
+
+CONFIGURATION_PATH = Path(__file__).parent.joinpath("configuration")
+CONFIGURATION_BUNDLE_PATH = Path(__file__).parent.joinpath("configuration-bundle.jsonl")
+CONFIGURATION_BUNDLE_FORMAT = 1
+CONFIGURATION_PATH_TAG_MAPPING = "server-tag-mapping.csv"
+CONFIGURATION_PATH_EXCLUSIONS = "config-sync-exclusions.csv"
+CONFIGURATION_PATH_EC2_LAUNCH_TEMPLATES = "ec2-launch-templates"
+CONFIGURATION_PATH_DRS_LAUNCH_CONFIGURATIONS = "drs-launch-configurations"
+CONFIGURATION_PATH_DRS_REPLICATION_CONFIGURATIONS = "drs-replication-configurations"
+CONFIGURATION_PATH_DEFAULTS = "defaults.yml"
+# Optional list of the DRS regions synchronized in an account, under a "regions" key
+CONFIGURATION_PATH_REGIONS = "regions.yml"
+CONFIGURATION_REGION_PATTERN = re.compile(r"[a-z]{2}(-[a-z]+)+-\d")
+CONFIGURATION_ACCOUNT_PATTERN = re.compile(r"\d{12}")
+# Sample account directories shipped with the solution, such as "<rename_to_AWS_acct_#>", are never synchronized
+CONFIGURATION_SAMPLE_PATTERN = re.compile(r"<.*>")
+CONFIGURATION_ACCOUNT_DEFAULT_PATTERN = re.compile(r"defaults_for_account_(\d{12}).yml")
+# Match DRS source servers with <TAG_KEY> and <TAG_VALUE> to their settings in override_for_tag__<TAG_KEY>__<TAG_VALUE>.yml
+CONFIGURATION_OVERRIDE_PATTERN = re.compile(r"override_for_tag__([a-zA-Z0-9-]+)__([a-zA-Z0-9-]+).yml")
+
+# See DRS update_launch_configuration section of boto3 SDK
+# https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/drs.html#drs.Client.update_launch_configuration
+LAUNCH_CONFIGURATION_KEYS = (
+    'copyPrivateIp',
+    'copyTags',
+    'launchDisposition',
+    'licensing',
+    'targetInstanceTypeRightSizingMethod'
+)
+
+# See DRS update_replication_configuration section of boto3 SDK
+#  https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/drs.html#drs.Client.update_replication_configuration
+REPLICATION_CONFIGURATION_KEYS = (
+    'associateDefaultSecurityGroup',
+    'bandwidthThrottling',
+    'createPublicIP',
+    'dataPlaneRouting',
+    'defaultLargeStagingDiskType',
+    'ebsEncryption',
+    'ebsEncryptionKeyArn',
+    'replicationServerInstanceType',
+    'replicationServersSecurityGroupsIDs',
+    'stagingAreaSubnetId',
+    'stagingAreaTags',
+    'useDedicatedReplicationServer'
+)
+
+# See LaunchTemplateData in EC2 create_launch_template_version section of boto3 SDK
+# https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.create_launch_template_version
+EC2_LAUNCH_TEMPLATE_KEYS = (
+    'IamInstanceProfile',
+    'InstanceType',
+    'Monitoring',
+    'DisableApiTermination',
+    'InstanceInitiatedShutdownBehavior',
+    'TagSpecifications',
+    'CreditSpecification',
+    'CpuOptions',
+    'CapacityReservationSpecification',
+    'LicenseSpecifications',
+    'MetadataOptions',
+    'PrivateDnsNameOptions',
+    'MaintenanceOptions',
+    'DisableApiStop',
+    'SecurityGroupsIds',
+    'NetworkInterfaces'
+)
+
+# These are dynamically processed by this lambda function, so they are disallowed in configuration files.
+EC2_LAUNCH_TEMPLATE_KEYS_MANAGED = (
+    'NetworkInterfaces',
+    'BlockDeviceMappings'
+)
+
+EXCLUSION_ALL = 'ExcludeAll'
+EXCLUSION_NETWORK_CONFIGURATION = 'ExcludeNetworkConfiguration'
+
+EXCLUSIONS = (
+    EXCLUSION_ALL,
+    EXCLUSION_NETWORK_CONFIGURATION
+)
+
+# Configuration directories of each account and the settings the synchronizer applies from them
+CONFIGURATION_DIRECTORY_KEYS = {
+    CONFIGURATION_PATH_EC2_LAUNCH_TEMPLATES: EC2_LAUNCH_TEMPLATE_KEYS,
+    CONFIGURATION_PATH_DRS_LAUNCH_CONFIGURATIONS: LAUNCH_CONFIGURATION_KEYS,
+    CONFIGURATION_PATH_DRS_REPLICATION_CONFIGURATIONS: REPLICATION_CONFIGURATION_KEYS
+}
+
+
+class ConfigurationError(Exception):
+    pass
+
+
+def read_yaml_configuration_file(filename: typing.Union[str, Path]):
+    """
+    Parse a yaml file and return an object
+    :param filename: Path to yaml file
+    :return: object
+    """
+    with open(filename, 'rb') as file:
+        return yaml.safe_load(file)
+
+
+def parse_host_to_tag_mapping(config_file: typing.TextIO) -> dict:
+    """
+    :param config_file: CSV file that lists hostnames in "Name" column and desired tags in remaining columns.
+    :return: Dictionary of lower case hostnames mapped to a dictionary of tag key / values
+    """
+    config_csv = csv.DictReader(config_file)
+    mapping = {}
+    for row in config_csv:
+        server_name = row.pop("Name").lower()
+        mapping[server_name] = {k: v for k, v in row.items() if v != ""}
+    return mapping
+
+
+def parse_server_exclusion_list(config_file: typing.TextIO) -> dict:
+    """
+    :param config_file: CSV file with hostname in Name column, and feature toggles in remaining columns.
+    :return: Dictionary with lower case hostname and a tuple of exclusions set to "true"
+    """
+    config_csv = csv.DictReader(config_file)
+    mapping = {}
+    for row in config_csv:
+        hostname = row.get("Name")
+        if hostname is not None:
+            exclusions = tuple([k for k in row if row[k] == "true" and k in EXCLUSIONS])
+            mapping[hostname.lower()] = exclusions
+    return mapping
+
+
+def read_configuration_directory(directory: Path) -> dict:
+    """
+    Parse the defaults and override files of one configuration directory.
+
+    :param directory: Path to a directory such as <account>/ec2-launch-templates
+    :return: dict with "defaults", "overrides" indexed by tag key then tag value, and "accounts" indexed by account id
+    """
+    data = {
+        "defaults": read_yaml_configuration_file(directory.joinpath(CONFIGURATION_PATH_DEFAULTS)),
+        "overrides": {},
+        "accounts": {}
+    }
+    for filename in sorted(directory.iterdir()):
+        if (match := CONFIGURATION_OVERRIDE_PATTERN.fullmatch(filename.name)) is not None:
+            data["overrides"].setdefault(match.group(1), {})[match.group(2)] = read_yaml_configuration_file(filename)
+        elif (match := CONFIGURATION_ACCOUNT_DEFAULT_PATTERN.fullmatch(filename.name)) is not None:
+            data["accounts"][match.group(1)] = read_yaml_configuration_file(filename)
+    return data
+
+
+def list_configured_accounts(configuration_path: Path = CONFIGURATION_PATH) -> typing.List[str]:
+    """
+    :param configuration_path: Root of the configuration tree
+    :return: Names of the account directories under configuration_path, without sample directories
+    """
+    return sorted(o.name for o in configuration_path.iterdir()
+                  if o.is_dir() and CONFIGURATION_SAMPLE_PATTERN.fullmatch(o.name) is None)
+
+
+def list_sample_directories(configuration_path: Path = CONFIGURATION_PATH) -> typing.List[str]:
+    """
+    :param configuration_path: Root of the configuration tree
+    :return: Names of the sample account directories under configuration_path
+    """
+    return sorted(o.name for o in configuration_path.iterdir()
+                  if o.is_dir() and CONFIGURATION_SAMPLE_PATTERN.fullmatch(o.name) is not None)
+
+
+def is_bundle_stale(configuration_path: Path = CONFIGURATION_PATH,
+                    bundle_path: Path = CONFIGURATION_BUNDLE_PATH) -> bool:
+    """
+    :param configuration_path: Root of the configuration tree
+    :param bundle_path: Path of a bundle written by compile_bundle
+    :return: True if a file or directory under configuration_path was modified after the bundle was written
+    """
+    if not configuration_path.is_dir():
+        return False
+    compiled = bundle_path.stat().st_mtime
+    return any(path.stat().st_mtime > compiled for path in configuration_path.rglob("*"))
+
+
+def read_account_configuration(account_path: Path) -> dict:
+    """
+    Parse and validate every file of one account directory.
+
+    :param account_path: Path to the configuration directory of an account
+    :return: Slice of the configuration bundle for this account, see module docstring
+    :raises ConfigurationError: if a file is missing or cannot be used by the synchronizer
+    """
+    account_slice = {}
+
+    for name, key, parse in ((CONFIGURATION_PATH_TAG_MAPPING, "tag_mapping", parse_host_to_tag_mapping),
+                             (CONFIGURATION_PATH_EXCLUSIONS, "exclusions", parse_server_exclusion_list)):
+        filename = account_path.joinpath(name)
+        if not filename.is_file():
+            raise ConfigurationError(f"{filename} is missing")
+        with open(filename, newline='') as file:
+            try:
+                account_slice[key] = parse(file)
+            except (AttributeError, KeyError, csv.Error) as e:
+                raise ConfigurationError(f"{filename} must be a CSV file with a Name column: {e}")
+
+    for directory_name in CONFIGURATION_DIRECTORY_KEYS:
+        directory = account_path.joinpath(directory_name)
+        if not directory.joinpath(CONFIGURATION_PATH_DEFAULTS).is_file():
+            raise ConfigurationError(f"{directory.joinpath(CONFIGURATION_PATH_DEFAULTS)} is missing")
+        try:
+            account_slice[directory_name] = read_configuration_directory(directory)
+        except yaml.YAMLError as e:
+            raise ConfigurationError(f"invalid YAML in {directory}: {e}")
+
+    account_slice["regions"] = []
+    filename = account_path.joinpath(CONFIGURATION_PATH_REGIONS)
+    if filename.is_file():
+        try:
+            regions = read_yaml_configuration_file(filename)
+        except yaml.YAMLError as e:
+            raise ConfigurationError(f"invalid YAML in {filename}: {e}")
+        if not isinstance(regions, dict) or not isinstance(regions.get("regions"), list):
+            raise ConfigurationError(f"{filename} must contain a list of regions under a regions key")
+        account_slice["regions"] = regions["regions"]
+
+    return account_slice
+
+
+def validate_account_configuration(account: str, account_slice: dict) -> typing.List[str]:
+    """
+    Check a parsed account directory for settings the synchronizer cannot apply.
+
+    :param account: Name of the account directory
+    :param account_slice: dict as returned by read_account_configuration
+    :return: List of warnings for settings the synchronizer ignores or overwrites
+    :raises ConfigurationError: if the account cannot be synchronized with this configuration
+    """
+    if CONFIGURATION_ACCOUNT_PATTERN.fullmatch(account) is None:
+        raise ConfigurationError(f"configuration directory '{account}' must be named after a 12 digit AWS account id")
+
+    regions = account_slice.get("regions", [])
+    for region in regions:
+        if not isinstance(region, str) or CONFIGURATION_REGION_PATTERN.fullmatch(region) is None:
+            raise ConfigurationError(f"{account}/{CONFIGURATION_PATH_REGIONS}: '{region}' is not an AWS region")
+    if len(set(regions)) != len(regions):
+        raise ConfigurationError(f"{account}/{CONFIGURATION_PATH_REGIONS} lists a region more than once")
+
+    warnings = []
+    for directory_name, allowed_keys in CONFIGURATION_DIRECTORY_KEYS.items():
+        data = account_slice[directory_name]
+        files = [(CONFIGURATION_PATH_DEFAULTS, data["defaults"])]
+        files += [(f"override_for_tag__{tag_key}__{tag_value}.yml", configuration)
+                  for tag_key, values in data["overrides"].items()
+                  for tag_value, configuration in values.items()]
+        files += [(f"defaults_for_account_{account_id}.yml", configuration)
+                  for account_id, configuration in data["accounts"].items()]
+
+        for filename, configuration in files:
+            location = f"{account}/{directory_name}/{filename}"
+            if not isinstance(configuration, dict):
+                raise ConfigurationError(f"{location} must contain a mapping of settings")
+            for key in configuration:
+                if not isinstance(key, str):
+                    raise ConfigurationError(f"{location} has a setting name that is not a string: {key}")
+                if directory_name == CONFIGURATION_PATH_EC2_LAUNCH_TEMPLATES and key in EC2_LAUNCH_TEMPLATE_KEYS_MANAGED:
+                    warnings.append(f"{location}: {key} is managed by the synchronizer and will be overwritten")
+                elif key not in allowed_keys:
+                    warnings.append(f"{location}: {key} is not a supported setting and will be ignored")
+    return warnings
+
+
+def compile_bundle(configuration_path: Path = CONFIGURATION_PATH,
+                   bundle_path: Path = CONFIGURATION_BUNDLE_PATH) -> typing.Tuple[typing.List[str], typing.List[str]]:
+    """
+    Validate every account directory under configuration_path and write them to one bundle file.
+
+    Nothing is written if any account fails validation. Sample account directories are skipped with a warning.
+
+    :param configuration_path: Root of the configuration tree
+    :param bundle_path: Path of the bundle file to write
+    :return: Tuple of the accounts compiled and the warnings found while validating them
+    :raises ConfigurationError: if any account cannot be synchronized with its configuration
+    """
+    accounts = list_configured_accounts(configuration_path)
+    warnings = [f"{configuration_path.joinpath(name)} is a sample and was not compiled, copy it to a directory named "
+                f"after a 12 digit AWS account id to synchronize that account"
+                for name in list_sample_directories(configuration_path)]
+    slices = []
+    for account in accounts:
+        account_slice = read_account_configuration(configuration_path.joinpath(account))
+        warnings += validate_account_configuration(account, account_slice)
+        try:
+            slices.append(json.dumps(account_slice, separators=(',', ':')).encode("utf-8") + b"\n")
+        except (TypeError, ValueError) as e:
+            raise ConfigurationError(f"configuration for account {account} cannot be compiled: {e}")
+
+    index = {}
+    offset = 0
+    for account, account_slice in zip(accounts, slices):
+        index[account] = [offset, len(account_slice)]
+        offset += len(account_slice)
+    header = json.dumps({"format": CONFIGURATION_BUNDLE_FORMAT, "accounts": index}, separators=(',', ':'))
+
+    with open(bundle_path, "wb") as file:
+        file.write(header.encode("utf-8") + b"\n")
+        for account_slice in slices:
+            file.write(account_slice)
+    return accounts, warnings
+
+
+class ConfigurationBundle:
+    """
+    Read-only view of a bundle written by compile_bundle. Only the header is read when the bundle is opened; the
+    slice of each account is read and parsed the first time it is requested.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(self.path, "rb") as file:
+            header = json.loads(file.readline())
+            self.data_offset = file.tell()
+        if header.get("format") != CONFIGURATION_BUNDLE_FORMAT:
+            raise ConfigurationError(f"{path} has unsupported format {header.get('format')}, redeploy to recompile it")
+        self.index = header["accounts"]
+
+    def accounts(self) -> typing.List[str]:
+        """
+        :return: Account directories compiled into the bundle
+        """
+        return list(self.index)
+
+    def load(self, account: str) -> dict:
+        """
+        :param account: Name of an account directory compiled into the bundle
+        :return: Slice of the bundle for this account, see module docstring
+        """
+        if account not in self.index:
+            raise ConfigurationError(f"account {account} is not in configuration bundle {self.path}")
+        offset, length = self.index[account]
+        with open(self.path, "rb") as file:
+            file.seek(self.data_offset + offset)
+            account_slice = json.loads(file.read(length))
+        account_slice["exclusions"] = {host: tuple(exclusions)
+                                       for host, exclusions in account_slice["exclusions"].items()}
+        return account_slice
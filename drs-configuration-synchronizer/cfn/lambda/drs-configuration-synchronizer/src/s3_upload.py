@@ -0,0 +1,97 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Streaming uploads to Amazon S3.
+
+Data is compressed as it is written and sent as a part of a multipart upload each time the buffer fills, so an upload
+never needs more memory than one part, nor any space in /tmp. Uploads smaller than one part are sent with a single
+PutObject call.
+"""
+
+import zlib
+
+# S3 rejects parts smaller than 5 MiB, except the last part of an upload
+MINIMUM_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+# zlib window bits selecting the gzip container format
+GZIP_WINDOW_BITS = 16 + zlib.MAX_WBITS
+
+
+class S3StreamingUpload:
+    def __init__(self, s3_client, bucket: str, key: str, compress: bool = False, part_size: int = DEFAULT_PART_SIZE,
+                 **object_arguments):
+        """
+        Binary stream uploaded to an S3 object. Call `close` to finish the upload, or `abort` to discard it.
+
+        :param s3_client: Boto3 client for s3
+        :param bucket: Name of the S3 bucket
+        :param key: Key of the S3 object
+        :param compress: True to gzip the data written to the stream
+        :param part_size: Bytes buffered before a part is uploaded, at least MINIMUM_PART_SIZE
+        :param object_arguments: Arguments for PutObject and CreateMultipartUpload, such as ContentType
+        """
+        if part_size < MINIMUM_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MINIMUM_PART_SIZE} bytes, got: {part_size}")
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.object_arguments = object_arguments
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, GZIP_WINDOW_BITS) if compress else None
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+        self.size = 0
+
+    def write(self, data: bytes):
+        """
+        Add data to the stream, uploading a part when the buffer is full.
+        """
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        self.buffer += data
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+
+    def _upload_part(self):
+        if self.upload_id is None:
+            self.upload_id = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, **self.object_arguments)["UploadId"]
+        part_number = len(self.parts) + 1
+        response = self.s3_client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                              PartNumber=part_number, Body=bytes(self.buffer))
+        self.parts.append(dict(ETag=response["ETag"], PartNumber=part_number))
+        self.size += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self) -> int:
+        """
+        Upload the rest of the stream and complete the upload.
+
+        :return: Size of the S3 object in bytes
+        """
+        if self.compressor is not None:
+            self.buffer += self.compressor.flush()
+        if self.upload_id is None:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer),
+                                      **self.object_arguments)
+            self.size += len(self.buffer)
+            self.buffer.clear()
+            return self.size
+        if self.buffer:
+            self._upload_part()
+        self.s3_client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                 MultipartUpload=dict(Parts=self.parts))
+        # the upload is complete, so there is nothing left for abort to delete
+        self.upload_id = None
+        return self.size
+
+    def abort(self):
+        """
+        Discard the stream, deleting any part already uploaded.
+        """
+        if self.upload_id is not None:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+        self.buffer.clear()
@@ -0,0 +1,120 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Queues of shard descriptors for sharded synchronization runs.
+
+A shard names some source servers of one AWS account. Workers claim a shard with a lease: the shard is hidden from
+other workers until the lease expires, and deleted when the worker completes it. A worker that fails or runs out of
+time never completes its shard, so another worker claims it once the lease expires.
+
+SqsShardQueue is used by the lambda function. InMemoryShardQueue has the same behaviour within one process and lets
+sharded runs be tested locally, for example with simulate_synchronizer.py --sharded.
+"""
+
+import json
+import threading
+import time
+import typing
+import uuid
+from collections import deque
+from typing import Optional
+
+# Maximum number of messages in one SQS SendMessageBatch call
+SQS_BATCH_SIZE = 10
+# Seconds SQS waits for a message before returning an empty response
+SQS_WAIT_SECONDS = 2
+
+
+class ShardLease(typing.NamedTuple):
+    """
+    A shard claimed by a worker, returned by the claim method of a shard queue.
+    """
+    shard: dict
+    receipt: str
+
+
+class InMemoryShardQueue:
+    def __init__(self):
+        """
+        Shard queue held in memory, for sharded runs in a single process.
+        """
+        self.shards = deque()
+        self.leases = {}
+        self.lock = threading.Lock()
+
+    def put_all(self, shards: typing.Iterable[dict]):
+        """
+        :param shards: Shard descriptors to add to the queue
+        """
+        with self.lock:
+            self.shards.extend(shards)
+
+    def claim(self, lease_seconds: int) -> Optional[ShardLease]:
+        """
+        :param lease_seconds: Seconds the shard is hidden from other workers
+        :return: Instance of ShardLease, or None if no shard is available
+        """
+        now = time.monotonic()
+        with self.lock:
+            for receipt, (shard, expires) in list(self.leases.items()):
+                if expires <= now:
+                    del self.leases[receipt]
+                    self.shards.append(shard)
+            if not self.shards:
+                return None
+            shard = self.shards.popleft()
+            receipt = str(uuid.uuid4())
+            self.leases[receipt] = (shard, now + lease_seconds)
+            return ShardLease(shard=shard, receipt=receipt)
+
+    def complete(self, lease: ShardLease):
+        """
+        Remove a claimed shard from the queue.
+        """
+        with self.lock:
+            self.leases.pop(lease.receipt, None)
+
+
+class SqsShardQueue:
+    def __init__(self, sqs, queue_url: str):
+        """
+        Shard queue backed by an Amazon SQS queue, where the lease of a shard is the visibility timeout of its message.
+
+        :param sqs: Boto3 client for sqs
+        :param queue_url: URL of the SQS queue
+        """
+        self.sqs = sqs
+        self.queue_url = queue_url
+
+    def put_all(self, shards: typing.Iterable[dict]):
+        """
+        :param shards: Shard descriptors to add to the queue
+        """
+        shards = list(shards)
+        for start in range(0, len(shards), SQS_BATCH_SIZE):
+            entries = [dict(Id=str(index), MessageBody=json.dumps(shard))
+                       for index, shard in enumerate(shards[start:start + SQS_BATCH_SIZE])]
+            response = self.sqs.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            failed = response.get("Failed", [])
+            if failed:
+                raise RuntimeError(f"could not send {len(failed)} shard(s) to {self.queue_url}: {failed[0]}")
+
+    def claim(self, lease_seconds: int) -> Optional[ShardLease]:
+        """
+        :param lease_seconds: Seconds the shard is hidden from other workers
+        :return: Instance of ShardLease, or None if no shard is available
+        """
+        # long polling queries every SQS server, so an empty response means the queue has no visible message
+        response = self.sqs.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=1,
+                                            VisibilityTimeout=lease_seconds, WaitTimeSeconds=SQS_WAIT_SECONDS)
+        messages = response.get("Messages", [])
+        if not messages:
+            return None
+        return ShardLease(shard=json.loads(messages[0]["Body"]), receipt=messages[0]["ReceiptHandle"])
+
+    def complete(self, lease: ShardLease):
+        """
+        Remove a claimed shard from the queue.
+        """
+        self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=lease.receipt)
@@ -4,7 +4,16 @@ will run on AWS. The following environment variables must be defined before runn
 
 DR_CONFIGURATION_SYNCHRONIZER_ROLE_NAME="DR-Automation-Roles-DRConfigurationSynchronizer"
 
+Run with --sharded to simulate a sharded run, with every shard processed in this process
+from an in-memory shard queue.
+
 """
+import sys
+
 import configsynchronizer
+from shard_queue import InMemoryShardQueue
 
-configsynchronizer.synchronize_all()
+if "--sharded" in sys.argv[1:]:
+    configsynchronizer.synchronize_sharded(InMemoryShardQueue())
+else:
+    configsynchronizer.synchronize_all()
@@ -0,0 +1,111 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Comparison of the current and desired settings of a source server.
+
+The synchronizer only needs to know which root keys of a configuration section changed (launch template data,
+launch configuration, replication configuration or tags), and a readable description when one did. StructuralDiff
+answers the first question with a short-circuiting comparison that skips shared and equal subtrees, and renders the
+description only when `pretty` is called.
+
+Comparisons follow the DeepDiff defaults the synchronizer used before: the order of mapping keys is ignored, the
+order of list items is not, and values of different types are different even if they compare equal in Python
+(1 and True, 1 and 1.0).
+"""
+
+import typing
+from collections.abc import Mapping
+
+
+def _is_mapping(value) -> bool:
+    return isinstance(value, (dict, Mapping))
+
+
+def _is_sequence(value) -> bool:
+    return isinstance(value, (list, tuple))
+
+
+def values_equal(current, desired) -> bool:
+    """
+    :param current: Any value built from YAML, CSV or an AWS API response
+    :param desired: Any value built from YAML, CSV or an AWS API response
+    :return: True if both values have the same structure, types and contents
+    """
+    if current is desired:
+        return True
+    if _is_mapping(current):
+        if not _is_mapping(desired) or len(current) != len(desired):
+            return False
+        for key, value in current.items():
+            if key not in desired or not values_equal(value, desired[key]):
+                return False
+        return True
+    if _is_sequence(current):
+        if not _is_sequence(desired) or len(current) != len(desired):
+            return False
+        for current_item, desired_item in zip(current, desired):
+            if not values_equal(current_item, desired_item):
+                return False
+        return True
+    return type(current) is type(desired) and current == desired
+
+
+class StructuralDiff:
+    def __init__(self, current: typing.Mapping, desired: typing.Mapping):
+        """
+        Compare two mappings of settings.
+
+        :param current: Settings currently applied in AWS
+        :param desired: Settings built from source control
+        """
+        self.current = current
+        self.desired = desired
+        self.affected_root_keys = []
+        for key, value in desired.items():
+            if key not in current or not values_equal(current[key], value):
+                self.affected_root_keys.append(key)
+        for key in current:
+            if key not in desired:
+                self.affected_root_keys.append(key)
+
+    def pretty(self) -> str:
+        """
+        :return: One line for each added, removed or changed value, with its path from the root
+        """
+        lines = []
+        for key in self.affected_root_keys:
+            path = f"root[{key!r}]"
+            if key not in self.current:
+                lines.append(f"Item {path} added to dictionary.")
+            elif key not in self.desired:
+                lines.append(f"Item {path} removed from dictionary.")
+            else:
+                self._describe(path, self.current[key], self.desired[key], lines)
+        return "\n".join(lines)
+
+    def _describe(self, path: str, current, desired, lines: typing.List[str]):
+        if _is_mapping(current) and _is_mapping(desired):
+            for key, value in desired.items():
+                child = f"{path}[{key!r}]"
+                if key not in current:
+                    lines.append(f"Item {child} added to dictionary.")
+                elif not values_equal(current[key], value):
+                    self._describe(child, current[key], value, lines)
+            for key in current:
+                if key not in desired:
+                    lines.append(f"Item {path}[{key!r}] removed from dictionary.")
+        elif _is_sequence(current) and _is_sequence(desired):
+            for index in range(max(len(current), len(desired))):
+                child = f"{path}[{index}]"
+                if index >= len(current):
+                    lines.append(f"Item {child} added to iterable.")
+                elif index >= len(desired):
+                    lines.append(f"Item {child} removed from iterable.")
+                elif not values_equal(current[index], desired[index]):
+                    self._describe(child, current[index], desired[index], lines)
+        elif type(current) is not type(desired):
+            lines.append(f"Type of {path} changed from {type(current).__name__} to {type(desired).__name__} "
+                         f"and value changed from {current!r} to {desired!r}.")
+        else:
+            lines.append(f"Value of {path} changed from {current!r} to {desired!r}.")
@@ -0,0 +1,8 @@
+import os
+
+# configsynchronizer reads the region of the lambda function and creates its boto3 clients on import
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", os.environ["AWS_REGION"])
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("DR_AUTOMATION_BUCKET", "drs-automation-test")
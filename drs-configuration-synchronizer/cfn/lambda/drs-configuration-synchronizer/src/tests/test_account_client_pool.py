@@ -0,0 +1,81 @@
+import datetime
+from unittest import mock
+
+import configsynchronizer
+from configsynchronizer import AccountClientPool, assume_role_session
+
+ROLE_NAME = "drs-configuration-synchronizer-account-role"
+
+
+def create_sts(expires_in: datetime.timedelta):
+    sts = mock.Mock()
+    issued = iter(range(1, 100))
+
+    def assume_role(RoleArn, RoleSessionName):
+        n = next(issued)
+        return {"Credentials": dict(AccessKeyId=f"key-{n}", SecretAccessKey="secret", SessionToken=f"token-{n}",
+                                    Expiration=datetime.datetime.now(tz=datetime.timezone.utc) + expires_in)}
+
+    sts.assume_role.side_effect = assume_role
+    return sts
+
+
+def test_session_assumes_role_up_front(monkeypatch):
+    monkeypatch.setenv("DR_CONFIGURATION_SYNCHRONIZER_ROLE_NAME", ROLE_NAME)
+    sts = create_sts(datetime.timedelta(hours=1))
+    monkeypatch.setattr(configsynchronizer, "sts", sts)
+
+    session = assume_role_session("111111111111")
+
+    sts.assume_role.assert_called_once_with(RoleArn=f"arn:aws:iam::111111111111:role/{ROLE_NAME}",
+                                            RoleSessionName="DRConfigurationSynchronizer")
+    credentials = session.get_credentials().get_frozen_credentials()
+    assert (credentials.access_key, credentials.token) == ("key-1", "token-1")
+    assert session.get_credentials().method == configsynchronizer.AssumeRoleCredentialProvider.METHOD
+    assert sts.assume_role.call_count == 1
+
+
+def test_session_assumes_role_again_before_expiry(monkeypatch):
+    monkeypatch.setenv("DR_CONFIGURATION_SYNCHRONIZER_ROLE_NAME", ROLE_NAME)
+    # credentials expiring within the refresh window of botocore are refreshed when they are next used
+    sts = create_sts(datetime.timedelta(minutes=5))
+    monkeypatch.setattr(configsynchronizer, "sts", sts)
+
+    session = assume_role_session("111111111111")
+    credentials = session.get_credentials().get_frozen_credentials()
+
+    assert credentials.access_key == "key-2"
+    assert sts.assume_role.call_count == 2
+
+
+def test_pool_is_kept_across_invocations_for_configured_accounts(monkeypatch):
+    session = mock.Mock(region_name="us-east-1")
+    create_session = mock.Mock(return_value=session)
+    pool = AccountClientPool(create_session)
+    monkeypatch.setattr(configsynchronizer, "account_client_pool", pool)
+    configured_accounts = ["111111111111"]
+    monkeypatch.setattr(configsynchronizer, "account_configuration_loader",
+                        mock.Mock(accounts=lambda: list(configured_accounts)))
+
+    def synchronize_all(**kwargs):
+        assert configsynchronizer.create_account_clients("111111111111") == \
+            configsynchronizer.create_account_clients("111111111111")
+
+    monkeypatch.setattr(configsynchronizer, "synchronize_all", synchronize_all)
+    monkeypatch.setattr(configsynchronizer, "get_shard_queue", lambda: None)
+    monkeypatch.setattr(configsynchronizer, "create_self_invoker", lambda context: None)
+
+    # a warm invocation reuses the session and clients of the previous one
+    configsynchronizer.lambda_handler({}, None)
+    configsynchronizer.lambda_handler({}, None)
+
+    create_session.assert_called_once_with("111111111111")
+    assert session.client.call_count == 2
+    assert set(pool.sessions) == {"111111111111"} and len(pool.clients) == 2
+
+    # accounts removed from the configuration are evicted when the next invocation starts
+    configured_accounts.clear()
+    monkeypatch.setattr(configsynchronizer, "synchronize_all", lambda **kwargs: None)
+    configsynchronizer.lambda_handler({}, None)
+
+    assert pool.sessions == {} and pool.clients == {}
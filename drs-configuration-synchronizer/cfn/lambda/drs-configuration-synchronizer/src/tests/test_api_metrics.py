@@ -0,0 +1,43 @@
+import json
+
+from configsynchronizer import API_METRICS_ENVIRONMENT_VARIABLE, ApiMetrics
+
+
+def published_records(capsys) -> list:
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"_aws"' in line]
+
+
+def test_publish_writes_one_record_per_operation(capsys, monkeypatch):
+    monkeypatch.delenv(API_METRICS_ENVIRONMENT_VARIABLE, raising=False)
+    api_metrics = ApiMetrics()
+    api_metrics.get("111111111111", "us-east-1", "drs", "GetLaunchConfiguration").record(
+        attempt=1, latency_ms=20.0, throttled=False, failed=False)
+    throttled = api_metrics.get("222222222222", "us-west-2", "ec2", "CreateLaunchTemplateVersion")
+    throttled.record(attempt=1, latency_ms=40.0, throttled=True, failed=True)
+    throttled.record(attempt=2, latency_ms=60.0, throttled=False, failed=False)
+
+    api_metrics.publish()
+
+    records = {record["Account"]: record for record in published_records(capsys)}
+    assert set(records) == {"111111111111", "222222222222"}
+    first, second = records["111111111111"], records["222222222222"]
+    # powertools writes the values of each metric as a list
+    assert (first["Region"], first["Operation"], first["ApiCalls"]) == ("us-east-1", "drs.GetLaunchConfiguration", [1])
+    assert (second["Region"], second["Operation"]) == ("us-west-2", "ec2.CreateLaunchTemplateVersion")
+    assert (second["ApiCalls"], second["ApiRetries"], second["ApiThrottles"]) == ([1], [1], [1])
+    assert sum(second["ApiLatencyHistogram"].values()) == 2
+    # every record holds the dimensions of its own operation only
+    for record in records.values():
+        directive = record["_aws"]["CloudWatchMetrics"][0]
+        assert ["Account", "Region", "Operation"] == [name for name in directive["Dimensions"][0] if name != "service"]
+
+
+def test_publish_can_be_disabled(capsys, monkeypatch):
+    monkeypatch.setenv(API_METRICS_ENVIRONMENT_VARIABLE, "false")
+    api_metrics = ApiMetrics()
+    api_metrics.get("111111111111", "us-east-1", "drs", "GetLaunchConfiguration").record(
+        attempt=1, latency_ms=20.0, throttled=False, failed=False)
+
+    api_metrics.publish()
+
+    assert published_records(capsys) == []
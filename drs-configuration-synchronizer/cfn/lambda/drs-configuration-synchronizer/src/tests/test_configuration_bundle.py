@@ -0,0 +1,50 @@
+import os
+import shutil
+
+import pytest
+
+import configsynchronizer
+from configuration_bundle import CONFIGURATION_PATH, ConfigurationError, compile_bundle, is_bundle_stale
+
+SAMPLE = "<rename_to_AWS_acct_#>"
+ACCOUNT = "111111111111"
+
+
+@pytest.fixture
+def configuration_path(tmp_path):
+    path = tmp_path.joinpath("configuration")
+    shutil.copytree(CONFIGURATION_PATH.joinpath(SAMPLE), path.joinpath(SAMPLE))
+    shutil.copytree(CONFIGURATION_PATH.joinpath(SAMPLE), path.joinpath(ACCOUNT))
+    return path
+
+
+def test_compile_skips_sample_directory(configuration_path, tmp_path):
+    accounts, warnings = compile_bundle(configuration_path, tmp_path.joinpath("bundle.jsonl"))
+
+    assert accounts == [ACCOUNT]
+    assert any(SAMPLE in warning for warning in warnings)
+
+
+def test_compile_rejects_misnamed_directory(configuration_path, tmp_path):
+    configuration_path.joinpath(ACCOUNT).rename(configuration_path.joinpath("production"))
+
+    with pytest.raises(ConfigurationError):
+        compile_bundle(configuration_path, tmp_path.joinpath("bundle.jsonl"))
+
+
+def test_loader_reads_files_when_bundle_is_stale(configuration_path, tmp_path):
+    bundle_path = tmp_path.joinpath("bundle.jsonl")
+    compile_bundle(configuration_path, bundle_path)
+    assert not is_bundle_stale(configuration_path, bundle_path)
+    assert configsynchronizer.AccountConfigurationLoader(configuration_path, bundle_path).get_bundle() is not None
+
+    regions = configuration_path.joinpath(ACCOUNT, "regions.yml")
+    regions.write_text("regions:\n  - us-west-2\n")
+    compiled = bundle_path.stat().st_mtime
+    os.utime(regions, (compiled + 10, compiled + 10))
+    assert is_bundle_stale(configuration_path, bundle_path)
+
+    loader = configsynchronizer.AccountConfigurationLoader(configuration_path, bundle_path)
+    assert loader.get_bundle() is None
+    assert loader.accounts() == [ACCOUNT]
+    assert loader.load(ACCOUNT).regions == ("us-west-2",)
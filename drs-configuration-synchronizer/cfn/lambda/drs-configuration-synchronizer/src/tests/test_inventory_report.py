@@ -0,0 +1,65 @@
+import random
+from unittest import mock
+
+import pytest
+
+import benchmark_synchronizer
+import configsynchronizer
+from configsynchronizer import REPORT_S3_KEY, InventoryReport, create_inventory_report
+from s3_upload import MINIMUM_PART_SIZE, S3StreamingUpload
+
+
+def create_s3_client():
+    s3_client = mock.Mock()
+    s3_client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    s3_client.upload_part.side_effect = lambda PartNumber, **kwargs: {"ETag": str(PartNumber)}
+    return s3_client
+
+
+def test_report_is_uncompressed_by_default(monkeypatch):
+    monkeypatch.delenv(configsynchronizer.INVENTORY_COMPRESSION_ENVIRONMENT_VARIABLE, raising=False)
+    s3_client = create_s3_client()
+    monkeypatch.setattr(configsynchronizer.s3, "meta", mock.Mock(client=s3_client))
+
+    report = create_inventory_report()
+    report.add_server("111111111111", "s-1", "host-1", False, True, "10.0.0.1", "10.0.0.1", "subnet-1", "sg-1")
+    report.write_to_s3()
+
+    assert report.key == REPORT_S3_KEY
+    arguments = s3_client.put_object.call_args.kwargs
+    assert arguments["Key"] == REPORT_S3_KEY
+    assert arguments["ContentType"] == "text/csv"
+    assert arguments["Body"].decode("utf-8").splitlines()[0] == ",".join(InventoryReport.COLUMNS)
+
+
+def test_gzip_report_uses_its_own_key(monkeypatch):
+    monkeypatch.setenv(configsynchronizer.INVENTORY_COMPRESSION_ENVIRONMENT_VARIABLE, "gzip")
+    monkeypatch.setattr(configsynchronizer.s3, "meta", mock.Mock(client=create_s3_client()))
+
+    assert create_inventory_report().key == REPORT_S3_KEY + ".gz"
+
+
+def test_abort_after_close_deletes_nothing():
+    s3_client = create_s3_client()
+    upload = S3StreamingUpload(s3_client, "bucket", "key", part_size=MINIMUM_PART_SIZE)
+    upload.write(b"x" * MINIMUM_PART_SIZE)
+    upload.close()
+    upload.abort()
+
+    s3_client.complete_multipart_upload.assert_called_once()
+    s3_client.abort_multipart_upload.assert_not_called()
+
+
+def test_failed_upload_is_aborted(tmp_path, monkeypatch):
+    backend = benchmark_synchronizer.StubBackend(latency=0, api_limit=0, rng=random.Random(1))
+    benchmark_synchronizer.install_backend(backend)
+    benchmark_synchronizer.reset_invocation(backend, tmp_path, tmp_path.joinpath("configuration-bundle.jsonl"))
+    monkeypatch.setattr(configsynchronizer.RunReport, "send", lambda self: None)
+    monkeypatch.setattr(InventoryReport, "write_to_s3", mock.Mock(side_effect=RuntimeError("upload failed")))
+    abort = mock.Mock()
+    monkeypatch.setattr(InventoryReport, "abort", abort)
+
+    with pytest.raises(RuntimeError):
+        configsynchronizer.synchronize_all()
+
+    abort.assert_called_once()
@@ -0,0 +1,132 @@
+import math
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from configsynchronizer import SynchronizerException, create_subnet_cidr_mapping
+
+TAGGED_SUBNET_FILTERS = [{"Name": "tag:drstarget", "Values": ["true"]}]
+VPC_COUNT = 450
+SUBNETS_PER_VPC = 2
+
+
+def vpc_id(index: int) -> str:
+    return f"vpc-{index:08x}"
+
+
+def security_group_id(index: int) -> str:
+    return f"sg-{index:08x}"
+
+
+def subnet(vpc_index: int, subnet_index: int) -> dict:
+    return {
+        "SubnetId": f"subnet-{vpc_index:06x}{subnet_index:02x}",
+        "VpcId": vpc_id(vpc_index),
+        "CidrBlock": f"10.{vpc_index // 256}.{vpc_index % 256}.{subnet_index * 128}/25",
+    }
+
+
+def vpc(index: int) -> dict:
+    # the VPC with index 0 has no Name tag, so no security group is looked up for it
+    tags = [] if index == 0 else [{"Key": "Name", "Value": f"dr-{index}"}]
+    return {"VpcId": vpc_id(index), "Tags": tags}
+
+
+def security_group(index: int) -> dict:
+    return {
+        "GroupId": security_group_id(index),
+        "VpcId": vpc_id(index),
+        "Tags": [{"Key": "Name", "Value": f"dr-{index}-sg"}],
+    }
+
+
+@pytest.fixture
+def ec2():
+    client = boto3.client("ec2", region_name="us-east-1")
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+def stub_discovery(stubber: Stubber, vpc_count: int):
+    """
+    Queue the responses of one discovery pass over `vpc_count` VPCs, in the order of the calls it makes. The stubber
+    fails the test on any call beyond these, or any call made with other parameters.
+    """
+    subnets = [subnet(v, s) for v in range(vpc_count) for s in range(SUBNETS_PER_VPC)]
+    half = len(subnets) // 2
+    stubber.add_response("describe_subnets", {"Subnets": subnets[:half], "NextToken": "page-2"},
+                         {"Filters": TAGGED_SUBNET_FILTERS})
+    stubber.add_response("describe_subnets", {"Subnets": subnets[half:]},
+                         {"Filters": TAGGED_SUBNET_FILTERS, "NextToken": "page-2"})
+
+    vpc_ids = [vpc_id(v) for v in range(vpc_count)]
+    stubber.add_response("describe_vpcs", {"Vpcs": [vpc(v) for v in range(vpc_count)]}, {"VpcIds": sorted(vpc_ids)})
+
+    named = sorted(vpc_id(v) for v in range(1, vpc_count))
+    # the last VPC has no "<VPC>-sg" security group
+    missing = vpc_id(vpc_count - 1)
+    for i in range(0, len(named), 200):
+        chunk = named[i:i + 200]
+        indexes = [int(v[len("vpc-"):], 16) for v in chunk]
+        stubber.add_response(
+            "describe_security_groups",
+            {"SecurityGroups": [security_group(index) for index in indexes if vpc_id(index) != missing]},
+            {"Filters": [
+                {"Name": "tag:Name", "Values": sorted(f"dr-{index}-sg" for index in indexes)},
+                {"Name": "vpc-id", "Values": chunk},
+            ]})
+    return subnets
+
+
+def test_discovery_makes_one_pass(ec2):
+    client, stubber = ec2
+    subnets = stub_discovery(stubber, VPC_COUNT)
+
+    mapping = create_subnet_cidr_mapping(client)
+
+    # no security group is found for the first and the last VPC
+    assert len(mapping) == (VPC_COUNT - 2) * SUBNETS_PER_VPC
+    for s in subnets:
+        vpc_index = int(s["VpcId"][len("vpc-"):], 16)
+        if vpc_index in (0, VPC_COUNT - 1):
+            assert s["CidrBlock"] not in mapping
+        else:
+            assert mapping[s["CidrBlock"]] == (s["SubnetId"], [security_group_id(vpc_index)], s["VpcId"])
+
+
+def test_discovery_api_calls(ec2):
+    client, stubber = ec2
+    stub_discovery(stubber, VPC_COUNT)
+    calls = []
+    client.meta.events.register("before-parameter-build.ec2.*", lambda model, **kwargs: calls.append(model.name))
+
+    create_subnet_cidr_mapping(client)
+
+    assert calls.count("DescribeSubnets") == 2
+    assert calls.count("DescribeVpcs") == 1
+    assert calls.count("DescribeSecurityGroups") == math.ceil(VPC_COUNT / 200)
+
+
+def test_discovery_reuses_listed_subnets(ec2):
+    client, stubber = ec2
+    subnets = [subnet(1, 0)]
+    stubber.add_response("describe_vpcs", {"Vpcs": [vpc(1)]}, {"VpcIds": [vpc_id(1)]})
+    stubber.add_response("describe_security_groups", {"SecurityGroups": [security_group(1)]}, {"Filters": [
+        {"Name": "tag:Name", "Values": ["dr-1-sg"]},
+        {"Name": "vpc-id", "Values": [vpc_id(1)]},
+    ]})
+
+    mapping = create_subnet_cidr_mapping(client, subnets)
+
+    assert mapping.lookup("10.0.1.10") == (subnets[0]["CidrBlock"], subnets[0]["SubnetId"],
+                                           [security_group_id(1)], vpc_id(1))
+
+
+def test_discovery_without_tagged_subnets(ec2):
+    client, stubber = ec2
+    stubber.add_response("describe_subnets", {"Subnets": []}, {"Filters": TAGGED_SUBNET_FILTERS})
+
+    with pytest.raises(SynchronizerException):
+        create_subnet_cidr_mapping(client)
@@ -0,0 +1,58 @@
+import random
+import time
+
+import benchmark_synchronizer
+import configsynchronizer
+from configsynchronizer import ServerStates
+from configuration_bundle import compile_bundle
+
+ACCOUNT = "111111111111"
+SERVERS = 4
+
+
+def create_server_states(launch_template_version) -> ServerStates:
+    previous = {"s-1": dict(fingerprint="f", launch_template_id="lt-1", launch_template_version=launch_template_version,
+                            inventory={}, synchronized_time=0)}
+    return ServerStates(ACCOUNT, "us-east-1", previous, time.time(), full_sweep=False)
+
+
+def test_launch_template_version_is_compared():
+    assert create_server_states(2).is_unchanged("s-1", "f", {"lt-1": dict(VersionNumber=2)})
+    assert not create_server_states(2).is_unchanged("s-1", "f", {"lt-1": dict(VersionNumber=3)})
+    # the default version could not be prefetched
+    assert not create_server_states(2).is_unchanged("s-1", "f", {})
+    assert not create_server_states(2).is_unchanged("s-1", "g", {"lt-1": dict(VersionNumber=2)})
+
+
+def test_skipped_launch_template_is_not_compared():
+    assert create_server_states(None).is_unchanged("s-1", "f", {})
+    assert create_server_states(None).is_unchanged("s-1", "f", {"lt-1": dict(VersionNumber=3)})
+    assert not create_server_states(None).is_unchanged("s-1", "g", {})
+
+
+def test_server_with_skipped_launch_template_is_unchanged_in_next_run(tmp_path, monkeypatch):
+    rng = random.Random(1)
+    backend = benchmark_synchronizer.StubBackend(latency=0, api_limit=0, rng=random.Random(1))
+    configuration_path = tmp_path.joinpath("configuration")
+    bundle_path = tmp_path.joinpath("configuration-bundle.jsonl")
+    benchmark_synchronizer.generate_configuration(configuration_path, ACCOUNT, 2, SERVERS, rng)
+    account = backend.accounts[ACCOUNT] = benchmark_synchronizer.generate_account(ACCOUNT, SERVERS, 2, rng)
+    compile_bundle(configuration_path, bundle_path)
+    benchmark_synchronizer.install_backend(backend)
+    benchmark_synchronizer.reset_invocation(backend, configuration_path, bundle_path)
+    reports = []
+    monkeypatch.setattr(configsynchronizer.RunReport, "send", lambda self: reports.append(self.to_dict()))
+    monkeypatch.setenv(configsynchronizer.API_RATE_ENVIRONMENT_VARIABLE, "1000")
+    # the launch template of a triaged disconnected server is skipped, and no default version is prefetched
+    monkeypatch.setenv(configsynchronizer.TRIAGE_ENVIRONMENT_VARIABLE, configsynchronizer.TRIAGE_DISCONNECTED)
+    monkeypatch.setattr(configsynchronizer.ConfigurationSynchronizer, "prefetch_default_launch_template_versions",
+                        lambda self: None)
+    disconnected = sorted(account["servers"])[0]
+    account["servers"][disconnected]["dataReplicationInfo"]["dataReplicationState"] = "DISCONNECTED"
+
+    configsynchronizer.synchronize_all(full_sweep=True)
+    configsynchronizer.synchronize_all()
+
+    assert reports[0]["servers_processed"] == SERVERS
+    # the other servers have a recorded launch template version that is not prefetched, so they are read again
+    assert reports[1]["servers_unchanged"] == 1
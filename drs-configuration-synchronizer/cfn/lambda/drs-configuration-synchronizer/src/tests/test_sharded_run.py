@@ -0,0 +1,115 @@
+import csv
+import gzip
+import io
+import random
+
+import pytest
+
+import benchmark_synchronizer
+import configsynchronizer
+from configuration_bundle import compile_bundle
+from shard_queue import InMemoryShardQueue
+
+ACCOUNTS = 3
+SERVERS = 25
+SHARD_SIZE = 10
+
+
+class FleetRun:
+    def __init__(self, tmp_path, seed: int = 1):
+        """
+        Fleet of stubbed AWS accounts, generated the same way for the same seed, installed into configsynchronizer.
+        """
+        rng = random.Random(seed)
+        self.backend = benchmark_synchronizer.StubBackend(latency=0, api_limit=0, rng=random.Random(seed))
+        self.configuration_path = tmp_path.joinpath("configuration")
+        self.bundle_path = tmp_path.joinpath("configuration-bundle.jsonl")
+        for n in range(ACCOUNTS):
+            account_id = str(100000000000 + n)
+            benchmark_synchronizer.generate_configuration(self.configuration_path, account_id, 2, SERVERS, rng)
+            self.backend.accounts[account_id] = benchmark_synchronizer.generate_account(account_id, SERVERS, 2, rng)
+        compile_bundle(self.configuration_path, self.bundle_path)
+        benchmark_synchronizer.install_backend(self.backend)
+        benchmark_synchronizer.reset_invocation(self.backend, self.configuration_path, self.bundle_path)
+
+    def inventory_rows(self) -> list:
+        keys = [key for key in self.backend.objects if key.startswith(configsynchronizer.REPORT_S3_KEY)]
+        assert len(keys) == 1
+        body = self.backend.objects[keys[0]]
+        if keys[0].endswith(".gz"):
+            body = gzip.decompress(body)
+        return sorted(tuple(row.items()) for row in csv.DictReader(io.StringIO(body.decode("utf-8"))))
+
+    def drs_state(self) -> dict:
+        return {account_id: (account["launch_configurations"], account["replication_configurations"])
+                for account_id, account in self.backend.accounts.items()}
+
+
+@pytest.fixture
+def sent_reports(monkeypatch):
+    reports = []
+    monkeypatch.setattr(configsynchronizer.RunReport, "send", lambda self: reports.append(self.to_dict()))
+    monkeypatch.setenv(configsynchronizer.SHARD_SIZE_ENVIRONMENT_VARIABLE, str(SHARD_SIZE))
+    monkeypatch.setenv(configsynchronizer.SHARD_RUN_TIMEOUT_ENVIRONMENT_VARIABLE, "20")
+    monkeypatch.setenv(configsynchronizer.API_RATE_ENVIRONMENT_VARIABLE, "1000")
+    monkeypatch.setattr(configsynchronizer, "SHARD_POLL_SECONDS", 0.05)
+    return reports
+
+
+def summary(report: dict) -> dict:
+    return {key: report[key] for key in ("servers_processed", "servers_unchanged", "skipped", "error_count",
+                                         "error_groups", "launch_template_versions_deleted")}
+
+
+def test_lease_expiry_and_reclaim():
+    shard_queue = InMemoryShardQueue()
+    shard_queue.put_all([dict(shard_id="a"), dict(shard_id="b")])
+
+    first = shard_queue.claim(lease_seconds=0)
+    second = shard_queue.claim(lease_seconds=300)
+    assert (first.shard["shard_id"], second.shard["shard_id"]) == ("a", "b")
+
+    # the lease of "a" expired without the shard being completed, so it is claimed again
+    reclaimed = shard_queue.claim(lease_seconds=300)
+    assert reclaimed.shard["shard_id"] == "a"
+    assert reclaimed.receipt != first.receipt
+    assert shard_queue.claim(lease_seconds=300) is None
+
+    # completing an expired lease does not remove the shard claimed again under another lease
+    shard_queue.complete(first)
+    shard_queue.complete(second)
+    assert set(shard_queue.leases) == {reclaimed.receipt}
+    shard_queue.complete(reclaimed)
+    assert shard_queue.claim(lease_seconds=0) is None
+
+
+def test_sharded_run_matches_single_run(tmp_path, sent_reports, monkeypatch):
+    single = FleetRun(tmp_path.joinpath("single"))
+    configsynchronizer.synchronize_all(full_sweep=True)
+    assert len(sent_reports) == 1
+
+    sharded = FleetRun(tmp_path.joinpath("sharded"))
+    # the worker of one shard fails before storing its partial report, so the shard is claimed again once its
+    # lease expires
+    monkeypatch.setenv(configsynchronizer.SHARD_LEASE_ENVIRONMENT_VARIABLE, "1")
+    failing_shard = f"{100000000001}-{benchmark_synchronizer.REGION}-00001"
+    write_shard_run_object = configsynchronizer.write_shard_run_object
+    attempts = []
+
+    def fail_once(run_id: str, name: str, body: dict):
+        if name == f"partials/{failing_shard}.json":
+            attempts.append(name)
+            if len(attempts) == 1:
+                raise RuntimeError("worker timed out")
+        write_shard_run_object(run_id, name, body)
+
+    monkeypatch.setattr(configsynchronizer, "write_shard_run_object", fail_once)
+    configsynchronizer.synchronize_sharded(InMemoryShardQueue(), full_sweep=True)
+
+    assert len(attempts) == 2
+    assert len(sent_reports) == 2
+    single_report, sharded_report = sent_reports
+    assert single_report["servers_processed"] == ACCOUNTS * SERVERS
+    assert summary(sharded_report) == summary(single_report)
+    assert sharded.inventory_rows() == single.inventory_rows()
+    assert sharded.drs_state() == single.drs_state()
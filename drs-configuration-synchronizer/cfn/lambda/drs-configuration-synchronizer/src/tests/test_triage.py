@@ -0,0 +1,143 @@
+import copy
+import random
+
+import pytest
+import yaml
+
+import benchmark_synchronizer
+import configsynchronizer
+from configsynchronizer import (REPLICATION_CONFIGURATION_KEYS, SECTIONS, SKIPPED_TRIAGED, TRIAGE_AGENTLESS,
+                                TRIAGE_DISCONNECTED, TRIAGE_ENVIRONMENT_VARIABLE, TRIAGE_EXTENDED, TRIAGE_REPLICATING,
+                                TRIAGE_SKIPPED_REPLICATION_KEYS, TRIAGE_SKIPPED_SECTIONS, SynchronizerException,
+                                get_replication_configuration_keys, get_triage_categories, triage_source_server)
+from configuration_bundle import compile_bundle
+
+ACCOUNT = "111111111111"
+SERVERS = 4
+
+
+def create_server(staging_area_status: str = "NOT_EXTENDED", replication_state: str = "CONTINUOUS",
+                  replication_type: str = "AGENT_BASED") -> dict:
+    return dict(sourceServerID="s-1", stagingArea=dict(status=staging_area_status),
+                dataReplicationInfo=dict(dataReplicationState=replication_state), replicationType=replication_type)
+
+
+@pytest.fixture
+def fleet(tmp_path, monkeypatch):
+    """
+    One stubbed account, installed into configsynchronizer, whose replication defaults also throttle bandwidth.
+
+    :return: Tuple of the account in the stub backend and the list of run reports sent
+    """
+    rng = random.Random(1)
+    backend = benchmark_synchronizer.StubBackend(latency=0, api_limit=0, rng=random.Random(1))
+    configuration_path = tmp_path.joinpath("configuration")
+    bundle_path = tmp_path.joinpath("configuration-bundle.jsonl")
+    benchmark_synchronizer.generate_configuration(configuration_path, ACCOUNT, 2, SERVERS, rng)
+    defaults = configuration_path.joinpath(ACCOUNT, "drs-replication-configurations", "defaults.yml")
+    defaults.write_text(yaml.safe_dump(dict(yaml.safe_load(defaults.read_text()), bandwidthThrottling=100)))
+    account = backend.accounts[ACCOUNT] = benchmark_synchronizer.generate_account(ACCOUNT, SERVERS, 2, rng)
+    compile_bundle(configuration_path, bundle_path)
+    benchmark_synchronizer.install_backend(backend)
+    benchmark_synchronizer.reset_invocation(backend, configuration_path, bundle_path)
+    reports = []
+    monkeypatch.setattr(configsynchronizer.RunReport, "send", lambda self: reports.append(self.to_dict()))
+    monkeypatch.setenv(configsynchronizer.API_RATE_ENVIRONMENT_VARIABLE, "1000")
+    return account, reports
+
+
+def test_only_extended_servers_are_triaged_by_default(monkeypatch):
+    monkeypatch.delenv(TRIAGE_ENVIRONMENT_VARIABLE, raising=False)
+    assert get_triage_categories() == {TRIAGE_EXTENDED}
+
+    monkeypatch.setenv(TRIAGE_ENVIRONMENT_VARIABLE, "")
+    assert get_triage_categories() == {TRIAGE_EXTENDED}
+
+
+def test_disconnected_servers_are_triaged_when_listed(monkeypatch):
+    monkeypatch.setenv(TRIAGE_ENVIRONMENT_VARIABLE, " Disconnected ")
+    assert get_triage_categories() == {TRIAGE_EXTENDED, TRIAGE_DISCONNECTED}
+
+    monkeypatch.setenv(TRIAGE_ENVIRONMENT_VARIABLE, "disconnected,AGENTLESS")
+    assert get_triage_categories() == {TRIAGE_EXTENDED, TRIAGE_DISCONNECTED, TRIAGE_AGENTLESS}
+
+
+@pytest.mark.parametrize("value", ["snapshot_shipping", "disconnected,bogus", "replicating"])
+def test_unknown_categories_are_rejected(monkeypatch, value):
+    monkeypatch.setenv(TRIAGE_ENVIRONMENT_VARIABLE, value)
+
+    with pytest.raises(SynchronizerException, match=TRIAGE_ENVIRONMENT_VARIABLE):
+        get_triage_categories()
+
+
+def test_triage_source_server():
+    every_category = {TRIAGE_EXTENDED, TRIAGE_DISCONNECTED, TRIAGE_AGENTLESS}
+
+    assert triage_source_server(create_server(), every_category) == TRIAGE_REPLICATING
+    assert triage_source_server(create_server(staging_area_status="EXTENDED"), every_category) == TRIAGE_EXTENDED
+    # an extended server is extended whatever its replication state
+    assert triage_source_server(create_server(staging_area_status="EXTENDED", replication_state="DISCONNECTED"),
+                                every_category) == TRIAGE_EXTENDED
+    disconnected = create_server(replication_state="DISCONNECTED")
+    assert triage_source_server(disconnected, every_category) == TRIAGE_DISCONNECTED
+    assert triage_source_server(disconnected, {TRIAGE_EXTENDED}) == TRIAGE_REPLICATING
+    agentless = create_server(replication_type="SNAPSHOT_SHIPPING")
+    assert triage_source_server(agentless, every_category) == TRIAGE_AGENTLESS
+    assert triage_source_server(agentless, {TRIAGE_EXTENDED, TRIAGE_DISCONNECTED}) == TRIAGE_REPLICATING
+    # servers missing from the listing details are synchronized in full
+    assert triage_source_server(dict(sourceServerID="s-1"), every_category) == TRIAGE_REPLICATING
+
+
+def test_categories_skip_distinct_sections():
+    assert TRIAGE_SKIPPED_SECTIONS[TRIAGE_EXTENDED] == (configsynchronizer.SECTION_REPLICATION_CONFIGURATION,)
+    assert set(TRIAGE_SKIPPED_SECTIONS[TRIAGE_EXTENDED]) < set(TRIAGE_SKIPPED_SECTIONS[TRIAGE_DISCONNECTED])
+    # tags are synchronized for every category
+    assert configsynchronizer.SECTION_TAGS not in set().union(*TRIAGE_SKIPPED_SECTIONS.values())
+    assert set().union(*TRIAGE_SKIPPED_SECTIONS.values()) < set(SECTIONS)
+
+
+def test_agentless_servers_skip_agent_replication_settings():
+    # agentless servers synchronize every section, leaving out only the settings enforced by the replication agent
+    assert TRIAGE_SKIPPED_SECTIONS[TRIAGE_AGENTLESS] == ()
+    assert set(TRIAGE_SKIPPED_REPLICATION_KEYS) == {TRIAGE_AGENTLESS}
+    assert "bandwidthThrottling" not in get_replication_configuration_keys(TRIAGE_AGENTLESS)
+    assert set(get_replication_configuration_keys(TRIAGE_AGENTLESS)) < set(REPLICATION_CONFIGURATION_KEYS)
+    for triage in (TRIAGE_REPLICATING, TRIAGE_EXTENDED, TRIAGE_DISCONNECTED):
+        assert get_replication_configuration_keys(triage) == REPLICATION_CONFIGURATION_KEYS
+
+
+def test_disconnected_server_keeps_its_launch_and_replication_settings(fleet, monkeypatch):
+    account, reports = fleet
+    monkeypatch.setenv(TRIAGE_ENVIRONMENT_VARIABLE, TRIAGE_DISCONNECTED)
+    disconnected, replicating = sorted(account["servers"])[:2]
+    account["servers"][disconnected]["dataReplicationInfo"]["dataReplicationState"] = "DISCONNECTED"
+    before = copy.deepcopy(account)
+
+    configsynchronizer.synchronize_all(full_sweep=True)
+
+    for server_id, changed in ((disconnected, False), (replicating, True)):
+        launch_template_id = account["launch_configurations"][server_id]["ec2LaunchTemplateID"]
+        assert (account["launch_templates"][launch_template_id] != before["launch_templates"][launch_template_id]) \
+            is changed
+        assert (account["launch_configurations"][server_id] != before["launch_configurations"][server_id]) is changed
+        assert (account["replication_configurations"][server_id] !=
+                before["replication_configurations"][server_id]) is changed
+    skipped = reports[0]["skipped"]
+    for section in TRIAGE_SKIPPED_SECTIONS[TRIAGE_DISCONNECTED]:
+        assert skipped[SKIPPED_TRIAGED.format(section, TRIAGE_DISCONNECTED)] == 1
+
+
+def test_agentless_server_keeps_its_bandwidth_throttling(fleet, monkeypatch):
+    account, reports = fleet
+    monkeypatch.setenv(TRIAGE_ENVIRONMENT_VARIABLE, TRIAGE_AGENTLESS)
+    agentless, replicating = sorted(account["servers"])[:2]
+    account["servers"][agentless]["replicationType"] = "SNAPSHOT_SHIPPING"
+
+    configsynchronizer.synchronize_all(full_sweep=True)
+
+    replication_configurations = account["replication_configurations"]
+    assert replication_configurations[replicating]["bandwidthThrottling"] == 100
+    assert replication_configurations[agentless]["bandwidthThrottling"] == 0
+    # the other replication settings of the agentless server are synchronized
+    assert replication_configurations[agentless]["defaultLargeStagingDiskType"] == "GP3"
+    assert not any(reason.endswith(f"of {TRIAGE_AGENTLESS} server(s)") for reason in reports[0]["skipped"])
@@ -3,12 +3,18 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import os
+import sys
 import click
 import logging
 import helper
 import shutil
 import subprocess
 
+# configuration_bundle is shared with the synchronizer lambda so configuration is compiled the way the lambda reads it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "cfn", "lambda", "drs-configuration-synchronizer", "src"))
+import configuration_bundle  # noqa: E402
+
 log_level = os.getenv("LOGLEVEL", "INFO")
 level = logging.getLevelName(log_level)
 
@@ -59,6 +65,22 @@ if hard_stop:
 solution_prefix = "drs-configuration-synchronizer"
 
 
+def compile_configuration():
+    """
+    Validate the configuration of every account and compile it into the bundle packaged with the lambda.
+    Exits if any account cannot be synchronized with its configuration.
+    """
+    try:
+        accounts, warnings = configuration_bundle.compile_bundle()
+    except configuration_bundle.ConfigurationError as e:
+        logger.error("Invalid synchronizer configuration: {}".format(e))
+        exit(1)
+    for warning in warnings:
+        logger.warning(warning)
+    logger.info("Compiled configuration for {} account(s) into {}".format(
+        len(accounts), configuration_bundle.CONFIGURATION_BUNDLE_PATH))
+
+
 @click.command()
 @click.option("--solution-account", required=True, default=None, help="The AWS Account ID where the drs-configuration-synchronizer is deployed.")
 @click.option("--prefix", required=False, default=None, help="The prefix to preprend in front of each stack name, eg prefix 'myco' results in stack name 'myco-drs-configuration-synchronizer-lambda'")
@@ -149,6 +171,9 @@ def deploy(prefix, environment, prompt, cleanup, account_role_only, solution_acc
         )
     )
 
+    if not account_role_only:
+        compile_configuration()
+
     input("Press enter to proceed with deployment to account {} in region {}: ".format(
         account_number, region))
 